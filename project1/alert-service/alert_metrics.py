@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics for the alert service, served on METRICS_PORT.
+
+The processing loop only bumps counters and observes histograms. Queue
+depths (unread alert log bytes, notifications waiting to be sent) are
+computed from the service's state when /metrics is scraped.
+"""
+import os
+
+from prometheus_client import REGISTRY, Counter, Histogram, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9102'))
+
+LINES_PROCESSED = Counter('alert_log_lines_processed_total', 'Alert log lines read', ['result'])
+ALERTS_INGESTED = Counter('alerts_ingested_total', 'Alerts fed to incident correlation', ['severity'])
+NOTIFICATIONS = Counter('alert_notifications_total', 'Incident notifications', ['transition', 'outcome'])
+SEND_LATENCY = Histogram('alert_email_send_duration_seconds', 'Time taken by an SES send call',
+                         buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+
+
+class QueueCollector:
+    """Reports the alert service's backlog at scrape time"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def collect(self):
+        service = self.service
+        try:
+            backlog = max(os.stat(service.alert_log).st_size - service.log_offset, 0)
+        except OSError:
+            backlog = 0
+        yield GaugeMetricFamily('alert_log_backlog_bytes', 'Alert log bytes not read yet', value=backlog)
+
+        engine = service.incident_engine
+        pending = len(engine.pending_resolved)
+        if engine.current is not None and engine.current.notified_severity != engine.current.severity:
+            pending += 1
+        yield GaugeMetricFamily('alert_notifications_pending', 'Incident notifications waiting to be sent',
+                                value=pending)
+        yield GaugeMetricFamily('alert_incident_open', 'Whether an incident is open',
+                                value=0 if engine.current is None else 1)
+
+
+def start(service, port=METRICS_PORT):
+    """Serve /metrics for `service` from a background thread"""
+    REGISTRY.register(QueueCollector(service))
+    start_http_server(port)
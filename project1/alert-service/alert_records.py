@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Alert record format shared by the monitor, the dashboard and the alert service.
+
+Alerts are written to the alert log as JSON Lines, one record per line:
+
+  {"epoch": 1710929730, "timestamp": "2024-03-20 10:15:30", "alert_type": "High CPU",
+   "severity": "warning", "metric": "cpu_percent", "value": 85.0, "threshold": 40.0,
+   "message": "CPU usage is 85% (threshold: 40%)"}
+
+The original free-form text format is still accepted when reading, so existing
+log files keep working:
+
+  [2024-03-20 10:15:30] ALERT: High CPU - CPU usage is 85% (threshold: 40%)
+
+NOTE: each service is built from its own Docker context, so this module is
+duplicated in alert-service/ and monitor-dashboard-service/. Keep them in sync.
+"""
+import json
+import re
+import time
+
+# Alert types that bypass aggregation and are reported as critical
+CRITICAL_ALERT_TYPES = ('Container Down', 'Application Unhealthy')
+
+# Metric each legacy alert type refers to (text lines don't carry it)
+ALERT_TYPE_METRICS = {
+    'High CPU': 'cpu_percent',
+    'High Memory': 'memory_percent',
+    'Slow Response': 'response_time_ms',
+    'Application Unhealthy': 'status',
+    'Container Down': 'status',
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Pre-compiled parsers for the legacy text format. The timestamp is split into
+# its fields by the same regex so it never goes through strptime.
+_TEXT_ALERT_RE = re.compile(
+    r'^\[(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\] ALERT: (.+?) - (.*)$'
+)
+_TEXT_VALUES_RE = re.compile(r'is ([\d.]+)\D*\(threshold: ([\d.]+)')
+
+
+def severity_for(alert_type):
+    """Default severity for an alert type"""
+    return 'critical' if alert_type in CRITICAL_ALERT_TYPES else 'warning'
+
+
+def _to_float(value):
+    """Coerce a value/threshold field to float, None if missing or invalid"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(str(value).strip('"\''))
+    except (TypeError, ValueError):
+        return None
+
+
+def make_alert(alert_type, message, metric=None, value=None, threshold=None,
+               severity=None, epoch=None):
+    """Build an alert record"""
+    if epoch is None:
+        epoch = time.time()
+    return {
+        'epoch': epoch,
+        'timestamp': time.strftime(TIMESTAMP_FORMAT, time.localtime(epoch)),
+        'alert_type': alert_type,
+        'severity': severity or severity_for(alert_type),
+        'metric': metric or ALERT_TYPE_METRICS.get(alert_type),
+        'value': _to_float(value),
+        'threshold': _to_float(threshold),
+        'message': message,
+    }
+
+
+def parse_alert_line(line):
+    """Parse one alert log line (JSON or legacy text) into an alert record
+
+    Returns None for blank or unrecognised lines. The original line is kept
+    under 'line' so callers can use it as a stable identity.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    if line[0] == '{':
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        alert_type = data.get('alert_type')
+        if not alert_type:
+            return None
+        epoch = _to_float(data.get('epoch'))
+        if epoch is None:
+            return None
+        record = make_alert(
+            alert_type,
+            data.get('message', ''),
+            metric=data.get('metric'),
+            value=data.get('value'),
+            threshold=data.get('threshold'),
+            severity=data.get('severity'),
+            epoch=epoch,
+        )
+        if data.get('timestamp'):
+            record['timestamp'] = data['timestamp']
+        record['line'] = line
+        return record
+
+    match = _TEXT_ALERT_RE.match(line)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, alert_type, message = match.groups()
+    epoch = time.mktime((int(year), int(month), int(day),
+                         int(hour), int(minute), int(second), 0, 0, -1))
+    value = threshold = None
+    values = _TEXT_VALUES_RE.search(message)
+    if values:
+        value, threshold = values.groups()
+    record = make_alert(alert_type, message, value=value, threshold=threshold, epoch=epoch)
+    record['timestamp'] = line[1:20]
+    record['line'] = line
+    return record
+
+
+def format_alert_json(record):
+    """Serialize an alert record as a single JSON line (no trailing newline)"""
+    return json.dumps({key: value for key, value in record.items() if key != 'line'},
+                      separators=(',', ':'))
+
+
+def format_alert_text(record):
+    """Render an alert record in the legacy human-readable format"""
+    return f"[{record['timestamp']}] ALERT: {record['alert_type']} - {record['message']}"
+
+
+def append_alert(path, record):
+    """Append an alert record to the alert log"""
+    line = format_alert_json(record)
+    with open(path, 'a') as f:
+        f.write(line + '\n')
+    return line
@@ -7,6 +7,11 @@ from datetime import datetime, timedelta
 import threading
 from collections import defaultdict
 
+import alert_metrics
+from alert_metrics import ALERTS_INGESTED, LINES_PROCESSED, NOTIFICATIONS, SEND_LATENCY
+from alert_records import parse_alert_line
+from incidents import IncidentEngine
+
 class AlertService:
     def __init__(self):
         # AWS SES Configuration
@@ -27,105 +32,111 @@ class AlertService:
         # State directory for writable files
         self.state_dir = '/app/state'
         os.makedirs(self.state_dir, exist_ok=True)
-        self.processed_alerts_file = os.path.join(self.state_dir, 'processed_alerts.json')
+        self.position_file = os.path.join(self.state_dir, 'alert_log_position.json')
+        self.incidents_file = os.path.join(self.state_dir, 'incidents.json')
         
         self.check_interval = int(os.getenv('CHECK_INTERVAL', '30'))  # seconds
         
-        # Rate limiting
-        self.alert_cooldown = int(os.getenv('ALERT_COOLDOWN', '300'))  # 5 minutes
-        self.last_alert_times = defaultdict(lambda: datetime.min)
+        # Alert frequency (for the email summary)
         self.alert_counts = defaultdict(int)
         
-        # Alert aggregation
-        self.alert_buffer = defaultdict(list)
-        self.buffer_timeout = int(os.getenv('BUFFER_TIMEOUT', '60'))  # seconds
+        # Incident correlation. Alerts closer together than the window belong to
+        # the same incident (ALERT_COOLDOWN kept as the default for compatibility).
+        # An incident resolves after a quiet period of at least the window.
+        resolve_after = os.getenv('INCIDENT_RESOLVE_AFTER')
+        self.incident_engine = IncidentEngine(
+            window=int(os.getenv('INCIDENT_WINDOW', os.getenv('ALERT_COOLDOWN', '300'))),
+            resolve_after=int(resolve_after) if resolve_after else None,
+            open_delay=int(os.getenv('BUFFER_TIMEOUT', '60')),
+        )
+        self.load_incidents()
         
-        # Load processed alerts
-        self.processed_alerts = self.load_processed_alerts()
+        # Read position in the alert log, so each line is only read once
+        self.log_inode, self.log_offset = self.load_position()
     
-    def load_processed_alerts(self):
-        """Load already processed alerts to avoid duplicates"""
-        if os.path.exists(self.processed_alerts_file):
+    def load_position(self):
+        """Load the saved (inode, offset) of the alert log"""
+        if os.path.exists(self.position_file):
             try:
-                with open(self.processed_alerts_file, 'r') as f:
-                    return set(json.load(f))
+                with open(self.position_file, 'r') as f:
+                    position = json.load(f)
+                return position['inode'], position['offset']
             except:
-                return set()
-        return set()
+                pass
+        # First start: only alerts written from now on are notified
+        try:
+            stat = os.stat(self.alert_log)
+            print(f"No saved position, skipping {stat.st_size} bytes of existing alerts")
+            return stat.st_ino, stat.st_size
+        except OSError:
+            return None, 0
+    
+    def save_position(self):
+        """Save the alert log read position"""
+        try:
+            with open(self.position_file, 'w') as f:
+                json.dump({'inode': self.log_inode, 'offset': self.log_offset}, f)
+        except Exception as e:
+            print(f"Warning: Could not save alert log position: {e}")
+    
+    def load_incidents(self):
+        """Restore open and recently resolved incidents"""
+        if os.path.exists(self.incidents_file):
+            try:
+                with open(self.incidents_file, 'r') as f:
+                    self.incident_engine.load(json.load(f))
+            except Exception as e:
+                print(f"Warning: Could not load incidents: {e}")
     
-    def save_processed_alerts(self):
-        """Save processed alerts to file"""
+    def save_incidents(self):
+        """Save incident state"""
         try:
-            with open(self.processed_alerts_file, 'w') as f:
-                json.dump(list(self.processed_alerts), f)
+            with open(self.incidents_file, 'w') as f:
+                json.dump(self.incident_engine.to_dict(), f)
         except Exception as e:
-            print(f"Warning: Could not save processed alerts: {e}")
+            print(f"Warning: Could not save incidents: {e}")
     
     def parse_alert_line(self, line):
-        """Parse alert line from log file"""
+        """Parse alert line from log file (JSON record or legacy text)"""
         try:
-            # Expected format: [2024-03-20 10:15:30] ALERT: High CPU - CPU usage is 85% (threshold: 40%)
-            parts = line.strip().split('] ALERT: ', 1)
-            if len(parts) != 2:
-                return None
-            
-            timestamp_str = parts[0].strip('[')
-            alert_content = parts[1]
-            
-            # Split alert type and message
-            alert_parts = alert_content.split(' - ', 1)
-            if len(alert_parts) != 2:
-                return None
-            
-            return {
-                'timestamp': timestamp_str,
-                'alert_type': alert_parts[0],
-                'message': alert_parts[1],
-                'line': line.strip()
-            }
+            return parse_alert_line(line)
         except Exception as e:
             print(f"Error parsing alert line: {e}")
             return None
     
-    def should_send_alert(self, alert_type):
-        """Check if alert should be sent based on rate limiting"""
-        now = datetime.now()
-        last_sent = self.last_alert_times[alert_type]
-        
-        if (now - last_sent).total_seconds() < self.alert_cooldown:
-            return False
-        
-        return True
-    
-    def format_email_body(self, alerts):
-        """Format email body with alert details"""
+    def format_email_body(self, transition, incident):
+        """Format email body with incident details"""
         body = f"""
-Container Monitoring Alert Summary
+Container Monitoring Incident #{incident.id} - {transition.upper()}
 ==================================
 
 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 Container: {os.getenv('CONTAINER_NAME', 'monitored-app')}
-
-Alerts Detected:
----------------
+Root cause: {incident.root_cause}
+Severity: {incident.severity}
+Opened: {datetime.fromtimestamp(incident.opened_at).strftime('%Y-%m-%d %H:%M:%S')}
 """
+        if incident.status == 'resolved':
+            body += f"Resolved: {datetime.fromtimestamp(incident.resolved_at).strftime('%Y-%m-%d %H:%M:%S')} ({incident.resolution})\n"
         
-        # Group alerts by type
-        alerts_by_type = defaultdict(list)
-        for alert in alerts:
-            alerts_by_type[alert['alert_type']].append(alert)
-        
-        for alert_type, type_alerts in alerts_by_type.items():
-            body += f"\n{alert_type} ({len(type_alerts)} occurrences):\n"
-            for alert in type_alerts[-5:]:  # Show last 5 of each type
+        body += """
+Correlated Alerts:
+---------------
+"""
+        for alert_type, count in incident.alert_counts.items():
+            suppressed = incident.suppressed_counts.get(alert_type, 0)
+            note = f", {suppressed} suppressed as symptoms" if suppressed else ""
+            body += f"\n{alert_type} ({count} occurrences{note}):\n"
+            samples = incident.samples.get(alert_type, ())
+            for alert in samples:  # Show last 5 of each type
                 body += f"  - [{alert['timestamp']}] {alert['message']}\n"
-            if len(type_alerts) > 5:
-                body += f"  ... and {len(type_alerts) - 5} more\n"
+            if count > len(samples):
+                body += f"  ... and {count - len(samples)} more\n"
         
         body += f"""
 Action Required:
 ---------------
-Please check the container status and take appropriate action.
+{'No action required, the incident has resolved.' if transition == 'resolved' else 'Please check the container status and take appropriate action.'}
 
 Dashboard: http://localhost:8000
 Application: http://localhost:8080
@@ -141,98 +152,95 @@ Alert Frequency:
     def send_email(self, subject, body):
         """Send email using AWS SES"""
         try:
-            response = self.ses_client.send_email(
-                Source=self.sender_email,
-                Destination={
-                    'ToAddresses': self.recipient_emails
-                },
-                Message={
-                    'Subject': {
-                        'Data': subject,
-                        'Charset': 'UTF-8'
+            with SEND_LATENCY.time():
+                response = self.ses_client.send_email(
+                    Source=self.sender_email,
+                    Destination={
+                        'ToAddresses': self.recipient_emails
                     },
-                    'Body': {
-                        'Text': {
-                            'Data': body,
+                    Message={
+                        'Subject': {
+                            'Data': subject,
                             'Charset': 'UTF-8'
+                        },
+                        'Body': {
+                            'Text': {
+                                'Data': body,
+                                'Charset': 'UTF-8'
+                            }
                         }
                     }
-                }
-            )
+                )
             print(f"Email sent successfully: {response['MessageId']}")
             return True
         except Exception as e:
             print(f"Error sending email: {e}")
             return False
     
-    def process_alerts(self):
-        """Process new alerts from log file"""
-        if not os.path.exists(self.alert_log):
-            return
+    def read_new_alerts(self):
+        """Read alerts appended to the log since the last call"""
+        try:
+            stat = os.stat(self.alert_log)
+        except OSError:
+            return []
         
-        new_alerts = []
+        # Start over if the log was rotated or truncated
+        if stat.st_ino != self.log_inode or stat.st_size < self.log_offset:
+            self.log_inode, self.log_offset = stat.st_ino, 0
+        if stat.st_size == self.log_offset:
+            return []
         
+        new_alerts = []
+        with open(self.alert_log, 'rb') as f:
+            f.seek(self.log_offset)
+            data = f.read(stat.st_size - self.log_offset)
+        # Leave a partially written last line for the next cycle
+        end = data.rfind(b'\n') + 1
+        self.log_offset += end
+        for line in data[:end].decode('utf-8', 'replace').splitlines():
+            alert = self.parse_alert_line(line)
+            if alert:
+                new_alerts.append(alert)
+            LINES_PROCESSED.labels('parsed' if alert else 'skipped').inc()
+        return new_alerts
+    
+    def process_alerts(self):
+        """Process new alerts from log file"""
         try:
-            with open(self.alert_log, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and line not in self.processed_alerts:
-                        alert = self.parse_alert_line(line)
-                        if alert:
-                            new_alerts.append(alert)
-                            self.processed_alerts.add(line)
-                            
-                            # Update alert counts
-                            self.alert_counts[alert['alert_type']] += 1
+            new_alerts = self.read_new_alerts()
         except Exception as e:
             print(f"Error reading alert log: {e}")
             return
         
-        # Buffer alerts for aggregation
+        # Correlate alerts into incidents
         for alert in new_alerts:
-            self.alert_buffer[alert['alert_type']].append(alert)
+            ALERTS_INGESTED.labels(alert['severity']).inc()
+            if alert['severity'] != 'ok':
+                self.alert_counts[alert['alert_type']] += 1
+            self.incident_engine.ingest(alert)
         
-        # Check if we should send buffered alerts
-        self.check_and_send_buffered_alerts()
+        # Send one notification per incident transition
+        self.send_incident_notifications()
         
-        # Save processed alerts
-        self.save_processed_alerts()
+        self.save_position()
+        self.save_incidents()
     
-    def check_and_send_buffered_alerts(self):
-        """Check and send buffered alerts"""
-        now = datetime.now()
-        alerts_to_send = []
-        
-        for alert_type, alerts in list(self.alert_buffer.items()):
-            if not alerts:
-                continue
-            
-            # Check if we should send this alert type
-            if not self.should_send_alert(alert_type):
-                continue
-            
-            # Check if buffer timeout reached or critical alert
-            first_alert_time = datetime.strptime(alerts[0]['timestamp'], '%Y-%m-%d %H:%M:%S')
-            time_diff = (now - first_alert_time).total_seconds()
-            
-            if (time_diff >= self.buffer_timeout or 
-                alert_type in ['Container Down', 'Application Unhealthy'] or 
-                len(alerts) >= 5):
-                
-                alerts_to_send.extend(alerts)
-                self.last_alert_times[alert_type] = now
-                self.alert_buffer[alert_type] = []
-        
-        if alerts_to_send:
-            # Determine email subject based on severity
-            critical_alerts = [a for a in alerts_to_send if a['alert_type'] in ['Container Down', 'Application Unhealthy']]
-            if critical_alerts:
-                subject = f"🚨 CRITICAL: {os.getenv('CONTAINER_NAME', 'Container')} Alert"
+    def send_incident_notifications(self):
+        """Send notifications for incident transitions that are due"""
+        container = os.getenv('CONTAINER_NAME', 'Container')
+        for transition, incident in self.incident_engine.poll(time.time()):
+            if transition == 'resolved':
+                subject = f"✅ RESOLVED: {container} incident #{incident.id} ({incident.root_cause})"
+            elif incident.severity == 'critical':
+                subject = f"🚨 CRITICAL: {container} incident #{incident.id} {transition} ({incident.root_cause})"
             else:
-                subject = f"⚠️ WARNING: {os.getenv('CONTAINER_NAME', 'Container')} Alert"
+                subject = f"⚠️ WARNING: {container} incident #{incident.id} {transition} ({incident.root_cause})"
             
-            body = self.format_email_body(alerts_to_send)
-            self.send_email(subject, body)
+            print(f"Incident #{incident.id} {transition}: {incident.root_cause}, "
+                  f"{incident.total_alerts} alerts")
+            body = self.format_email_body(transition, incident)
+            sent = self.send_email(subject, body)
+            NOTIFICATIONS.labels(transition, 'sent' if sent else 'failed').inc()
     
     def cleanup_old_counts(self):
         """Clean up old alert counts (keep last hour only)"""
@@ -250,6 +258,8 @@ Alert Frequency:
         print(f"Alert Service started. Monitoring {self.alert_log}")
         print(f"Sending alerts to: {', '.join(self.recipient_emails)}")
         print(f"State directory: {self.state_dir}")
+        alert_metrics.start(self)
+        print(f"Metrics on port {alert_metrics.METRICS_PORT}")
         
         while True:
             try:
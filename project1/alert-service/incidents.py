@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Incident correlation for the alert service.
+
+Alerts from the monitor arrive as independent records (see alert_records.py).
+During an outage a single failure produces a storm of them: Container Down,
+Application Unhealthy, Slow Response, High CPU... This module folds alerts
+that are close in time into one incident, applies causal rules so symptoms
+of a known cause are suppressed, and reports only incident transitions:
+
+  opened    - first notification for a new incident
+  escalated - the incident's severity went up (e.g. warning -> critical)
+  resolved  - metrics recovered or the incident went quiet
+
+Each alert costs a few dictionary updates; nothing is rescanned per alert.
+"""
+from collections import defaultdict, deque
+
+# cause -> alert types that are expected symptoms of it
+CAUSAL_RULES = {
+    'Container Down': ('Application Unhealthy', 'Slow Response', 'High CPU', 'High Memory'),
+    'Application Unhealthy': ('Slow Response',),
+}
+
+# Root cause preference, most fundamental first. Unknown types rank last.
+ROOT_CAUSE_ORDER = ('Container Down', 'Application Unhealthy', 'High Memory', 'High CPU', 'Slow Response')
+
+SEVERITY_RANK = {'ok': 0, 'info': 1, 'warning': 2, 'critical': 3}
+
+# Alerts kept per type for the notification body
+SAMPLES_PER_TYPE = 5
+
+
+def _root_rank(alert_type):
+    try:
+        return ROOT_CAUSE_ORDER.index(alert_type)
+    except ValueError:
+        return len(ROOT_CAUSE_ORDER)
+
+
+class Incident:
+    """A group of correlated alerts with open/resolved state"""
+
+    def __init__(self, incident_id, opened_at):
+        self.id = incident_id
+        self.status = 'open'
+        self.opened_at = opened_at
+        self.last_alert_at = opened_at
+        self.resolved_at = None
+        self.resolution = None
+        self.root_cause = None
+        self.severity = 'info'
+        self.alert_counts = defaultdict(int)
+        self.suppressed_counts = defaultdict(int)
+        # alert type -> epoch of its latest alert, removed when it recovers
+        self.active_types = {}
+        self.samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_TYPE))
+        # What the last notification told people, to detect escalation
+        self.notified_severity = None
+        self.last_notified_at = None
+
+    def is_suppressed(self, alert_type):
+        """True if an active cause in this incident explains this alert type"""
+        for cause in self.active_types:
+            if alert_type in CAUSAL_RULES.get(cause, ()):
+                return True
+        return False
+
+    def add(self, alert):
+        alert_type = alert['alert_type']
+        self.last_alert_at = max(self.last_alert_at, alert['epoch'])
+        self.alert_counts[alert_type] += 1
+        self.samples[alert_type].append(alert)
+
+        if self.is_suppressed(alert_type):
+            self.suppressed_counts[alert_type] += 1
+            return
+        self.active_types[alert_type] = alert['epoch']
+
+        if self.root_cause is None or _root_rank(alert_type) < _root_rank(self.root_cause):
+            self.root_cause = alert_type
+        if SEVERITY_RANK.get(alert['severity'], 0) > SEVERITY_RANK[self.severity]:
+            self.severity = alert['severity']
+
+    def clear(self, alert_type):
+        """Mark an alert type as recovered; returns True if nothing is left active"""
+        self.active_types.pop(alert_type, None)
+        return not self.active_types
+
+    def resolve(self, at, resolution):
+        self.status = 'resolved'
+        self.resolved_at = at
+        self.resolution = resolution
+
+    @property
+    def total_alerts(self):
+        return sum(self.alert_counts.values())
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'opened_at': self.opened_at,
+            'last_alert_at': self.last_alert_at,
+            'resolved_at': self.resolved_at,
+            'resolution': self.resolution,
+            'root_cause': self.root_cause,
+            'severity': self.severity,
+            'alert_counts': dict(self.alert_counts),
+            'suppressed_counts': dict(self.suppressed_counts),
+            'active_types': dict(self.active_types),
+            # At most SAMPLES_PER_TYPE per type, so a restart keeps the notification body
+            'samples': {alert_type: list(alerts) for alert_type, alerts in self.samples.items()},
+            'notified_severity': self.notified_severity,
+            'last_notified_at': self.last_notified_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        incident = cls(data['id'], data['opened_at'])
+        incident.status = data['status']
+        incident.last_alert_at = data['last_alert_at']
+        incident.resolved_at = data.get('resolved_at')
+        incident.resolution = data.get('resolution')
+        incident.root_cause = data.get('root_cause')
+        incident.severity = data.get('severity', 'info')
+        incident.alert_counts.update(data.get('alert_counts', {}))
+        incident.suppressed_counts.update(data.get('suppressed_counts', {}))
+        incident.active_types = dict(data.get('active_types', {}))
+        for alert_type, alerts in data.get('samples', {}).items():
+            incident.samples[alert_type].extend(alerts)
+        incident.notified_severity = data.get('notified_severity')
+        incident.last_notified_at = data.get('last_notified_at')
+        return incident
+
+
+class IncidentEngine:
+    """Correlates alerts into incidents and decides which transitions to notify
+
+    window         - an alert within this many seconds of the open incident's
+                     last alert joins it; a longer gap starts a new incident
+    resolve_after  - an incident with no alerts for this long auto-resolves;
+                     at least `window` (the default), or an alert inside the
+                     window could find its incident already resolved
+    open_delay     - non-critical incidents wait this long before the first
+                     notification so correlated alerts can accumulate
+    """
+
+    def __init__(self, window=300, resolve_after=None, open_delay=60, history_size=50):
+        self.window = window
+        self.resolve_after = window if resolve_after is None else max(resolve_after, window)
+        self.open_delay = open_delay
+        self.current = None
+        self.resolved = deque(maxlen=history_size)
+        self.next_id = 1
+        # Incidents resolved since the last poll() that still need a notice
+        self.pending_resolved = []
+
+    def ingest(self, alert):
+        """Feed one parsed alert record into the engine"""
+        alert_type = alert['alert_type']
+
+        # Recovery records close out an alert type instead of opening anything
+        if alert['severity'] == 'ok':
+            if self.current and self.current.clear(alert_type):
+                self._resolve_current(alert['epoch'], 'recovered')
+            return
+
+        if self.current and alert['epoch'] - self.current.last_alert_at > self.window:
+            self._resolve_current(self.current.last_alert_at + self.resolve_after, 'quiet')
+
+        if self.current is None:
+            self.current = Incident(self.next_id, alert['epoch'])
+            self.next_id += 1
+        self.current.add(alert)
+
+    def _resolve_current(self, at, resolution):
+        incident = self.current
+        incident.resolve(at, resolution)
+        self.current = None
+        self.resolved.append(incident)
+        # Incidents nobody was told about don't need a resolution notice
+        if incident.notified_severity is not None:
+            self.pending_resolved.append(incident)
+
+    def poll(self, now):
+        """Return the (transition, incident) notifications due at `now`"""
+        if self.current and now - self.current.last_alert_at >= self.resolve_after:
+            self._resolve_current(now, 'quiet')
+
+        transitions = [('resolved', incident) for incident in self.pending_resolved]
+        self.pending_resolved = []
+
+        incident = self.current
+        if incident is not None:
+            if incident.notified_severity is None:
+                if (incident.severity == 'critical' or
+                        now - incident.opened_at >= self.open_delay):
+                    transitions.append(('opened', incident))
+            elif SEVERITY_RANK[incident.severity] > SEVERITY_RANK[incident.notified_severity]:
+                transitions.append(('escalated', incident))
+
+        for transition, incident in transitions:
+            if transition != 'resolved':
+                incident.notified_severity = incident.severity
+            incident.last_notified_at = now
+        return transitions
+
+    def to_dict(self):
+        return {
+            'next_id': self.next_id,
+            'current': self.current.to_dict() if self.current else None,
+            'resolved': [incident.to_dict() for incident in self.resolved],
+        }
+
+    def load(self, data):
+        """Restore state saved with to_dict()"""
+        self.next_id = data.get('next_id', 1)
+        current = data.get('current')
+        self.current = Incident.from_dict(current) if current else None
+        self.resolved.clear()
+        for incident in data.get('resolved', []):
+            self.resolved.append(Incident.from_dict(incident))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Admission control: per-route concurrency limits by priority class.
+
+Each route listed in the app's route table belongs to a class (routes not
+listed aren't limited):
+
+  critical     health checks, /api/stats, /metrics: never limited or queued
+  interactive  pages a person is waiting on
+  batch        the stress endpoints, which hold a thread (and the CPU) for
+               seconds at a time
+
+Each limited route runs at most <class>_LIMIT requests at once. Further
+requests wait in a bounded queue for up to ADMISSION_QUEUE_TIMEOUT seconds;
+once the queue is full (or the wait times out) they are rejected straight
+away with 503 and a Retry-After header instead of piling up. Under
+`stress_app.py high` the stress endpoints then shed load while /health
+keeps answering promptly, rather than every request slowing down together.
+
+  ADMISSION=off                       disable admission control
+  ADMISSION_BATCH_LIMIT=2             concurrent requests per batch route
+  ADMISSION_BATCH_QUEUE=4             requests allowed to wait per batch route
+  ADMISSION_INTERACTIVE_LIMIT=8
+  ADMISSION_INTERACTIVE_QUEUE=32
+  ADMISSION_QUEUE_TIMEOUT=5           longest wait for a slot (seconds)
+  ADMISSION_ROUTE_LIMITS=/api/combined-stress=1:2,...
+                                      per-route limit:queue overrides
+
+Decisions are counted in admission_requests_total{route,class,outcome}
+(accepted, queued = accepted after waiting, shed, timeout).
+"""
+import os
+import threading
+import time
+
+from flask import g, jsonify, request
+from prometheus_client import REGISTRY, Counter
+from prometheus_client.core import GaugeMetricFamily
+
+ADMISSION_ENABLED = os.getenv('ADMISSION', 'on').lower() not in ('off', 'false', '0')
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5'))
+
+# Class: (concurrent requests per route, queued requests per route, Retry-After seconds)
+PRIORITY_CLASSES = {
+    'critical': None,
+    'interactive': (int(os.getenv('ADMISSION_INTERACTIVE_LIMIT', '8')),
+                    int(os.getenv('ADMISSION_INTERACTIVE_QUEUE', '32')), 1),
+    'batch': (int(os.getenv('ADMISSION_BATCH_LIMIT', '2')),
+              int(os.getenv('ADMISSION_BATCH_QUEUE', '4')), 5),
+}
+
+ADMISSIONS = Counter('admission_requests_total', 'Admission control decisions',
+                     ['route', 'class', 'outcome'])
+
+
+def parse_route_limits(text):
+    """'/a=1:2,/b=3' to {'/a': (1, 2), '/b': (3, None)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        route, _, value = item.rpartition('=')
+        limit, _, queue = value.partition(':')
+        limits[route] = (int(limit), int(queue) if queue else None)
+    return limits
+
+
+class Limiter:
+    """A counting semaphore with a bounded, time-limited wait queue"""
+
+    def __init__(self, limit, queue, timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot: returns 'accepted' or 'queued', or 'shed'/'timeout' if refused"""
+        with self.condition:
+            if self.active < self.limit:
+                self.active += 1
+                return 'accepted'
+            if self.waiting >= self.queue:
+                return 'shed'
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'timeout'
+                    self.condition.wait(remaining)
+                self.active += 1
+                return 'queued'
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+
+class AdmissionController:
+    """Holds a Limiter per limited route"""
+
+    def __init__(self, route_classes, route_limits=None):
+        self.route_classes = route_classes
+        self.limiters = {}
+        self.retry_after = {}
+        route_limits = route_limits or {}
+        for route, name in route_classes.items():
+            policy = PRIORITY_CLASSES[name]
+            if policy is None:
+                continue
+            limit, queue, retry_after = policy
+            override_limit, override_queue = route_limits.get(route, (None, None))
+            self.limiters[route] = Limiter(override_limit or limit,
+                                           queue if override_queue is None else override_queue)
+            self.retry_after[route] = retry_after
+
+    def priority(self, route):
+        return self.route_classes.get(route, 'critical')
+
+    def state(self):
+        """{route: {'class', 'active', 'waiting', 'limit', 'queue'}} of the limited routes"""
+        return {route: {'class': self.priority(route), 'active': limiter.active,
+                        'waiting': limiter.waiting, 'limit': limiter.limit, 'queue': limiter.queue}
+                for route, limiter in self.limiters.items()}
+
+    def collect(self):
+        active = GaugeMetricFamily('admission_active_requests', 'Requests holding a slot', labels=['route'])
+        waiting = GaugeMetricFamily('admission_queued_requests', 'Requests waiting for a slot',
+                                    labels=['route'])
+        for route, limiter in self.limiters.items():
+            active.add_metric([route], limiter.active)
+            waiting.add_metric([route], limiter.waiting)
+        yield active
+        yield waiting
+
+
+def init_app(app, route_classes):
+    """Apply admission control to `app`; returns the controller (None if disabled)
+
+    `route_classes` maps URL rules to priority classes.
+    """
+    if not ADMISSION_ENABLED:
+        return None
+    for route, name in route_classes.items():
+        if name not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class {name!r} for {route}")
+    controller = AdmissionController(route_classes,
+                                     parse_route_limits(os.getenv('ADMISSION_ROUTE_LIMITS', '')))
+    REGISTRY.register(controller)
+
+    @app.before_request
+    def admit():
+        if request.url_rule is None:
+            return None
+        route = request.url_rule.rule
+        limiter = controller.limiters.get(route)
+        if limiter is None:
+            return None
+        outcome = limiter.acquire()
+        ADMISSIONS.labels(route, controller.priority(route), outcome).inc()
+        if outcome in ('accepted', 'queued'):
+            g.admission_limiter = limiter
+            return None
+        retry_after = controller.retry_after[route]
+        response = jsonify({'error': 'overloaded', 'route': route, 'retry_after': retry_after})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    @app.teardown_request
+    def release(exception=None):
+        limiter = g.pop('admission_limiter', None)
+        if limiter is not None:
+            limiter.release()
+
+    return controller
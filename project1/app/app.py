@@ -8,7 +8,19 @@ import random
 import hashlib
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
+from prometheus_client import REGISTRY
+
+from admission import init_app as init_admission
+from db_pool import ConnectionPool
+from health import HEALTH_PROBE_TIMEOUT, DatabaseProbe
+from http_responses import init_app as init_responses
+from response_cache import SingleFlightCache
+from statements import PreparingConnection, StatementRegistry
+from metrics import WORKER_LAST_SUCCESS, WORKER_RUNS, init_app as init_metrics
+from profiler import init_app as init_profiler
+from tracing import init_app as init_tracing, span, traced
 
 app = Flask(__name__)
 
@@ -21,6 +33,80 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'postgres123')
 }
 
+class TracedCursor(psycopg2.extensions.cursor):
+    """Cursor timing statements and fetches as the db.execute span"""
+
+    def execute(self, query, vars=None):
+        with span('db.execute'):
+            return super().execute(query, vars)
+
+    def fetchone(self):
+        with span('db.execute'):
+            return super().fetchone()
+
+    def fetchall(self):
+        with span('db.execute'):
+            return super().fetchall()
+
+
+class TracedDictCursor(TracedCursor, RealDictCursor):
+    pass
+
+
+def connect_db():
+    """Open a new database connection"""
+    return psycopg2.connect(connection_factory=PreparingConnection, cursor_factory=TracedCursor,
+                            **DB_CONFIG)
+
+db_pool = ConnectionPool(connect_db)
+REGISTRY.register(db_pool)
+
+@contextmanager
+def db_connection():
+    """A pooled connection for the block; waiting for it is timed as the db.connect span"""
+    with span('db.connect'):
+        conn = db_pool.acquire()
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
+
+# Cached database health, refreshed in the background for /health, /livez and /readyz
+db_probe = DatabaseProbe(lambda: psycopg2.connect(connect_timeout=HEALTH_PROBE_TIMEOUT,
+                                                  options=f'-c statement_timeout={HEALTH_PROBE_TIMEOUT * 1000}',
+                                                  **DB_CONFIG))
+REGISTRY.register(db_probe)
+STARTED_AT = time.time()
+
+# Read endpoints' database aggregates, shared between concurrent pollers
+response_cache = SingleFlightCache()
+REGISTRY.register(response_cache)
+
+# Hot statements, prepared once per connection (see statements.py)
+statements = StatementRegistry()
+REGISTRY.register(statements)
+statements.register('insert_metric', '''
+    INSERT INTO performance_data (metric_name, metric_value, metadata)
+    VALUES (%s, %s, %s)
+''')
+statements.register('insert_computation_result', '''
+    INSERT INTO computation_results (computation_type, input_size, result, duration_ms)
+    VALUES (%s, %s, %s, %s)
+''')
+statements.register('recent_metrics_like', '''
+    SELECT * FROM performance_data
+    WHERE metric_name LIKE %s
+    ORDER BY timestamp DESC
+    LIMIT 10
+''')
+statements.register('metric_averages', '''
+    SELECT metric_name, AVG(metric_value) as avg_value
+    FROM performance_data
+    WHERE timestamp > NOW() - INTERVAL '5 minutes'
+    GROUP BY metric_name
+''')
+statements.register('count_records', "SELECT COUNT(*) FROM performance_data")
+
 # Global memory storage
 memory_cache = {}
 computation_results = []
@@ -29,39 +115,41 @@ background_tasks = []
 # Initialize database
 def init_db():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        
-        # Create tables
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS performance_data (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metric_name VARCHAR(50),
-                metric_value FLOAT,
-                metadata JSONB
-            )
-        ''')
-        
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS computation_results (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                computation_type VARCHAR(50),
-                input_size INTEGER,
-                result TEXT,
-                duration_ms FLOAT
-            )
-        ''')
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            
+            # Create tables
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS performance_data (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    metric_name VARCHAR(50),
+                    metric_value FLOAT,
+                    metadata JSONB
+                )
+            ''')
+            
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS computation_results (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    computation_type VARCHAR(50),
+                    input_size INTEGER,
+                    result TEXT,
+                    duration_ms FLOAT
+                )
+            ''')
+            
+            conn.commit()
+            cur.close()
+        # Plans prepared against the old tables must not be reused
+        statements.invalidate()
         print("Database initialized successfully")
     except Exception as e:
         print(f"Database initialization error: {e}")
 
 # CPU-intensive function
+@traced('compute')
 def cpu_intensive_task(iterations=1000000):
     """Perform CPU-intensive calculations"""
     start_time = time.time()
@@ -76,6 +164,7 @@ def cpu_intensive_task(iterations=1000000):
     return result, duration
 
 # Memory-intensive function
+@traced('compute')
 def memory_intensive_task(size_mb=10):
     """Allocate memory and perform operations"""
     start_time = time.time()
@@ -101,21 +190,18 @@ def background_worker():
     while True:
         try:
             # Simulate database operations
-            conn = psycopg2.connect(**DB_CONFIG)
-            cur = conn.cursor()
-            
-            # Insert random metrics
-            metrics = ['cpu_load', 'memory_usage', 'request_count', 'error_rate']
-            for metric in metrics:
-                value = random.uniform(0, 100)
-                cur.execute('''
-                    INSERT INTO performance_data (metric_name, metric_value, metadata)
-                    VALUES (%s, %s, %s)
-                ''', (metric, value, json.dumps({'source': 'background_worker'})))
-            
-            conn.commit()
-            cur.close()
-            conn.close()
+            with db_connection() as conn:
+                cur = conn.cursor()
+                
+                # Insert random metrics
+                metrics = ['cpu_load', 'memory_usage', 'request_count', 'error_rate']
+                for metric in metrics:
+                    value = random.uniform(0, 100)
+                    statements.execute(cur, 'insert_metric',
+                                       (metric, value, json.dumps({'source': 'background_worker'})))
+                
+                conn.commit()
+                cur.close()
             
             # Perform some computation
             result, duration = cpu_intensive_task(100000)
@@ -135,10 +221,13 @@ def background_worker():
                 for key in keys[:10]:
                     del memory_cache[key]
             
+            WORKER_RUNS.labels('success').inc()
+            WORKER_LAST_SUCCESS.set_to_current_time()
             time.sleep(5)  # Wait 5 seconds before next iteration
             
         except Exception as e:
             print(f"Background worker error: {e}")
+            WORKER_RUNS.labels('error').inc()
             time.sleep(10)
 
 # Start background workers
@@ -147,6 +236,44 @@ for i in range(3):  # Start 3 background workers
     thread.start()
     background_tasks.append(thread)
 
+# Priority class of each route for admission control (see admission.py)
+ROUTE_PRIORITIES = {
+    '/health': 'critical',
+    '/livez': 'critical',
+    '/readyz': 'critical',
+    '/metrics': 'critical',
+    '/api/stats': 'critical',
+    '/': 'interactive',
+    '/api/cpu-intensive': 'batch',
+    '/api/memory-intensive': 'batch',
+    '/api/database-intensive': 'batch',
+    '/api/combined-stress': 'batch',
+}
+
+init_metrics(app, memory_cache, computation_results, background_tasks)
+admission = init_admission(app, ROUTE_PRIORITIES)
+init_tracing(app)
+# JSON is encoded by the tracing provider (a FastJSONProvider)
+init_responses(app, json_provider=None)
+init_profiler(app)
+
+def count_db_records():
+    with db_connection() as conn:
+        cur = conn.cursor()
+        statements.execute(cur, 'count_records')
+        db_records = cur.fetchone()[0]
+        cur.close()
+    return db_records
+
+def recent_metrics():
+    """Average of each metric over the last 5 minutes"""
+    with db_connection() as conn:
+        cur = conn.cursor(cursor_factory=TracedDictCursor)
+        statements.execute(cur, 'metric_averages')
+        metrics = cur.fetchall()
+        cur.close()
+    return metrics
+
 @app.route('/')
 def index():
     html_template = '''
@@ -219,10 +346,13 @@ def index():
         <ul>
             <li><a href="/">/</a> - Main dashboard</li>
             <li><a href="/health">/health</a> - Health check</li>
+            <li><a href="/livez">/livez</a> - Liveness check</li>
+            <li><a href="/readyz">/readyz</a> - Readiness check with dependency status</li>
             <li><a href="/api/stats">/api/stats</a> - System statistics</li>
             <li><a href="/api/cpu-intensive">/api/cpu-intensive</a> - CPU intensive task</li>
             <li><a href="/api/memory-intensive">/api/memory-intensive</a> - Memory intensive task</li>
             <li><a href="/api/database-intensive">/api/database-intensive</a> - Database intensive task</li>
+            <li><a href="/metrics">/metrics</a> - Prometheus metrics</li>
         </ul>
         
         <script>
@@ -260,12 +390,7 @@ def index():
     
     # Get current statistics
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM performance_data")
-        db_records = cur.fetchone()[0]
-        cur.close()
-        conn.close()
+        db_records = response_cache.get('db_records', count_db_records)
     except:
         db_records = 0
     
@@ -278,37 +403,46 @@ def index():
 
 @app.route('/health')
 def health():
-    try:
-        # Check database connection
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.close()
+    # Last background probe of the database (see health.py)
+    if db_probe.healthy():
         return 'healthy\n', 200
-    except:
-        return 'unhealthy\n', 500
+    return 'unhealthy\n', 500
+
+@app.route('/livez')
+def livez():
+    """Liveness: the process is serving requests and its probe thread is running"""
+    alive = db_probe.thread.is_alive()
+    return jsonify({
+        'status': 'alive' if alive else 'dead',
+        'uptime_seconds': round(time.time() - STARTED_AT, 1)
+    }), 200 if alive else 500
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the database answers; includes the pool and worker state"""
+    ready = db_probe.healthy()
+    return jsonify({
+        'status': 'ready' if ready else 'unready',
+        'database': db_probe.status(),
+        'pool': db_pool.state(),
+        'background_workers': {
+            'alive': len([t for t in background_tasks if t.is_alive()]),
+            'configured': len(background_tasks)
+        }
+    }), 200 if ready else 503
 
 @app.route('/api/stats')
 def stats():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Get recent metrics
-        cur.execute('''
-            SELECT metric_name, AVG(metric_value) as avg_value
-            FROM performance_data
-            WHERE timestamp > NOW() - INTERVAL '5 minutes'
-            GROUP BY metric_name
-        ''')
-        metrics = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        metrics = response_cache.get('recent_metrics', recent_metrics)
         
         return jsonify({
             'timestamp': datetime.now().isoformat(),
             'memory_cache_size': len(memory_cache),
             'computation_results': len(computation_results),
             'background_tasks': len([t for t in background_tasks if t.is_alive()]),
+            'admission': admission.state() if admission else None,
+            'prepared_statements': statements.state(),
             'recent_metrics': metrics
         })
     except Exception as e:
@@ -321,15 +455,12 @@ def api_cpu_intensive():
     
     # Store result in database
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute('''
-            INSERT INTO computation_results (computation_type, input_size, result, duration_ms)
-            VALUES (%s, %s, %s, %s)
-        ''', ('cpu_intensive', iterations, str(result), duration))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            statements.execute(cur, 'insert_computation_result',
+                               ('cpu_intensive', iterations, str(result), duration))
+            conn.commit()
+            cur.close()
     except Exception as e:
         print(f"Database error: {e}")
     
@@ -359,30 +490,22 @@ def api_database_intensive():
     start_time = time.time()
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        
-        # Perform many database operations
-        for i in range(operations):
-            # Insert
-            cur.execute('''
-                INSERT INTO performance_data (metric_name, metric_value, metadata)
-                VALUES (%s, %s, %s)
-            ''', (f'test_metric_{i}', random.uniform(0, 100), json.dumps({'iteration': i})))
+        with db_connection() as conn:
+            cur = conn.cursor()
             
-            # Select
-            if i % 10 == 0:
-                cur.execute('''
-                    SELECT * FROM performance_data 
-                    WHERE metric_name LIKE %s 
-                    ORDER BY timestamp DESC 
-                    LIMIT 10
-                ''', (f'test_metric_%',))
-                results = cur.fetchall()
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+            # Perform many database operations
+            for i in range(operations):
+                # Insert
+                statements.execute(cur, 'insert_metric',
+                                   (f'test_metric_{i}', random.uniform(0, 100), json.dumps({'iteration': i})))
+                
+                # Select
+                if i % 10 == 0:
+                    statements.execute(cur, 'recent_metrics_like', (f'test_metric_%',))
+                    results = cur.fetchall()
+            
+            conn.commit()
+            cur.close()
         
         duration = (time.time() - start_time) * 1000
         
@@ -424,16 +547,14 @@ def api_combined_stress():
             
             # Database task
             try:
-                conn = psycopg2.connect(**DB_CONFIG)
-                cur = conn.cursor()
-                for i in range(10):
-                    cur.execute('''
-                        INSERT INTO performance_data (metric_name, metric_value, metadata)
-                        VALUES (%s, %s, %s)
-                    ''', (f'stress_test_{worker_id}', random.uniform(0, 100), json.dumps({'worker': worker_id})))
-                conn.commit()
-                cur.close()
-                conn.close()
+                with db_connection() as conn:
+                    cur = conn.cursor()
+                    for i in range(10):
+                        statements.execute(cur, 'insert_metric',
+                                           (f'stress_test_{worker_id}', random.uniform(0, 100),
+                                            json.dumps({'worker': worker_id})))
+                    conn.commit()
+                    cur.close()
             except Exception as e:
                 print(f"DB error in worker {worker_id}: {e}")
         
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+A blocking pool of database connections.
+
+Requests and background workers used to open (and tear down) a Postgres
+connection each time, which costs a TCP and authentication round trip per
+request and keeps the server busy forking backends. The pool keeps up to
+DB_POOL_SIZE connections open and hands them out per use, through
+app.py's db_connection():
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        ...
+        conn.commit()
+
+Connections are created on demand, so the app starts even while the
+database is down. A caller finding every connection busy waits up to
+DB_POOL_TIMEOUT seconds, then gets PoolExhausted. A connection returned
+with an open transaction is rolled back, and one that failed (or was
+closed by the server) is dropped and replaced on a later checkout.
+"""
+import os
+import threading
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection frees up within the pool timeout"""
+
+
+class ConnectionPool:
+    """Up to `size` connections made by `connect()`, shared between threads"""
+
+    def __init__(self, connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.discarded = 0
+        self.timeouts = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            if not self.idle and self.in_use >= self.size:
+                self.waiting += 1
+                try:
+                    if not self.condition.wait_for(lambda: self.idle or self.in_use < self.size,
+                                                   self.timeout):
+                        self.timeouts += 1
+                        raise PoolExhausted(f"No database connection free within {self.timeout:g}s")
+                finally:
+                    self.waiting -= 1
+            self.in_use += 1
+            if self.idle:
+                # Most recently used first, so surplus connections can go idle
+                return self.idle.pop()
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self.condition:
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created += 1
+        return conn
+
+    def release(self, conn):
+        broken = False
+        if not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                broken = True
+        if broken or conn.closed:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self.condition:
+            self.in_use -= 1
+            if broken or conn.closed:
+                self.discarded += 1
+            else:
+                self.idle.append(conn)
+            self.condition.notify()
+
+    def state(self):
+        return {'size': self.size, 'in_use': self.in_use, 'idle': len(self.idle),
+                'waiting': self.waiting, 'created': self.created,
+                'discarded': self.discarded, 'timeouts': self.timeouts}
+
+    def collect(self):
+        state = self.state()
+        yield GaugeMetricFamily('db_pool_size', 'Maximum pooled database connections', value=state['size'])
+        yield GaugeMetricFamily('db_pool_connections_in_use', 'Connections checked out',
+                                value=state['in_use'])
+        yield GaugeMetricFamily('db_pool_connections_idle', 'Open connections waiting to be used',
+                                value=state['idle'])
+        yield GaugeMetricFamily('db_pool_waiting', 'Threads waiting for a connection', value=state['waiting'])
+        yield CounterMetricFamily('db_pool_connections_created', 'Connections opened',
+                                  value=state['created'])
+        yield CounterMetricFamily('db_pool_connections_discarded', 'Connections dropped after failing',
+                                  value=state['discarded'])
+        yield CounterMetricFamily('db_pool_timeouts', 'Checkouts that timed out', value=state['timeouts'])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Cached database health probe behind /health, /livez and /readyz.
+
+/health used to open a new Postgres connection per call, and the compose
+healthcheck, the collector and the dashboard all call it, so health
+checking alone kept the database accepting and tearing down connections.
+Instead a background thread runs `SELECT 1` every HEALTH_PROBE_INTERVAL
+seconds on its own long-lived connection (outside the request pool, so a
+saturated pool doesn't read as a dead database) and keeps the result.
+The endpoints only read that result, which takes microseconds.
+
+A result older than HEALTH_PROBE_TTL seconds counts as a failure, so a
+wedged probe can't report healthy forever.
+"""
+import threading
+import time
+import os
+
+from prometheus_client.core import GaugeMetricFamily
+
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '2'))
+HEALTH_PROBE_TTL = float(os.getenv('HEALTH_PROBE_TTL', '10'))
+HEALTH_PROBE_TIMEOUT = 2  # seconds, for both connecting and the query
+
+
+class DatabaseProbe:
+    """Periodically checks the database from a background thread"""
+
+    def __init__(self, connect, interval=HEALTH_PROBE_INTERVAL, ttl=HEALTH_PROBE_TTL):
+        self.connect = connect
+        self.interval = interval
+        self.ttl = ttl
+        self.conn = None
+        self.probes = 0
+        self.failures = 0
+        # Replaced as a whole after each probe, so readers never see a partial result
+        self.result = {'ok': False, 'latency_ms': None, 'error': 'not probed yet', 'checked_at': None}
+        self.thread = threading.Thread(target=self.run, daemon=True, name='db-probe')
+        self.thread.start()
+
+    def probe(self):
+        started = time.perf_counter()
+        try:
+            if self.conn is None or self.conn.closed:
+                self.conn = self.connect()
+                self.conn.autocommit = True
+            with self.conn.cursor() as cur:
+                cur.execute('SELECT 1')
+                cur.fetchone()
+            result = {'ok': True, 'error': None}
+        except Exception as e:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            self.failures += 1
+            result = {'ok': False, 'error': str(e).strip()}
+        self.probes += 1
+        result.update(latency_ms=round((time.perf_counter() - started) * 1000, 2), checked_at=time.time())
+        self.result = result
+
+    def run(self):
+        while True:
+            self.probe()
+            time.sleep(self.interval)
+
+    def healthy(self):
+        result = self.result
+        return result['ok'] and time.time() - result['checked_at'] <= self.ttl
+
+    def status(self):
+        """The latest probe result, with its age"""
+        result = self.result
+        age = None if result['checked_at'] is None else round(time.time() - result['checked_at'], 3)
+        return dict(result, ok=self.healthy(), age_seconds=age, probes=self.probes, failures=self.failures)
+
+    def collect(self):
+        result = self.result
+        yield GaugeMetricFamily('db_up', 'Whether the last database probe succeeded',
+                                value=1 if self.healthy() else 0)
+        if result['latency_ms'] is not None:
+            yield GaugeMetricFamily('db_probe_latency_seconds', 'Latency of the last database probe',
+                                    value=result['latency_ms'] / 1000)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics for the application, exposed at /metrics.
+
+Request handling only touches counters and histograms, whose updates are a
+single short lock per value. Everything that has to be counted or walked
+(cache sizes, live background workers) is computed by a collector when the
+endpoint is scraped, so a scrape every second adds nothing to the request
+path.
+"""
+import time
+
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests handled',
+                   ['route', 'method', 'status'])
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['route'],
+                            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+REQUESTS_IN_PROGRESS = Gauge('http_requests_in_progress', 'HTTP requests being handled')
+
+WORKER_RUNS = Counter('background_worker_runs_total', 'Background worker iterations', ['outcome'])
+WORKER_LAST_SUCCESS = Gauge('background_worker_last_success_timestamp_seconds',
+                            'When a background worker iteration last succeeded')
+
+
+class AppStateCollector:
+    """Reports the application's in-memory state at scrape time"""
+
+    def __init__(self, memory_cache, computation_results, background_tasks):
+        self.memory_cache = memory_cache
+        self.computation_results = computation_results
+        self.background_tasks = background_tasks
+
+    def collect(self):
+        yield GaugeMetricFamily('memory_cache_entries', 'Entries in the memory cache',
+                                value=len(self.memory_cache))
+        yield GaugeMetricFamily('computation_results_stored', 'Computation results kept in memory',
+                                value=len(self.computation_results))
+        yield GaugeMetricFamily('background_workers_alive', 'Background worker threads running',
+                                value=sum(1 for thread in self.background_tasks if thread.is_alive()))
+        yield GaugeMetricFamily('background_workers_configured', 'Background worker threads started',
+                                value=len(self.background_tasks))
+
+
+def route_label():
+    """The matched URL rule, so /api/x?y=1 and path parameters share a series"""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def init_app(app, memory_cache, computation_results, background_tasks):
+    """Record request metrics for `app` and serve them at /metrics"""
+    REGISTRY.register(AppStateCollector(memory_cache, computation_results, background_tasks))
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+
+    @app.teardown_request
+    def stop_timer(exception=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        REQUESTS_IN_PROGRESS.dec()
+        route = route_label()
+        status = getattr(g, 'metrics_status', 500 if exception else 200)
+        REQUEST_LATENCY.labels(route).observe(time.perf_counter() - started)
+        REQUESTS.labels(route, request.method, str(status)).inc()
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(generate_latest(REGISTRY), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Opt-in sampling profiler for slow requests.
+
+Disabled unless one of the triggers is configured:
+
+  PROFILE_SLOW_MS   profile requests still running after this many ms
+  PROFILE_HEADER    profile requests carrying this header (e.g. X-Profile: 1)
+
+A watchdog thread wakes every PROFILE_INTERVAL seconds and, for each
+request that is being profiled (header) or has run past the threshold,
+records the stack of the thread handling it from sys._current_frames().
+Requests never pay for the sampling themselves: while enabled the request
+path only registers its thread in a dict, and when disabled nothing is
+installed at all.
+
+When a profiled request finishes its samples are written to PROFILE_DIR
+in the collapsed-stack format flame graph tools read (flamegraph.pl,
+speedscope), one "frame;frame;frame count" line per distinct stack:
+
+  /app/data/profiles/20250516-141617-GET-api-cpu-intensive-2315ms.folded
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+from metrics import route_label
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/app/data/profiles')
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '0'))  # 0 = off
+PROFILE_HEADER = os.getenv('PROFILE_HEADER', '')  # empty = off
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))  # seconds between samples
+PROFILE_MAX_DEPTH = 64
+
+
+class ProfiledRequest:
+    """Stacks sampled from one request's thread"""
+
+    def __init__(self, forced):
+        self.started = time.monotonic()
+        self.forced = forced
+        self.stacks = Counter()
+
+    def add(self, frame):
+        names = []
+        while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(names))] += 1
+
+
+class SamplingProfiler:
+    """Samples the stacks of slow (or explicitly requested) requests"""
+
+    def __init__(self, directory=PROFILE_DIR, slow_ms=PROFILE_SLOW_MS, interval=PROFILE_INTERVAL):
+        self.directory = directory
+        self.slow_seconds = slow_ms / 1000 if slow_ms > 0 else None
+        self.interval = interval
+        self.active = {}  # thread ident -> ProfiledRequest
+        self.thread = threading.Thread(target=self.run, daemon=True, name='profiler')
+        self.thread.start()
+
+    def begin(self, forced=False):
+        profiled = ProfiledRequest(forced)
+        self.active[threading.get_ident()] = profiled
+        return profiled
+
+    def end(self, profiled, label):
+        """Stop sampling the current thread; returns the dump's path, if one was written"""
+        self.active.pop(threading.get_ident(), None)
+        if not profiled.stacks:
+            return None
+        elapsed_ms = (time.monotonic() - profiled.started) * 1000
+        name = re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-') or 'root'
+        path = os.path.join(self.directory,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{elapsed_ms:.0f}ms.folded")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w') as f:
+                for stack, count in profiled.stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+        except OSError as e:
+            print(f"Profiler error: {e}")
+            return None
+        return path
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            now = time.monotonic()
+            frames = sys._current_frames()
+            for ident, profiled in list(self.active.items()):
+                if profiled.forced or (self.slow_seconds is not None and
+                                       now - profiled.started >= self.slow_seconds):
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        profiled.add(frame)
+
+
+def init_app(app):
+    """Install the profiler if a trigger is configured; returns it (or None)"""
+    if PROFILE_SLOW_MS <= 0 and not PROFILE_HEADER:
+        return None
+    profiler = SamplingProfiler()
+
+    @app.before_request
+    def start_profile():
+        forced = bool(PROFILE_HEADER) and bool(request.headers.get(PROFILE_HEADER))
+        if forced or profiler.slow_seconds is not None:
+            g.profile = profiler.begin(forced)
+
+    @app.teardown_request
+    def stop_profile(exception=None):
+        profiled = g.pop('profile', None)
+        if profiled is not None:
+            path = profiler.end(profiled, f'{request.method} {route_label()}')
+            if path:
+                print(f"Profiled slow request {request.method} {request.path}: {path}")
+
+    return profiler
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Single-flight micro-cache for read endpoints.
+
+Several pollers (dashboards, the load generator, curl loops) ask for the
+same aggregate many times a second. `SingleFlightCache.get(key, compute)`
+makes them share the work:
+
+  - a value computed less than `ttl` seconds ago is returned as is (hit);
+  - while one caller computes a value, concurrent callers for the same key
+    wait for that result instead of starting their own (coalesced);
+  - for `stale` seconds after the TTL, the old value is returned at once
+    while a single background refresh replaces it (stale-while-revalidate).
+
+Errors aren't cached: every caller waiting on a failed computation gets
+the exception, and the next call tries again.
+
+NOTE: each service is built from its own Docker context, so this module is
+duplicated in app/ and monitor-dashboard-service/. Keep them in sync.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+from prometheus_client.core import CounterMetricFamily
+
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '1'))
+RESPONSE_CACHE_STALE = float(os.getenv('RESPONSE_CACHE_STALE', '5'))
+
+
+class Flight:
+    """One in-progress computation other callers can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """Caches compute() results per key and coalesces concurrent computations"""
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, stale=RESPONSE_CACHE_STALE):
+        self.ttl = ttl
+        self.stale = stale
+        self.entries = {}  # key -> (computed at, value)
+        self.flights = {}  # key -> Flight
+        self.counts = defaultdict(int)  # (key, outcome) -> lookups
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            age = now - entry[0] if entry else None
+            if entry and age < self.ttl:
+                self.counts[key, 'hit'] += 1
+                return entry[1]
+            flight = self.flights.get(key)
+            if entry and age < self.ttl + self.stale:
+                self.counts[key, 'stale'] += 1
+                if flight is None:
+                    self.flights[key] = flight = Flight()
+                    threading.Thread(target=self.run, args=(key, flight, compute), daemon=True).start()
+                return entry[1]
+            leader = flight is None
+            if leader:
+                self.flights[key] = flight = Flight()
+                self.counts[key, 'miss'] += 1
+            else:
+                self.counts[key, 'coalesced'] += 1
+        if leader:
+            self.run(key, flight, compute)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def run(self, key, flight, compute):
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+        with self.lock:
+            if flight.error is None:
+                self.entries[key] = (time.monotonic(), flight.value)
+            else:
+                self.counts[key, 'error'] += 1
+            del self.flights[key]
+        flight.done.set()
+
+    def state(self):
+        """{key: {outcome: lookups}}"""
+        state = defaultdict(dict)
+        for (key, outcome), count in list(self.counts.items()):
+            state[key][outcome] = count
+        return dict(state)
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def collect(self):
+        family = CounterMetricFamily('response_cache_requests', 'Response cache lookups by outcome',
+                                     labels=['key', 'outcome'])
+        for (key, outcome), count in list(self.counts.items()):
+            family.add_metric([key, outcome], count)
+        yield family
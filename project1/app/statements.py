@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Registry of server-side prepared statements.
+
+The app's hot statements (the performance_data INSERT, the LIKE ... LIMIT
+10 lookup, the 5-minute GROUP BY) used to be sent as text and parsed and
+planned by Postgres on every execution. Registered statements are instead
+PREPAREd once per connection, the first time that connection runs them,
+and then run with EXECUTE:
+
+    statements.register('insert_metric',
+                        'INSERT INTO performance_data (metric_name, metric_value, metadata) '
+                        'VALUES (%s, %s, %s)')
+    statements.execute(cur, 'insert_metric', (name, value, metadata))
+
+Statements are written with psycopg2's %s placeholders; the registry turns
+them into $n parameters for PREPARE. Each connection remembers which
+statements it has prepared and for which schema version. After a schema
+migration, `invalidate()` bumps the version, and every connection drops its
+prepared statements (DEALLOCATE ALL) before its next execution, so no plan
+outlives the table definitions it was made for.
+
+Planning time saved is an estimate: each statement's planning time is
+measured once with EXPLAIN (SUMMARY), and counted as saved for every
+execution on a connection after the first PLAN_CACHE_CUSTOM_PLANS (until
+then Postgres builds custom plans for a prepared statement, and only its
+parsing is saved).
+"""
+import json
+import re
+import threading
+
+import psycopg2.extensions
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Executions of a prepared statement Postgres plans individually before
+# considering its generic plan (plan_cache_mode = auto)
+PLAN_CACHE_CUSTOM_PLANS = 5
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection tracking the statements prepared on it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = {}  # statement name -> executions on this connection
+        self.prepared_version = None
+
+
+class Statement:
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.params = sql.count('%s')
+        numbers = iter(range(1, self.params + 1))
+        self.prepare_sql = f'PREPARE {name} AS ' + re.sub('%s', lambda match: f'${next(numbers)}', sql)
+        self.execute_sql = f'EXECUTE {name}' + (f"({', '.join(['%s'] * self.params)})" if self.params else '')
+        self.planning_ms = None
+        self.executions = 0
+        self.prepares = 0
+        self.planned_executions = 0
+
+
+class StatementRegistry:
+    """Named statements, prepared per connection and run with EXECUTE"""
+
+    def __init__(self):
+        self.statements = {}
+        self.schema_version = 0
+        self.lock = threading.Lock()
+
+    def register(self, name, sql):
+        if not re.fullmatch(r'[a-z_][a-z0-9_]*', name):
+            raise ValueError(f"Invalid statement name {name!r}")
+        self.statements[name] = Statement(name, sql)
+
+    def invalidate(self):
+        """Drop every connection's prepared statements, e.g. after a schema migration"""
+        with self.lock:
+            self.schema_version += 1
+
+    def execute(self, cur, name, args=()):
+        """Run the registered statement `name` on `cur`, preparing it first if needed"""
+        statement = self.statements[name]
+        conn = cur.connection
+        prepared = conn.prepared
+        if conn.prepared_version != self.schema_version:
+            if prepared:
+                cur.execute('DEALLOCATE ALL')
+                prepared.clear()
+            conn.prepared_version = self.schema_version
+        if name not in prepared:
+            if statement.planning_ms is None:
+                statement.planning_ms = self.measure_planning(cur, statement, args)
+            cur.execute(statement.prepare_sql)
+            prepared[name] = 0
+            with self.lock:
+                statement.prepares += 1
+        cur.execute(statement.execute_sql, args)
+        prepared[name] += 1
+        with self.lock:
+            statement.executions += 1
+            if prepared[name] > PLAN_CACHE_CUSTOM_PLANS:
+                statement.planned_executions += 1
+
+    def measure_planning(self, cur, statement, args):
+        """Planning time (ms) of the statement sent as text; nothing is executed"""
+        cur.execute('EXPLAIN (SUMMARY, FORMAT JSON) ' + statement.sql, args)
+        plan = cur.fetchone()
+        plan = plan[0] if isinstance(plan, tuple) else next(iter(plan.values()))
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0].get('Planning Time', 0.0)
+
+    def state(self):
+        """Per-statement execution counts and estimated planning time saved (ms)"""
+        statements = {}
+        for name, statement in self.statements.items():
+            planning_ms = statement.planning_ms or 0.0
+            statements[name] = {
+                'executions': statement.executions,
+                'prepares': statement.prepares,
+                'planning_ms': round(planning_ms, 3),
+                'planning_saved_ms': round(statement.planned_executions * planning_ms, 3),
+            }
+        return {
+            'schema_version': self.schema_version,
+            'planning_saved_ms': round(sum(s['planning_saved_ms'] for s in statements.values()), 3),
+            'statements': statements,
+        }
+
+    def collect(self):
+        executions = CounterMetricFamily('prepared_statement_executions', 'Executions of prepared statements',
+                                         labels=['statement'])
+        prepares = CounterMetricFamily('prepared_statement_prepares', 'Times a statement was prepared',
+                                       labels=['statement'])
+        saved = CounterMetricFamily('prepared_statement_planning_saved_seconds',
+                                    'Estimated planning time saved by reusing plans', labels=['statement'])
+        planning = GaugeMetricFamily('prepared_statement_planning_seconds',
+                                     'Measured planning time of a statement', labels=['statement'])
+        for name, statement in self.statements.items():
+            planning_seconds = (statement.planning_ms or 0.0) / 1000
+            executions.add_metric([name], statement.executions)
+            prepares.add_metric([name], statement.prepares)
+            saved.add_metric([name], statement.planned_executions * planning_seconds)
+            planning.add_metric([name], planning_seconds)
+        yield executions
+        yield prepares
+        yield saved
+        yield planning
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Per-request latency breakdown into named spans.
+
+Code on the request path wraps its phases in `span(name)`:
+
+  db.connect   opening a database connection
+  db.execute   running statements and fetching their rows
+  compute      the CPU and memory tasks
+  serialize    encoding JSON responses
+
+Time spent in each span is summed per request, returned in a
+Server-Timing header (visible in the browser's network panel) and
+observed in the `http_request_span_seconds{route,span}` histogram, next to
+the request's total latency. Outside a request (background workers,
+stress threads) a span only costs the request-context check.
+"""
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context
+from prometheus_client import Histogram
+
+from http_responses import FastJSONProvider
+from metrics import route_label
+
+SPAN_LATENCY = Histogram('http_request_span_seconds', 'Time spent in a named span of a request',
+                         ['route', 'span'],
+                         buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's `name` span"""
+    if not has_request_context():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans = g.setdefault('spans', {})
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - started
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_spans():
+    """{span name: seconds} recorded so far for the current request"""
+    return g.get('spans', {}) if has_request_context() else {}
+
+
+class TracedJSONProvider(FastJSONProvider):
+    """The app's JSON provider, timing encoding as the serialize span"""
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def init_app(app):
+    """Time JSON encoding and report each request's spans"""
+    app.json = TracedJSONProvider(app)
+
+    @app.after_request
+    def report_spans(response):
+        spans = current_spans()
+        if spans:
+            route = route_label()
+            for name, seconds in spans.items():
+                SPAN_LATENCY.labels(route, name).observe(seconds)
+            response.headers['Server-Timing'] = ', '.join(
+                f'{name};dur={seconds * 1000:.2f}' for name, seconds in spans.items())
+        return response
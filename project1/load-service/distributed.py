@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Coordinator/worker control channel for distributed load generation.
+
+One stress-generator runs as the coordinator and the others (e.g. compose
+replicas) as workers. Workers connect to the coordinator over plain TCP and
+stay connected. Each cycle the coordinator hands every connected worker its
+share of the plan and a common start time; the workers sleep until then,
+run their share, and send back their stats for the coordinator to merge.
+Messages are JSON objects, one per line, so no broker is needed.
+
+  worker -> coordinator   {"type": "hello", "worker": "<hostname>"}
+  coordinator -> worker   {"type": "job", "index": 0, "workers": 3, "start_at": <epoch>, "plan": {...}}
+  worker -> coordinator   {"type": "result", ...} or {"type": "error", "error": "..."}
+"""
+import json
+import socket
+import threading
+import time
+
+# Seconds between sending the jobs and starting them, so every worker has
+# its plan before any of them begins
+START_DELAY = 3.0
+# Extra seconds to wait for results beyond the plan's expected duration
+RESULT_GRACE = 60.0
+# Seconds to wait for results of a plan with no fixed duration (phases of N requests)
+RESULT_TIMEOUT = 600.0
+
+
+def send_message(stream, message):
+    stream.write(json.dumps(message) + '\n')
+    stream.flush()
+
+
+def read_message(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    return json.loads(line)
+
+
+class WorkerConnection:
+    """A connected worker"""
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.stream = sock.makefile('rw', encoding='utf-8')
+        self.name = name
+
+    def close(self):
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Coordinator:
+    """Accepts workers in the background and runs cycles across them"""
+
+    def __init__(self, port):
+        self.server = socket.create_server(('', port))
+        self.workers = []
+        self.changed = threading.Condition()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            sock, address = self.server.accept()
+            sock.settimeout(10)
+            worker = WorkerConnection(sock, f"{address[0]}:{address[1]}")
+            try:
+                hello = read_message(worker.stream)
+            except (OSError, ValueError) as e:
+                print(f"Rejected connection from {worker.name}: {e}")
+                worker.close()
+                continue
+            worker.name = hello.get('worker', worker.name)
+            sock.settimeout(None)
+            with self.changed:
+                self.workers.append(worker)
+                self.changed.notify_all()
+                print(f"Worker {worker.name} connected ({len(self.workers)} connected)")
+
+    def _drop(self, worker, reason):
+        print(f"Dropping worker {worker.name}: {reason}")
+        worker.close()
+        with self.changed:
+            if worker in self.workers:
+                self.workers.remove(worker)
+
+    def wait_for_workers(self, count, timeout):
+        """Wait up to `timeout` seconds for `count` workers; returns whoever is connected"""
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.workers) >= count, timeout)
+            return list(self.workers)
+
+    def run(self, make_plans, count, wait, duration=None, result_timeout=RESULT_TIMEOUT):
+        """Run one cycle: returns the result messages of the workers that finished
+
+        make_plans(n) returns one plan per worker once the number of workers
+        is known. Results are due `duration` seconds after the start (or
+        `result_timeout` if the plan has no fixed duration) plus RESULT_GRACE.
+        Workers that fail or miss that deadline are dropped and reported;
+        their share of the load is missing from the results.
+        """
+        workers = self.wait_for_workers(count, wait)
+        if not workers:
+            return []
+        if len(workers) < count:
+            print(f"Only {len(workers)} of {count} workers connected, splitting the load between them")
+
+        start_at = time.time() + START_DELAY
+        started = []
+        for index, (worker, plan) in enumerate(zip(workers, make_plans(len(workers)))):
+            try:
+                send_message(worker.stream, {'type': 'job', 'index': index, 'workers': len(workers),
+                                             'start_at': start_at, 'plan': plan})
+                started.append(worker)
+            except OSError as e:
+                self._drop(worker, e)
+
+        # One deadline for all, so a hung worker can't hold up the cycle for more than it
+        deadline = start_at + (duration if duration is not None else result_timeout) + RESULT_GRACE
+        results = []
+        missing = []
+        for worker in started:
+            worker.sock.settimeout(max(deadline - time.time(), 0.001))
+            try:
+                message = read_message(worker.stream)
+            except socket.timeout:
+                self._drop(worker, f"no results within {deadline - start_at:g}s of the start")
+                missing.append(worker.name)
+                continue
+            except (OSError, ValueError) as e:
+                self._drop(worker, e)
+                missing.append(worker.name)
+                continue
+            worker.sock.settimeout(None)
+            if message.get('type') == 'error':
+                print(f"Worker {worker.name} failed: {message.get('error')}")
+                missing.append(worker.name)
+                continue
+            results.append(message)
+        if missing:
+            print(f"No results from {len(missing)} of {len(started)} workers: {', '.join(missing)}")
+        return results
+
+
+def run_worker(host, port, run_plan, retry_interval=2.0):
+    """Connect to the coordinator and run its jobs forever, reconnecting as needed
+
+    run_plan(plan) runs one share of the load and returns a JSON-friendly
+    dict of results.
+    """
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=10) as sock:
+                sock.settimeout(None)
+                stream = sock.makefile('rw', encoding='utf-8')
+                send_message(stream, {'type': 'hello', 'worker': socket.gethostname()})
+                print(f"Connected to coordinator {host}:{port}")
+                while True:
+                    job = read_message(stream)
+                    print(f"Job {job['index'] + 1} of {job['workers']} received")
+                    delay = job['start_at'] - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    try:
+                        result = dict(run_plan(job['plan']), type='result')
+                    except Exception as e:
+                        result = {'type': 'error', 'error': str(e)}
+                    send_message(stream, result)
+        except (OSError, ValueError) as e:
+            print(f"Coordinator {host}:{port} unavailable ({e}), retrying in {retry_interval:g}s")
+            time.sleep(retry_interval)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Asyncio load engine for the stress generator.
+
+One event loop drives every virtual user of a process over a shared pool of
+keep-alive connections, so thousands of requests can be in flight without a
+thread (or a fresh TCP handshake) per request. For more than one core's
+worth of load, run_processes() starts several engine processes and splits
+the virtual users between them.
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+
+import aiohttp
+
+from load_stats import LoadStats, PeriodicReporter
+from scenarios import Distribution
+
+REQUEST_TIMEOUT = 30  # seconds
+
+
+async def virtual_user(session, target_url, rng, config, mix, stats):
+    """One simulated client: request, think, repeat
+
+    Sends `requests_per_thread` requests, or keeps going for `duration`
+    seconds; think time is sampled from `think_time` (a Distribution) or
+    is the profile's fixed `delay`.
+    """
+    think_time = config.get('think_time') or Distribution.constant(config.get('delay', 0))
+    count = config.get('requests_per_thread')
+    deadline = time.monotonic() + config['duration'] if config.get('duration') else None
+    sent = 0
+    while (count is None or sent < count) and (deadline is None or time.monotonic() < deadline):
+        sent += 1
+        endpoint = mix.next(rng)
+        started = time.perf_counter()
+        try:
+            async with session.get(f"{target_url}{endpoint}") as response:
+                # Drain the body so the connection goes back to the pool
+                await response.read()
+            stats.record(endpoint, time.perf_counter() - started, status=response.status)
+        except Exception as e:
+            stats.record(endpoint, time.perf_counter() - started, error=e)
+        await asyncio.sleep(think_time.sample(rng))
+
+
+def user_rng(seed, user_id):
+    """Random source of one virtual user: seeded users replay the same requests
+    whichever process they end up in"""
+    return random.Random(f"{seed}:{user_id}") if seed is not None else random.Random()
+
+
+async def run_users(target_url, config, mix, users, stats, first_user_id=0, seed=None):
+    """Run `users` virtual users to completion over one connection pool"""
+    connector = aiohttp.TCPConnector(limit=users, limit_per_host=users,
+                                     keepalive_timeout=60, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*(
+            virtual_user(session, target_url, user_rng(seed, first_user_id + i), config, mix, stats)
+            for i in range(users)
+        ))
+
+
+def run_cycle(target_url, config, mix, users, first_user_id=0, seed=None,
+              report_interval=0, prefix=''):
+    """Run one stress cycle in this process (blocking); returns its LoadStats"""
+    stats = LoadStats()
+    reporter = PeriodicReporter(stats, report_interval, prefix).start()
+    try:
+        asyncio.run(run_users(target_url, config, mix, users, stats, first_user_id, seed))
+    finally:
+        reporter.stop()
+    return stats
+
+
+def _run_worker(args):
+    # Pool workers ship their stats back in dict form
+    return run_cycle(*args).to_dict()
+
+
+def split_users(users, processes):
+    """Split virtual users as evenly as possible: 10 over 3 -> [4, 3, 3]"""
+    base, extra = divmod(users, processes)
+    return [base + (1 if i < extra else 0) for i in range(processes) if base or i < extra]
+
+
+def run_processes(target_url, config, mix, users, processes, seed=None, report_interval=0):
+    """Run one stress cycle across several engine processes; returns the merged LoadStats"""
+    if processes <= 1:
+        return run_cycle(target_url, config, mix, users, seed=seed, report_interval=report_interval)
+
+    jobs = []
+    first_user_id = 0
+    for index, share in enumerate(split_users(users, processes)):
+        jobs.append((target_url, config, mix, share, first_user_id, seed, report_interval, f"[p{index}] "))
+        first_user_id += share
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(_run_worker, jobs)
+
+    stats = LoadStats.from_dict(results[0])
+    for result in results[1:]:
+        stats.merge(LoadStats.from_dict(result))
+    return stats
+
+
+def process_count(setting):
+    """PROCESSES setting to a count: a number, or 'auto' for one per core"""
+    if setting == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(setting))
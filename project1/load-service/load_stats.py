@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput recording for the stress generator.
+
+Latencies go into HDR-style log-linear histograms: values are kept in
+microseconds with about 1% precision across the whole range (1us to an
+hour) in a fixed, small number of buckets, so recording is O(1), memory
+doesn't grow with the number of requests, and histograms from several
+processes or machines can be merged exactly by adding bucket counts.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# 2**7 sub-buckets per power of two -> relative error under 1%
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_BITS = SUB_BUCKET_BITS - 1
+MAX_VALUE_US = 3600 * 1000 * 1000  # one hour
+
+REPORT_PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << SUB_BUCKET_HALF_BITS) + (value >> shift)
+
+
+def _bucket_value(index):
+    """Representative (midpoint) value of a bucket"""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = (index >> SUB_BUCKET_HALF_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_HALF_BITS)
+    return (mantissa << shift) + ((1 << shift) >> 1)
+
+
+BUCKET_COUNT = _bucket_index(MAX_VALUE_US) + 1
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram with mergeable bucket counts"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1000000), 0), MAX_VALUE_US)
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total_us += value
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, p):
+        """Latency in seconds at percentile p (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_value(index), self.max_us) / 1000000
+        return self.max_us / 1000000
+
+    def mean(self):
+        return self.total_us / self.count / 1000000 if self.count else 0.0
+
+    def summary(self):
+        """Latency summary in milliseconds"""
+        result = {
+            'count': self.count,
+            'min_ms': (self.min_us or 0) / 1000,
+            'mean_ms': round(self.mean() * 1000, 3),
+            'max_ms': self.max_us / 1000,
+        }
+        for p in REPORT_PERCENTILES:
+            result[f"p{p:g}_ms"] = round(self.percentile(p) * 1000, 3)
+        return result
+
+    def to_dict(self):
+        """Sparse, JSON-friendly form for shipping between processes"""
+        return {
+            'buckets': {index: count for index, count in enumerate(self.counts) if count},
+            'count': self.count,
+            'total_us': self.total_us,
+            'min_us': self.min_us,
+            'max_us': self.max_us,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for index, count in data['buckets'].items():
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total_us = data['total_us']
+        histogram.min_us = data['min_us']
+        histogram.max_us = data['max_us']
+        return histogram
+
+
+def classify_error(status=None, error=None):
+    """Error class of a request outcome, 'ok' for success"""
+    if error is not None:
+        name = type(error).__name__.lower()
+        if 'timeout' in name:
+            return 'timeout'
+        if 'connect' in name or isinstance(error, ConnectionError):
+            return 'connect'
+        return 'other'
+    if status is None:
+        return 'other'
+    if status >= 500:
+        return 'http_5xx'
+    if status >= 400:
+        return 'http_4xx'
+    return 'ok'
+
+
+class EndpointStats:
+    """Latency histogram and outcome counts for one endpoint"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.outcomes = defaultdict(int)
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] += count
+
+    @property
+    def errors(self):
+        return sum(count for outcome, count in self.outcomes.items() if outcome != 'ok')
+
+
+class LoadStats:
+    """Per-endpoint latencies, outcome counts and per-second throughput"""
+
+    def __init__(self, started=None):
+        self.started = started or time.time()
+        self.endpoints = defaultdict(EndpointStats)
+        # second since start -> completed requests
+        self.throughput = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, latency, status=None, error=None):
+        """Record one request; endpoints are grouped by path, without the query"""
+        path = endpoint.split('?', 1)[0]
+        outcome = classify_error(status, error)
+        second = int(time.time() - self.started)
+        with self.lock:
+            stats = self.endpoints[path]
+            stats.latency.record(latency)
+            stats.outcomes[outcome] += 1
+            self.throughput[second] += 1
+
+    def total(self):
+        total = EndpointStats()
+        for stats in self.endpoints.values():
+            total.merge(stats)
+        return total
+
+    def merge(self, other):
+        offset = int(other.started - self.started)
+        with self.lock:
+            for path, stats in other.endpoints.items():
+                self.endpoints[path].merge(stats)
+            for second, count in other.throughput.items():
+                self.throughput[second + offset] += count
+
+    def compact_summary(self, previous_count=0, interval=None):
+        """One-line progress summary; returns (line, total request count)"""
+        with self.lock:
+            total = self.total()
+        count = total.latency.count
+        elapsed = time.time() - self.started
+        rate = (count - previous_count) / interval if interval else count / max(elapsed, 1e-9)
+        line = (f"t={elapsed:6.0f}s  req={count:<8} rps={rate:8.1f}  errors={total.errors:<6} "
+                f"p50={total.latency.percentile(50) * 1000:7.1f}ms  "
+                f"p99={total.latency.percentile(99) * 1000:7.1f}ms  "
+                f"max={total.latency.max_us / 1000:7.1f}ms")
+        return line, count
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'started': self.started,
+                'endpoints': {path: {'latency': stats.latency.to_dict(), 'outcomes': dict(stats.outcomes)}
+                              for path, stats in self.endpoints.items()},
+                'throughput': dict(self.throughput),
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(started=data['started'])
+        for path, endpoint in data['endpoints'].items():
+            endpoint_stats = stats.endpoints[path]
+            endpoint_stats.latency = LatencyHistogram.from_dict(endpoint['latency'])
+            endpoint_stats.outcomes.update(endpoint['outcomes'])
+        for second, count in data['throughput'].items():
+            stats.throughput[int(second)] = count
+        return stats
+
+    def report(self, label=''):
+        """End-of-cycle report with per-endpoint percentiles and error classes"""
+        with self.lock:
+            seconds = sorted(self.throughput)
+            series = [self.throughput.get(second, 0) for second in range(seconds[-1] + 1)] if seconds else []
+            endpoints = {path: dict(stats.latency.summary(), errors=dict(stats.outcomes))
+                         for path, stats in sorted(self.endpoints.items())}
+            total = self.total()
+        duration = len(series)
+        return {
+            'label': label,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'duration_s': duration,
+            'throughput_rps': round(total.latency.count / duration, 2) if duration else 0,
+            'per_second': series,
+            'total': dict(total.latency.summary(), errors=dict(total.outcomes)),
+            'endpoints': endpoints,
+        }
+
+
+def write_report(report, directory):
+    """Write a report as JSON and CSV; returns the JSON path"""
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    name = f"load_report_{report['label'] + '_' if report['label'] else ''}{stamp}"
+    json_path = os.path.join(directory, f"{name}.json")
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    columns = ['count', 'min_ms', 'mean_ms'] + [f"p{p:g}_ms" for p in REPORT_PERCENTILES] + ['max_ms']
+    with open(os.path.join(directory, f"{name}.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['endpoint'] + columns + ['errors'])
+        rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+        for endpoint, summary in rows:
+            errors = sum(count for outcome, count in summary['errors'].items() if outcome != 'ok')
+            writer.writerow([endpoint] + [summary[column] for column in columns] + [errors])
+    return json_path
+
+
+def print_report(report):
+    """Print an end-of-cycle report as a compact table"""
+    print(f"{'endpoint':<32}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  errors")
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for endpoint, summary in rows:
+        errors = {outcome: count for outcome, count in summary['errors'].items() if outcome != 'ok'}
+        print(f"{endpoint:<32}{summary['count']:>8}{summary['p50_ms']:>9.1f}ms{summary['p90_ms']:>8.1f}ms"
+              f"{summary['p99_ms']:>8.1f}ms{summary['max_ms']:>8.1f}ms  {errors or '-'}")
+    print(f"Throughput: {report['throughput_rps']} req/s over {report['duration_s']}s")
+
+
+class PeriodicReporter:
+    """Prints a compact summary of a LoadStats every `interval` seconds"""
+
+    def __init__(self, stats, interval, prefix=''):
+        self.stats = stats
+        self.interval = interval
+        self.prefix = prefix
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _run(self):
+        previous = 0
+        while not self.stopped.wait(self.interval):
+            line, previous_now = self.stats.compact_summary(previous, self.interval)
+            previous = previous_now
+            print(f"{self.prefix}{line}", flush=True)
+
+    def start(self):
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
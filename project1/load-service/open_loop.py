@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Open-loop (constant arrival rate) load generation.
+
+The closed-loop generator waits for each response before sending the next
+request, so when the app slows down the offered load drops with it and the
+slow period is under-sampled (coordinated omission). Here requests are
+issued on a schedule of target rates regardless of how the app is doing,
+and latency is measured from each request's *intended* send time, so any
+queueing in the generator or the app shows up in the numbers.
+
+A schedule is a list of phases, each with a duration and a rate that moves
+linearly from start_rate to end_rate:
+
+  constant  - one phase at RATE
+  ramp      - RATE to RAMP_TO over DURATION
+  step      - STEPS="rate:seconds,rate:seconds,..."
+  spike     - RATE, then SPIKE_RATE for SPIKE_DURATION, then RATE again
+"""
+import asyncio
+import multiprocessing
+import random
+from collections import namedtuple
+
+import aiohttp
+
+from load_engine import REQUEST_TIMEOUT, split_users
+from load_stats import LoadStats, PeriodicReporter
+
+Phase = namedtuple('Phase', 'name duration start_rate end_rate')
+
+
+def build_schedule(kind, rate, duration, ramp_to=None, steps=None,
+                   spike_rate=None, spike_duration=None):
+    """Build the list of phases for a schedule kind"""
+    if kind == 'ramp':
+        return [Phase(f"ramp {rate:g}->{ramp_to:g}/s", duration, rate, ramp_to)]
+    if kind == 'step':
+        return [Phase(f"step {step_rate:g}/s", step_duration, step_rate, step_rate)
+                for step_rate, step_duration in steps]
+    if kind == 'spike':
+        before = duration / 2
+        return [
+            Phase(f"base {rate:g}/s", before, rate, rate),
+            Phase(f"spike {spike_rate:g}/s", spike_duration, spike_rate, spike_rate),
+            Phase(f"recovery {rate:g}/s", duration - before, rate, rate),
+        ]
+    return [Phase(f"constant {rate:g}/s", duration, rate, rate)]
+
+
+def parse_steps(text):
+    """'10:30,20:30' -> [(10.0, 30.0), (20.0, 30.0)]"""
+    steps = []
+    for item in text.split(','):
+        rate, duration = item.split(':')
+        steps.append((float(rate), float(duration)))
+    return steps
+
+
+def scale_schedule(schedule, factor):
+    """Scale every phase's rate, to split a schedule across processes"""
+    return [phase._replace(start_rate=phase.start_rate * factor, end_rate=phase.end_rate * factor)
+            for phase in schedule]
+
+
+def arrival_times(schedule, poisson=True, rng=random):
+    """Yield (offset in seconds from start, phase index) for every request
+
+    With poisson=True inter-arrival gaps are exponentially distributed,
+    otherwise requests are evenly spaced. Each gap is the time over which
+    the phase's (linear) rate integrates to the drawn number of arrivals,
+    so a ramp starting from 0 fills in as soon as the rate rises.
+    """
+    phase_start = 0.0
+    t = 0.0
+    for index, phase in enumerate(schedule):
+        phase_end = phase_start + phase.duration
+        slope = (phase.end_rate - phase.start_rate) / phase.duration if phase.duration else 0.0
+        while True:
+            rate = phase.start_rate + slope * (t - phase_start)
+            if rate <= 0:
+                if slope <= 0:
+                    break  # no arrivals for the rest of the phase
+                # Idle until the rate rises above 0
+                t = phase_start - phase.start_rate / slope
+                rate = 0.0
+            arrivals = rng.expovariate(1.0) if poisson else 1.0
+            # Solve rate*gap + slope/2*gap^2 = arrivals for the gap
+            discriminant = rate * rate + 2 * slope * arrivals
+            if discriminant < 0:
+                break  # the rate falls to 0 first
+            t += 2 * arrivals / (rate + discriminant ** 0.5)
+            if t >= phase_end:
+                break
+            yield t, index
+        t = phase_end
+        phase_start = phase_end
+
+
+class PhaseStats:
+    """Request counts and latencies (from intended send time) for one phase"""
+
+    def __init__(self, phase, stats=None):
+        self.phase = phase
+        self.sent = 0
+        self.dropped = 0
+        self.stats = stats or LoadStats()
+
+    def merge(self, other):
+        self.sent += other.sent
+        self.dropped += other.dropped
+        self.stats.merge(other.stats)
+
+    def to_dict(self):
+        return {'phase': list(self.phase), 'sent': self.sent, 'dropped': self.dropped,
+                'stats': self.stats.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        phase_stats = cls(Phase(*data['phase']), LoadStats.from_dict(data['stats']))
+        phase_stats.sent = data['sent']
+        phase_stats.dropped = data['dropped']
+        return phase_stats
+
+    def summary(self):
+        total = self.stats.total()
+        latency = total.latency
+        target = (self.phase.start_rate + self.phase.end_rate) / 2
+        achieved = latency.count / self.phase.duration if self.phase.duration else 0
+        return (f"{self.phase.name:<24} target {target:8.1f}/s  achieved {achieved:8.1f}/s  "
+                f"p50 {latency.percentile(50) * 1000:8.1f}ms  p90 {latency.percentile(90) * 1000:8.1f}ms  "
+                f"p99 {latency.percentile(99) * 1000:8.1f}ms  errors {total.errors}  dropped {self.dropped}")
+
+
+async def run_open_loop(target_url, mix, schedule, poisson=True, max_in_flight=1000, seed=None,
+                        overall=None):
+    """Issue requests on the schedule; returns a PhaseStats per phase
+
+    Every request is also recorded in `overall` (a LoadStats), if given,
+    for progress reporting across phases.
+    """
+    rng = random.Random(seed)
+    stats = [PhaseStats(phase) for phase in schedule]
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+
+    connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=max_in_flight,
+                                     keepalive_timeout=60, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def fire(endpoint, intended, phase_stats):
+            status = error = None
+            try:
+                async with session.get(f"{target_url}{endpoint}") as response:
+                    await response.read()
+                    status = response.status
+            except Exception as e:
+                error = e
+            latency = loop.time() - intended
+            phase_stats.stats.record(endpoint, latency, status=status, error=error)
+            if overall is not None:
+                overall.record(endpoint, latency, status=status, error=error)
+
+        start = loop.time()
+        for offset, index in arrival_times(schedule, poisson, rng):
+            intended = start + offset
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            phase_stats = stats[index]
+            # Never wait for a free slot: that would turn this back into a closed loop
+            if len(in_flight) >= max_in_flight:
+                phase_stats.dropped += 1
+                continue
+            phase_stats.sent += 1
+            task = loop.create_task(fire(mix.next(rng), intended, phase_stats))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+    return stats
+
+
+def run_open_loop_process(target_url, mix, schedule, poisson=True, max_in_flight=1000, seed=None,
+                          report_interval=0, prefix=''):
+    """Run the schedule in this process with periodic progress output"""
+    overall = LoadStats()
+    reporter = PeriodicReporter(overall, report_interval, prefix).start()
+    try:
+        return asyncio.run(run_open_loop(target_url, mix, schedule, poisson, max_in_flight, seed,
+                                         overall))
+    finally:
+        reporter.stop()
+
+
+def _run_worker(args):
+    return [phase_stats.to_dict() for phase_stats in run_open_loop_process(*args)]
+
+
+def run_open_loop_processes(target_url, mix, schedule, poisson=True, max_in_flight=1000,
+                            processes=1, seed=None, report_interval=0):
+    """Run the schedule split evenly over several processes and merge the stats"""
+    if processes <= 1:
+        return run_open_loop_process(target_url, mix, schedule, poisson, max_in_flight, seed,
+                                     report_interval)
+
+    shares = split_users(max_in_flight, processes)
+    part = scale_schedule(schedule, 1.0 / len(shares))
+    jobs = [(target_url, mix, part, poisson, share, None if seed is None else seed + i,
+             report_interval, f"[p{i}] ")
+            for i, share in enumerate(shares)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(_run_worker, jobs)
+
+    merged = [PhaseStats.from_dict(data) for data in results[0]]
+    for result in results[1:]:
+        for total, data in zip(merged, result):
+            total.merge(PhaseStats.from_dict(data))
+    for total, phase in zip(merged, schedule):
+        total.phase = phase
+    return merged
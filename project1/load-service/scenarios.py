@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Declarative load scenarios.
+
+A scenario file (YAML or JSON) describes a traffic shape to replay against
+the app: a weighted mix of endpoints with query-parameter distributions,
+phases with durations and either target rates (open loop) or user counts
+(closed loop), think time between a user's requests, and a seed so runs
+are reproducible.
+
+  name: production
+  seed: 42
+  think_time: {distribution: exponential, mean: 0.5}
+  phases:
+    - {name: warmup, duration: 60, rate: 5}
+    - {name: peak, duration: 120, rate: 20, ramp_to: 40}
+  endpoints:
+    - {path: /, weight: 10}
+    - path: /api/cpu-intensive
+      weight: 2
+      params:
+        iterations: {distribution: choice, values: [100000, 500000], weights: [3, 1]}
+
+Closed-loop phases may give `requests` (per user) instead of a duration.
+
+Distributions: constant (value), choice (values, weights), uniform (min, max),
+uniform_int (min, max), normal (mean, std), lognormal (mean, sigma of the
+underlying normal - or median), exponential (mean). normal/lognormal accept
+optional min/max clamps.
+"""
+import bisect
+import copy
+import json
+import math
+import os
+
+try:
+    import yaml
+except ImportError:  # YAML scenarios need PyYAML; JSON ones don't
+    yaml = None
+
+# Seed offset between the shares of a split scenario
+SEED_STRIDE = 1000
+
+SCENARIO_DIR = os.getenv('SCENARIO_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios'))
+
+
+class ScenarioError(ValueError):
+    """Raised for invalid scenario files"""
+
+
+# Fields each distribution needs (lognormal also needs a median or a mean)
+REQUIRED_FIELDS = {
+    'constant': ('value',),
+    'choice': ('values',),
+    'uniform': ('min', 'max'),
+    'uniform_int': ('min', 'max'),
+    'normal': ('mean', 'std'),
+    'lognormal': ('sigma',),
+    'exponential': ('mean',),
+}
+
+
+class Distribution:
+    """A sampler for parameter values and think times"""
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            spec = {'distribution': 'constant', 'value': spec}
+        self.spec = spec
+        self.kind = spec.get('distribution', 'constant')
+        if self.kind not in REQUIRED_FIELDS:
+            raise ScenarioError(f"Unknown distribution: {self.kind}")
+        # Checked here so a bad spec fails when the scenario loads, not mid-run
+        missing = [field for field in REQUIRED_FIELDS[self.kind] if field not in spec]
+        if self.kind == 'lognormal' and 'median' not in spec and 'mean' not in spec:
+            missing.append('median or mean')
+        if missing:
+            raise ScenarioError(f"{self.kind} distribution needs {', '.join(missing)}")
+        if self.kind == 'exponential' and not spec['mean'] > 0:
+            raise ScenarioError("exponential distribution needs a positive mean")
+        if self.kind == 'choice':
+            weights = spec.get('weights') or [1] * len(spec['values'])
+            if len(weights) != len(spec['values']):
+                raise ScenarioError("choice distribution needs one weight per value")
+            self.values = list(spec['values'])
+            self.cumulative = _cumulative(weights)
+
+    @classmethod
+    def constant(cls, value):
+        return cls({'distribution': 'constant', 'value': value})
+
+    def sample(self, rng):
+        spec = self.spec
+        kind = self.kind
+        if kind == 'constant':
+            return spec['value']
+        if kind == 'choice':
+            return self.values[_weighted_index(self.cumulative, rng)]
+        if kind == 'uniform':
+            return rng.uniform(spec['min'], spec['max'])
+        if kind == 'uniform_int':
+            return rng.randint(spec['min'], spec['max'])
+        if kind == 'exponential':
+            return rng.expovariate(1.0 / spec['mean'])
+        if kind == 'normal':
+            value = rng.gauss(spec['mean'], spec['std'])
+        else:
+            mu = math.log(spec['median']) if 'median' in spec else spec['mean']
+            value = rng.lognormvariate(mu, spec['sigma'])
+        if 'min' in spec:
+            value = max(spec['min'], value)
+        if 'max' in spec:
+            value = min(spec['max'], value)
+        return int(round(value)) if spec.get('integer') else value
+
+
+def _cumulative(weights):
+    total = 0
+    cumulative = []
+    for weight in weights:
+        if weight < 0:
+            raise ScenarioError("weights must not be negative")
+        total += weight
+        cumulative.append(total)
+    if total <= 0:
+        raise ScenarioError("weights must add up to more than zero")
+    return cumulative
+
+
+def _weighted_index(cumulative, rng):
+    return bisect.bisect_right(cumulative, rng.random() * cumulative[-1])
+
+
+class EndpointMix:
+    """Weighted endpoint choice with sampled query parameters"""
+
+    def __init__(self, endpoints):
+        if not endpoints:
+            raise ScenarioError("a scenario needs at least one endpoint")
+        self.paths = []
+        self.params = []
+        weights = []
+        for endpoint in endpoints:
+            self.paths.append(endpoint['path'])
+            weights.append(endpoint.get('weight', 1))
+            self.params.append([(name, Distribution(spec))
+                                for name, spec in (endpoint.get('params') or {}).items()])
+        self.cumulative = _cumulative(weights)
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Equal-weight mix of fixed paths (the built-in stress profiles)"""
+        return cls([{'path': path} for path in paths])
+
+    def next(self, rng):
+        """Pick the next request path, including its query string"""
+        index = _weighted_index(self.cumulative, rng) if len(self.paths) > 1 else 0
+        params = self.params[index]
+        if not params:
+            return self.paths[index]
+        query = '&'.join(f"{name}={distribution.sample(rng)}" for name, distribution in params)
+        separator = '&' if '?' in self.paths[index] else '?'
+        return f"{self.paths[index]}{separator}{query}"
+
+
+class Scenario:
+    """A parsed scenario file"""
+
+    def __init__(self, data):
+        self.data = data
+        self.name = data.get('name', 'scenario')
+        self.seed = data.get('seed')
+        self.arrivals = data.get('arrivals', 'poisson')
+        self.think_time = Distribution(data.get('think_time', 0))
+        self.mix = EndpointMix(data.get('endpoints', []))
+        self.phases = data.get('phases', [])
+        if not self.phases:
+            raise ScenarioError("a scenario needs at least one phase")
+        has_rate = ['rate' in phase for phase in self.phases]
+        if any(has_rate) and not all(has_rate):
+            raise ScenarioError("either every phase has a rate (open loop) or none does (closed loop)")
+        self.open_loop = all(has_rate)
+        for index, phase in enumerate(self.phases):
+            phase.setdefault('name', f"phase {index + 1}")
+            if 'duration' not in phase and (self.open_loop or 'requests' not in phase):
+                raise ScenarioError(f"phase '{phase['name']}' has no duration")
+            if not self.open_loop:
+                phase.setdefault('users', 1)
+
+    def duration(self):
+        """Total length in seconds, or None if a phase is bounded by request count"""
+        if any('duration' not in phase for phase in self.phases):
+            return None
+        return sum(phase['duration'] for phase in self.phases)
+
+
+def split_scenario(data, parts):
+    """Split a scenario's load into `parts` shares for separate generators
+
+    Open-loop rates are divided evenly; closed-loop users are dealt out as
+    evenly as possible, so a share may get no users for a phase. Each share
+    gets its own seed.
+    """
+    shares = []
+    for index in range(parts):
+        share = copy.deepcopy(data)
+        if share.get('seed') is not None:
+            share['seed'] += index * SEED_STRIDE
+        for phase in share['phases']:
+            if 'rate' in phase:
+                phase['rate'] /= parts
+                if 'ramp_to' in phase:
+                    phase['ramp_to'] /= parts
+            else:
+                base, extra = divmod(phase.get('users', 1), parts)
+                phase['users'] = base + (1 if index < extra else 0)
+        shares.append(share)
+    return shares
+
+
+def find_scenario(name):
+    """Path of a scenario given a file path or a name in SCENARIO_DIR; None if not found"""
+    if os.path.isfile(name):
+        return name
+    for extension in ('.yaml', '.yml', '.json'):
+        path = os.path.join(SCENARIO_DIR, name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_scenario(path):
+    """Load and validate a scenario file"""
+    with open(path, 'r') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+        elif yaml is None:
+            raise ScenarioError(f"PyYAML is required to read {path}")
+        else:
+            data = yaml.safe_load(f)
+    if not isinstance(data, dict):
+        raise ScenarioError(f"{path} does not contain a scenario")
+    return Scenario(data)
@@ -6,8 +6,52 @@ import requests
 import threading
 from concurrent.futures import ThreadPoolExecutor
 
+from distributed import Coordinator, run_worker
+from load_engine import run_processes, process_count
+from load_stats import LoadStats, PeriodicReporter, print_report, write_report
+from open_loop import Phase, PhaseStats, build_schedule, parse_steps, run_open_loop_processes
+from scenarios import EndpointMix, Scenario, find_scenario, load_scenario, split_scenario
+
 TARGET_URL = os.getenv('TARGET_URL', 'http://web-app')
 STRESS_LEVEL = os.getenv('STRESS_LEVEL', 'low')
+# Scenario file (path, or name of a file in scenarios/) describing the traffic;
+# a STRESS_LEVEL that isn't a built-in profile is looked up as a scenario too
+SCENARIO = os.getenv('SCENARIO')
+# "async" (default) drives all users from one event loop per process;
+# "threads" is the original one-thread-per-user generator
+LOAD_ENGINE = os.getenv('LOAD_ENGINE', 'async')
+# Engine processes for the async engine: a number or "auto" (one per core)
+PROCESSES = os.getenv('PROCESSES', '1')
+# Overrides the profile's number of concurrent users (async engine handles thousands)
+CONCURRENCY = os.getenv('CONCURRENCY')
+
+# "closed" (users wait for each response) or "open" (requests issued at a target rate)
+LOAD_MODE = os.getenv('LOAD_MODE', 'closed')
+# Open-loop schedule: constant, ramp, step or spike
+SCHEDULE = os.getenv('SCHEDULE', 'constant')
+RATE = float(os.getenv('RATE', '10'))                    # requests per second
+DURATION = float(os.getenv('DURATION', '60'))            # seconds
+RAMP_TO = float(os.getenv('RAMP_TO', '100'))             # final rate of a ramp
+STEPS = os.getenv('STEPS', '10:30,20:30,40:30,80:30')    # rate:seconds,... for step
+SPIKE_RATE = float(os.getenv('SPIKE_RATE', '100'))       # rate during a spike
+SPIKE_DURATION = float(os.getenv('SPIKE_DURATION', '10'))
+ARRIVALS = os.getenv('ARRIVALS', 'poisson')              # poisson or uniform
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', '1000'))  # requests beyond this are dropped
+
+# "standalone", or "coordinator"/"worker" to spread the load over several generators:
+# the coordinator splits it between the workers and merges their results
+ROLE = os.getenv('ROLE', 'standalone')
+COORDINATOR_HOST = os.getenv('COORDINATOR_HOST', 'stress-coordinator')
+COORDINATOR_PORT = int(os.getenv('COORDINATOR_PORT', '7000'))
+WORKERS = int(os.getenv('WORKERS', '1'))                 # workers the coordinator waits for
+WORKER_WAIT = float(os.getenv('WORKER_WAIT', '60'))      # seconds to wait for them
+# Seconds to wait for a worker's results when the scenario has no fixed duration
+RESULT_TIMEOUT = float(os.getenv('RESULT_TIMEOUT', '600'))
+
+# Seconds between compact progress lines (0 disables them)
+REPORT_INTERVAL = float(os.getenv('REPORT_INTERVAL', '5'))
+# Where end-of-cycle JSON/CSV reports are written (empty disables them)
+REPORT_DIR = os.getenv('REPORT_DIR', '/app/reports')
 
 # Stress level configurations
 STRESS_CONFIGS = {
@@ -19,53 +63,224 @@ STRESS_CONFIGS = {
     'memory-intensive': {'threads': 10, 'requests_per_thread': 50, 'delay': 0.1, 'memory_focus': True}
 }
 
-def generate_load(thread_id, config):
+def endpoints_for(config):
+    """Choose endpoints based on stress configuration"""
+    if config.get('cpu_focus'):
+        return ['/api/cpu-intensive?iterations=500000']
+    elif config.get('memory_focus'):
+        return ['/api/memory-intensive?size_mb=20']
+    return [
+        '/',
+        '/api/stats',
+        '/health',
+        '/api/cpu-intensive?iterations=100000',
+        '/api/memory-intensive?size_mb=5',
+        '/api/database-intensive?operations=50',
+        '/api/combined-stress?duration=5'
+    ]
+
+def generate_load(thread_id, config, stats):
     """Generate load on the target application"""
+    mix = EndpointMix.from_paths(endpoints_for(config))
+    rng = random.Random()
+    # Reuse one keep-alive connection per thread instead of reconnecting per request
+    session = requests.Session()
     for i in range(config['requests_per_thread']):
+        endpoint = mix.next(rng)
+        started = time.perf_counter()
         try:
-            # Choose endpoint based on stress configuration
-            if config.get('cpu_focus'):
-                endpoints = ['/api/cpu-intensive?iterations=500000']
-            elif config.get('memory_focus'):
-                endpoints = ['/api/memory-intensive?size_mb=20']
-            else:
-                endpoints = [
-                    '/',
-                    '/api/stats',
-                    '/health',
-                    '/api/cpu-intensive?iterations=100000',
-                    '/api/memory-intensive?size_mb=5',
-                    '/api/database-intensive?operations=50',
-                    '/api/combined-stress?duration=5'
-                ]
-            
-            endpoint = random.choice(endpoints)
-            
-            response = requests.get(f"{TARGET_URL}{endpoint}", timeout=30)
-            print(f"Thread {thread_id}: Request {i+1} to {endpoint} - Status: {response.status_code}")
-            
-            time.sleep(config['delay'])
+            response = session.get(f"{TARGET_URL}{endpoint}", timeout=30)
+            stats.record(endpoint, time.perf_counter() - started, status=response.status_code)
         except Exception as e:
-            print(f"Thread {thread_id}: Error - {str(e)}")
+            stats.record(endpoint, time.perf_counter() - started, error=e)
+
+        time.sleep(config['delay'])
+    session.close()
+
+def run_threads(config):
+    """Run one cycle with the thread-per-user generator"""
+    stats = LoadStats()
+    reporter = PeriodicReporter(stats, REPORT_INTERVAL).start()
+    with ThreadPoolExecutor(max_workers=config['threads']) as executor:
+        futures = []
+        for i in range(config['threads']):
+            future = executor.submit(generate_load, i, config, stats)
+            futures.append(future)
+
+        # Wait for all threads to complete
+        for future in futures:
+            future.result()
+    reporter.stop()
+    return stats
+
+def env_schedule():
+    """The open-loop schedule configured through the environment"""
+    return build_schedule(SCHEDULE, RATE, DURATION, ramp_to=RAMP_TO, steps=parse_steps(STEPS),
+                          spike_rate=SPIKE_RATE, spike_duration=SPIKE_DURATION)
+
+def run_open_loop_cycle(config, processes):
+    """Run the open-loop schedule once and print the capacity curve"""
+    phases = run_open_loop_processes(TARGET_URL, EndpointMix.from_paths(endpoints_for(config)), env_schedule(),
+                                     poisson=(ARRIVALS == 'poisson'), max_in_flight=MAX_IN_FLIGHT,
+                                     processes=processes, report_interval=REPORT_INTERVAL)
+    print_capacity_curve(phases)
+    return merge_phases(phases)
+
+def print_capacity_curve(phases):
+    print("Capacity curve (latency measured from intended send time):")
+    for phase_stats in phases:
+        print(f"  {phase_stats.summary()}")
+
+def merge_phases(phases):
+    """Merge per-phase stats into one LoadStats"""
+    stats = LoadStats(started=phases[0].stats.started)
+    for phase_stats in phases:
+        stats.merge(phase_stats.stats)
+    return stats
+
+def run_scenario(scenario, processes):
+    """Run every phase of a scenario once
+
+    Returns the merged LoadStats and, for open-loop scenarios, the PhaseStats
+    of each phase (None otherwise). Each phase gets its own seed (scenario
+    seed + phase index), so a seeded scenario sends the same requests, with
+    the same parameters and think times, every cycle.
+    """
+    seed = scenario.seed
+    if scenario.open_loop:
+        schedule = [Phase(phase['name'], phase['duration'], phase['rate'], phase.get('ramp_to', phase['rate']))
+                    for phase in scenario.phases]
+        phases = run_open_loop_processes(TARGET_URL, scenario.mix, schedule,
+                                         poisson=(scenario.arrivals == 'poisson'), max_in_flight=MAX_IN_FLIGHT,
+                                         processes=processes, seed=seed, report_interval=REPORT_INTERVAL)
+        return merge_phases(phases), phases
+
+    stats = LoadStats()
+    for index, phase in enumerate(scenario.phases):
+        length = f"for {phase['duration']}s" if 'duration' in phase else f"x {phase['requests']} requests"
+        print(f"Phase {phase['name']}: {phase['users']} users {length}")
+        if not phase['users']:
+            # A worker's share can be empty; stay in step with the other workers
+            time.sleep(phase.get('duration', 0))
+            continue
+        config = {'duration': phase.get('duration'), 'requests_per_thread': phase.get('requests'),
+                  'think_time': scenario.think_time}
+        stats.merge(run_processes(TARGET_URL, config, scenario.mix, phase['users'], processes,
+                                  seed=None if seed is None else seed + index,
+                                  report_interval=REPORT_INTERVAL))
+    return stats, None
+
+def profile_scenario(config):
+    """The built-in profile (or the open-loop schedule) as scenario data, for distributed runs"""
+    data = {'name': STRESS_LEVEL, 'arrivals': ARRIVALS,
+            'endpoints': [{'path': path} for path in endpoints_for(config)]}
+    if LOAD_MODE == 'open':
+        data['phases'] = [{'name': phase.name, 'duration': phase.duration,
+                           'rate': phase.start_rate, 'ramp_to': phase.end_rate}
+                          for phase in env_schedule()]
+    else:
+        data['think_time'] = config['delay']
+        data['phases'] = [{'name': STRESS_LEVEL, 'users': config['threads'],
+                           'requests': config['requests_per_thread']}]
+    return data
+
+def run_worker_plan(plan):
+    """Run one share of a distributed cycle; returns its results for the coordinator"""
+    scenario = Scenario(plan)
+    stats, phases = run_scenario(scenario, process_count(PROCESSES))
+    return {'stats': stats.to_dict(),
+            'phases': [phase_stats.to_dict() for phase_stats in phases] if phases else None}
+
+def coordinate(data):
+    """Run cycles of a scenario spread over the workers, reporting the merged results"""
+    scenario = Scenario(data)
+    coordinator = Coordinator(COORDINATOR_PORT)
+    print(f"Coordinator listening on port {COORDINATOR_PORT}, waiting for {WORKERS} workers")
+    while True:
+        results = coordinator.run(lambda workers: split_scenario(scenario.data, workers),
+                                  WORKERS, WORKER_WAIT, scenario.duration(), RESULT_TIMEOUT)
+        if results:
+            stats = LoadStats.from_dict(results[0]['stats'])
+            for result in results[1:]:
+                stats.merge(LoadStats.from_dict(result['stats']))
+            if results[0]['phases']:
+                phases = [PhaseStats.from_dict(data) for data in results[0]['phases']]
+                for result in results[1:]:
+                    for total, data in zip(phases, result['phases']):
+                        total.merge(PhaseStats.from_dict(data))
+                for total, phase in zip(phases, scenario.phases):
+                    total.phase = Phase(phase['name'], phase['duration'], phase['rate'],
+                                        phase.get('ramp_to', phase['rate']))
+                print_capacity_curve(phases)
+            print(f"Merged results from {len(results)} workers")
+            report_cycle(stats, scenario.name)
+        else:
+            print("No worker results this cycle")
+
+        print(f"Completed cycle. Waiting 10 seconds before next cycle...")
+        time.sleep(10)
+
+def report_cycle(stats, label):
+    """Print the end-of-cycle report and save it as JSON/CSV"""
+    report = stats.report(label=label)
+    print_report(report)
+    if REPORT_DIR:
+        try:
+            print(f"Report written to {write_report(report, REPORT_DIR)}")
+        except OSError as e:
+            print(f"Could not write report: {e}")
 
 def main():
-    config = STRESS_CONFIGS.get(STRESS_LEVEL, STRESS_CONFIGS['low'])
+    if ROLE == 'worker':
+        print(f"Starting stress worker for coordinator {COORDINATOR_HOST}:{COORDINATOR_PORT}")
+        run_worker(COORDINATOR_HOST, COORDINATOR_PORT, run_worker_plan)
+        return
+
+    processes = process_count(PROCESSES)
+    scenario_name = SCENARIO or (STRESS_LEVEL if STRESS_LEVEL not in STRESS_CONFIGS else None)
+    scenario_path = find_scenario(scenario_name) if scenario_name else None
+    if scenario_name and not scenario_path:
+        print(f"Scenario {scenario_name} not found, using the low profile")
+    config = dict(STRESS_CONFIGS.get(STRESS_LEVEL, STRESS_CONFIGS['low']))
+    if CONCURRENCY:
+        config['threads'] = int(CONCURRENCY)
+
+    if ROLE == 'coordinator':
+        coordinate(load_scenario(scenario_path).data if scenario_path else profile_scenario(config))
+        return
+
+    if scenario_path:
+        scenario = load_scenario(scenario_path)
+        print(f"Starting stress test - Scenario: {scenario.name} ({scenario_path})")
+        print(f"{'Open' if scenario.open_loop else 'Closed'} loop, {len(scenario.phases)} phases, "
+              f"seed {scenario.seed}, {processes} processes")
+        while True:
+            stats, phases = run_scenario(scenario, processes)
+            if phases:
+                print_capacity_curve(phases)
+            report_cycle(stats, scenario.name)
+            print(f"Completed cycle. Waiting 10 seconds before next cycle...")
+            time.sleep(10)
+
     print(f"Starting stress test - Level: {STRESS_LEVEL}")
     print(f"Configuration: {config}")
-    
+    if LOAD_MODE == 'open':
+        print(f"Open loop: {SCHEDULE} schedule, {ARRIVALS} arrivals, {processes} processes")
+    else:
+        print(f"Engine: {LOAD_ENGINE}" + (f" ({processes} processes)" if LOAD_ENGINE == 'async' else ""))
+
     while True:
-        with ThreadPoolExecutor(max_workers=config['threads']) as executor:
-            futures = []
-            for i in range(config['threads']):
-                future = executor.submit(generate_load, i, config)
-                futures.append(future)
-            
-            # Wait for all threads to complete
-            for future in futures:
-                future.result()
-        
+        if LOAD_MODE == 'open':
+            stats = run_open_loop_cycle(config, processes)
+        elif LOAD_ENGINE == 'threads':
+            stats = run_threads(config)
+        else:
+            stats = run_processes(TARGET_URL, config, EndpointMix.from_paths(endpoints_for(config)),
+                                  config['threads'], processes, report_interval=REPORT_INTERVAL)
+        report_cycle(stats, STRESS_LEVEL)
+
         print(f"Completed cycle. Waiting 10 seconds before next cycle...")
         time.sleep(10)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Adaptive sampling interval for the collector.
+
+A fixed SAMPLE_INTERVAL is either too coarse during an incident or too
+expensive the rest of the time. With SAMPLING=adaptive the collector asks
+`AdaptiveScheduler` for the delay before each next sample:
+
+  - SAMPLE_INTERVAL_MIN (default 1s) while something is going on: a rule's
+    metric at NEAR_THRESHOLD of its threshold or firing, a metric that moved
+    by FAST_CHANGE of its threshold since the previous sample, a change of
+    container or health state, or a Docker event; it stays fast for
+    HOLD_SECONDS after the last such trigger;
+  - otherwise the interval grows by BACKOFF per sample up to
+    SAMPLE_INTERVAL_MAX (default 30s).
+
+Sampling overhead is capped per monitored target: SAMPLING_BUDGET is the
+share of wall time the collector may spend sampling it (default 2%), so an
+interval is never shorter than the average sample duration divided by the
+budget - a target whose samples get slow is sampled less often, even
+during an incident, though never less often than SAMPLE_INTERVAL_MAX.
+The sample duration excludes waiting for the app's health check, which
+takes up to its timeout exactly when the app hangs.
+"""
+import os
+
+from rules import sample_value
+
+SAMPLING = os.getenv('SAMPLING', 'fixed')  # 'fixed' or 'adaptive'
+SAMPLE_INTERVAL_MIN = float(os.getenv('SAMPLE_INTERVAL_MIN', '1'))
+SAMPLE_INTERVAL_MAX = float(os.getenv('SAMPLE_INTERVAL_MAX', '30'))
+SAMPLING_BUDGET = float(os.getenv('SAMPLING_BUDGET', '0.02'))
+
+NEAR_THRESHOLD = 0.8  # share of a rule's threshold that counts as close to it
+FAST_CHANGE = 0.1  # change between two samples, as a share of the threshold, that counts as rapid
+HOLD_SECONDS = 30
+BACKOFF = 1.5
+COST_ALPHA = 0.2  # weight of the latest sample in the average sample duration
+
+
+def status_sample(status):
+    """The collector's status as the metric names rules use"""
+    sample = dict(status.get('resources') or {})
+    sample.update(cpu_percent=status.get('cpu'), memory_percent=status.get('memory_percent'),
+                  response_time_ms=status.get('response_time'), status=status.get('app_status'))
+    return sample
+
+
+class AdaptiveScheduler:
+    """Picks the next sampling interval from how close to trouble the last sample was"""
+
+    def __init__(self, min_interval=SAMPLE_INTERVAL_MIN, max_interval=SAMPLE_INTERVAL_MAX,
+                 budget=SAMPLING_BUDGET):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.budget = budget
+        self.interval = min_interval
+        self.fast_until = 0.0
+        self.trigger_reason = None
+        self.reason = 'starting'
+        self.cost = None
+        self.previous = None
+
+    def trigger(self, now, reason):
+        """Sample fast for the next HOLD_SECONDS"""
+        self.fast_until = now + HOLD_SECONDS
+        self.trigger_reason = reason
+
+    def urgency(self, status, rules):
+        """Why the latest sample calls for fast sampling, None if it doesn't"""
+        previous, self.previous = self.previous, status
+        if previous is not None and (previous['status'], previous.get('app_status')) != \
+                (status['status'], status.get('app_status')):
+            return 'state changed'
+        if status['status'] != 'running':
+            return None
+        sample = status_sample(status)
+        before = status_sample(previous) if previous is not None and previous['status'] == 'running' else {}
+        for rule in rules:
+            value = sample_value(sample, rule.metric)
+            if value is None or not rule.threshold:
+                continue
+            if rule.firing:
+                return f"{rule.name} firing"
+            if value >= NEAR_THRESHOLD * rule.threshold:
+                return f"{rule.name} near threshold"
+            last = sample_value(before, rule.metric)
+            if last is not None and abs(value - last) >= FAST_CHANGE * rule.threshold:
+                return f"{rule.name} changing fast"
+        return None
+
+    def next_interval(self, now, status, rules, sample_seconds):
+        """Seconds until the next sample, after a sample that took `sample_seconds`
+        (not counting the health check)"""
+        self.cost = sample_seconds if self.cost is None else (
+            COST_ALPHA * sample_seconds + (1 - COST_ALPHA) * self.cost)
+        reason = self.urgency(status, rules)
+        if reason:
+            self.trigger(now, reason)
+        if now < self.fast_until:
+            interval = self.min_interval
+            reason = self.trigger_reason
+        else:
+            interval = min(self.interval * BACKOFF, self.max_interval)
+            reason = 'steady' if interval >= self.max_interval else 'backing off'
+        floor = min(self.cost / self.budget, self.max_interval) if self.budget > 0 else 0.0
+        if floor > interval:
+            interval = floor
+            reason += ', over budget'
+        self.interval, self.reason = interval, reason
+        return interval
+
+    def state(self):
+        return {'mode': 'adaptive', 'interval': round(self.interval, 3), 'reason': self.reason,
+                'min_interval': self.min_interval, 'max_interval': self.max_interval,
+                'budget': self.budget, 'sample_cost_seconds': None if self.cost is None else round(self.cost, 6)}
+
+
+def scheduler_from_env():
+    """AdaptiveScheduler if SAMPLING=adaptive, None for a fixed SAMPLE_INTERVAL"""
+    return AdaptiveScheduler() if SAMPLING == 'adaptive' else None
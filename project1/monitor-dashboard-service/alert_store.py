@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Indexed alert history backed by SQLite.
+
+The alert log stays the source of truth: the store follows it from a saved
+byte offset and indexes every record by time and type, so the dashboard can
+answer "latest N" and time-range queries without reading the log. Rows are
+keyed by their position in the log, which makes ingesting idempotent -
+several processes may sync the same log safely. When the log is truncated
+or replaced, rows from the earlier contents keep their data but lose their
+position (log_inode becomes NULL), so new alerts at the same offsets are
+not mistaken for them.
+"""
+import os
+import sqlite3
+import threading
+
+from alert_records import parse_alert_line
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    epoch REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    alert_type TEXT NOT NULL,
+    severity TEXT,
+    metric TEXT,
+    value REAL,
+    threshold REAL,
+    message TEXT,
+    log_inode INTEGER,
+    log_offset INTEGER,
+    UNIQUE (log_inode, log_offset)
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_epoch ON alerts (epoch);
+CREATE INDEX IF NOT EXISTS idx_alerts_type_epoch ON alerts (alert_type, epoch);
+CREATE TABLE IF NOT EXISTS alert_type_counts (
+    alert_type TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingest_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    log_inode INTEGER,
+    log_offset INTEGER
+);
+'''
+
+ALERT_COLUMNS = ('epoch', 'timestamp', 'alert_type', 'severity', 'metric', 'value', 'threshold', 'message')
+
+MAX_PAGE_SIZE = 500
+
+
+class AlertStore:
+    """Alert history with a time index, populated from the alert log"""
+
+    def __init__(self, db_path, log_path):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def sync(self):
+        """Index alerts appended to the log since the last sync
+
+        Costs a single stat() when nothing new was written. Returns the
+        number of alerts added.
+        """
+        try:
+            stat = os.stat(self.log_path)
+        except OSError:
+            return 0
+
+        with self.lock:
+            row = self.conn.execute('SELECT log_inode, log_offset FROM ingest_state WHERE id = 1').fetchone()
+            inode, offset = (row['log_inode'], row['log_offset']) if row else (None, 0)
+            # Start over if the log was rotated or truncated
+            if inode != stat.st_ino or stat.st_size < offset:
+                inode, offset = stat.st_ino, 0
+                # Alerts already stored for this inode are from earlier contents
+                # (truncated in place, or an old file whose inode was reused)
+                with self.conn:
+                    self.conn.execute('UPDATE alerts SET log_inode = NULL WHERE log_inode = ?', (inode,))
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO ingest_state (id, log_inode, log_offset) VALUES (1, ?, 0)',
+                        (inode,))
+            if stat.st_size == offset:
+                return 0
+
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(stat.st_size - offset)
+            # Leave a partially written last line for the next sync
+            data = data[:data.rfind(b'\n') + 1]
+
+            rows = []
+            position = offset
+            for raw in data.split(b'\n')[:-1]:
+                record = parse_alert_line(raw.decode('utf-8', 'replace'))
+                if record:
+                    rows.append(tuple(record[column] for column in ALERT_COLUMNS) + (inode, position))
+                position += len(raw) + 1
+
+            with self.conn:
+                added = 0
+                for row in rows:
+                    cursor = self.conn.execute(
+                        'INSERT OR IGNORE INTO alerts (epoch, timestamp, alert_type, severity, metric, '
+                        'value, threshold, message, log_inode, log_offset) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+                    if cursor.rowcount:
+                        added += 1
+                        self.conn.execute(
+                            'INSERT INTO alert_type_counts (alert_type, count) VALUES (?, 1) '
+                            'ON CONFLICT (alert_type) DO UPDATE SET count = count + 1', (row[2],))
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO ingest_state (id, log_inode, log_offset) VALUES (1, ?, ?)',
+                    (inode, offset + len(data)))
+            return added
+
+    def version(self):
+        """Changes whenever alerts are added: the ingest position in the log"""
+        with self.lock:
+            row = self.conn.execute('SELECT log_inode, log_offset FROM ingest_state WHERE id = 1').fetchone()
+        return f"{row['log_inode']}-{row['log_offset']}" if row else 'empty'
+
+    def query(self, start=None, end=None, alert_types=None, limit=50, offset=0):
+        """Alerts in a time range, newest first, with per-type counts
+
+        start/end are epoch seconds (inclusive); alert_types is an optional
+        list of types to keep. Returns a dict with the page of alerts, the
+        total matching count and counts per type over the same range.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+
+        range_clauses = []
+        range_params = []
+        if start is not None:
+            range_clauses.append('epoch >= ?')
+            range_params.append(start)
+        if end is not None:
+            range_clauses.append('epoch <= ?')
+            range_params.append(end)
+
+        clauses = list(range_clauses)
+        params = list(range_params)
+        if alert_types:
+            clauses.append(f"alert_type IN ({', '.join('?' for _ in alert_types)})")
+            params.extend(alert_types)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        range_where = f"WHERE {' AND '.join(range_clauses)}" if range_clauses else ''
+
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT * FROM alerts {where} ORDER BY epoch DESC, id DESC LIMIT ? OFFSET ?',
+                params + [limit, offset]).fetchall()
+            if range_clauses:
+                counts = self.conn.execute(
+                    f'SELECT alert_type, COUNT(*) AS count FROM alerts {range_where} GROUP BY alert_type',
+                    range_params).fetchall()
+            else:
+                # Whole history: use the running totals instead of a scan
+                counts = self.conn.execute('SELECT alert_type, count FROM alert_type_counts').fetchall()
+
+        counts = {row['alert_type']: row['count'] for row in counts}
+        if alert_types:
+            total = sum(counts.get(alert_type, 0) for alert_type in alert_types)
+        else:
+            total = sum(counts.values())
+
+        return {
+            'alerts': [_row_to_alert(row) for row in rows],
+            'total': total,
+            'counts': counts,
+            'limit': limit,
+            'offset': offset,
+            'next_offset': offset + limit if offset + limit < total else None,
+        }
+
+
+def _row_to_alert(row):
+    return {column: row[column] for column in ALERT_COLUMNS}
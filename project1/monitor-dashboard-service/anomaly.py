@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Online anomaly detection over the collected metric series.
+
+Static thresholds either page constantly or miss regressions, depending on
+the traffic. This detector learns each metric's normal level instead:
+
+  - an exponentially weighted moving mean and variance (EWMA), and
+  - optionally one EWMA per hour of day, for daily seasonality
+
+A sample is anomalous when it sits more than `z_threshold` standard
+deviations above the expected value. Each update is O(1) and memory per
+metric is bounded (at most 25 baselines of three numbers each).
+
+Anomalies are reported as alert records in the normal alert log format.
+The module also works as a replay tool for tuning against history:
+
+  python3 anomaly.py /var/log/container_metrics.csv --z 3,4,5 --alpha 0.05,0.1
+"""
+import argparse
+import time
+
+from alert_records import make_alert
+from metrics_csv import read_samples
+from rules import sample_value
+
+# metric -> (alert type, label, unit, minimum standard deviation)
+ANOMALY_METRICS = {
+    'cpu_percent': ('Anomalous CPU', 'CPU usage', '%', 1.0),
+    'memory_percent': ('Anomalous Memory', 'Memory usage', '%', 1.0),
+    'response_time_ms': ('Anomalous Response Time', 'Response time', 'ms', 5.0),
+}
+
+
+class EwmaBaseline:
+    """Exponentially weighted mean and variance of a series"""
+
+    __slots__ = ('alpha', 'mean', 'var', 'count')
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if self.count == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            increment = self.alpha * delta
+            self.mean += increment
+            self.var = (1 - self.alpha) * (self.var + delta * increment)
+        self.count += 1
+
+
+class MetricDetector:
+    """Anomaly state for one metric"""
+
+    def __init__(self, metric, alpha, z_threshold, clear_z, warmup, seasonal):
+        self.metric = metric
+        self.alert_type, self.label, self.unit, self.min_std = ANOMALY_METRICS[metric]
+        self.z_threshold = z_threshold
+        self.clear_z = clear_z
+        self.warmup = warmup
+        self.baseline = EwmaBaseline(alpha)
+        self.hourly = [EwmaBaseline(alpha) for _ in range(24)] if seasonal else None
+        self.anomalous = False
+        self.last_z = 0.0
+        self.expected_value = 0.0
+        self.expected_std = 0.0
+
+    def expected(self, hour):
+        """Baseline for a sample: the hour-of-day one once it has warmed up"""
+        if self.hourly is not None and self.hourly[hour].count >= self.warmup:
+            return self.hourly[hour]
+        return self.baseline
+
+    def update(self, epoch, value):
+        """Score then learn one sample; returns 'fire', 'clear' or None"""
+        hour = time.localtime(epoch).tm_hour if self.hourly is not None else 0
+        baseline = self.expected(hour)
+        transition = None
+
+        if baseline.count >= self.warmup:
+            std = max(baseline.var ** 0.5, self.min_std, 0.05 * abs(baseline.mean))
+            self.last_z = (value - baseline.mean) / std
+            if not self.anomalous and self.last_z > self.z_threshold:
+                self.anomalous = True
+                transition = 'fire'
+            elif self.anomalous and self.last_z < self.clear_z:
+                self.anomalous = False
+                transition = 'clear'
+            self.expected_value = baseline.mean
+            self.expected_std = std
+
+        self.baseline.update(value)
+        if self.hourly is not None:
+            self.hourly[hour].update(value)
+        return transition
+
+    def make_alert(self, transition, epoch, value):
+        upper = self.expected_value + self.z_threshold * self.expected_std
+        if transition == 'fire':
+            message = (f"{self.label} {value:.2f}{self.unit} is {self.last_z:.1f} std devs above "
+                       f"baseline {self.expected_value:.2f}{self.unit}")
+        else:
+            message = f"{self.label} back to baseline at {value:.2f}{self.unit}"
+        return make_alert(
+            self.alert_type, message,
+            metric=self.metric, value=value, threshold=round(upper, 2),
+            severity='warning' if transition == 'fire' else 'ok',
+            epoch=epoch,
+        )
+
+
+class AnomalyDetector:
+    """EWMA (optionally hour-of-day seasonal) anomaly detection per metric"""
+
+    def __init__(self, metrics=tuple(ANOMALY_METRICS), alpha=0.1, z_threshold=4.0,
+                 clear_z=1.0, warmup=20, seasonal=False):
+        self.detectors = [MetricDetector(metric, alpha, z_threshold, clear_z, warmup, seasonal)
+                          for metric in metrics]
+
+    def evaluate(self, epoch, sample):
+        """Feed one sample; returns the alert records for anomaly transitions"""
+        alerts = []
+        for detector in self.detectors:
+            value = sample_value(sample, detector.metric)
+            if value is None:
+                continue
+            transition = detector.update(epoch, value)
+            if transition:
+                alerts.append(detector.make_alert(transition, epoch, value))
+        return alerts
+
+
+def _float_list(text):
+    return [float(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the anomaly detector over a metrics CSV')
+    parser.add_argument('metrics_file', nargs='?', default='/var/log/container_metrics.csv')
+    parser.add_argument('--alpha', type=_float_list, default=[0.1], help='EWMA weight(s), comma-separated')
+    parser.add_argument('--z', type=_float_list, default=[4.0], help='z-score threshold(s), comma-separated')
+    parser.add_argument('--warmup', type=int, default=20, help='samples before scoring starts')
+    parser.add_argument('--seasonal', action='store_true', help='use hour-of-day baselines')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args()
+
+    # Parse once, then replay every parameter combination from memory
+    start = time.perf_counter()
+    samples = list(read_samples(args.metrics_file))
+    parse_time = time.perf_counter() - start
+    print(f"Loaded {len(samples)} samples in {parse_time * 1000:.1f} ms")
+
+    for alpha in args.alpha:
+        for z_threshold in args.z:
+            detector = AnomalyDetector(alpha=alpha, z_threshold=z_threshold,
+                                       warmup=args.warmup, seasonal=args.seasonal)
+            counts = {}
+            start = time.perf_counter()
+            for epoch, sample in samples:
+                for alert in detector.evaluate(epoch, sample):
+                    if alert['severity'] != 'ok':
+                        counts[alert['alert_type']] = counts.get(alert['alert_type'], 0) + 1
+                    if not args.quiet:
+                        print(f"  [{alert['timestamp']}] {alert['alert_type']} - {alert['message']}")
+            elapsed = time.perf_counter() - start
+            rate = len(samples) / elapsed if elapsed > 0 else float('inf')
+            summary = ', '.join(f"{alert_type}: {count}" for alert_type, count in sorted(counts.items()))
+            print(f"alpha={alpha:g} z={z_threshold:g}: {sum(counts.values())} anomalies "
+                  f"({summary or 'none'}) - {rate:,.0f} samples/s")
+
+
+if __name__ == '__main__':
+    main()
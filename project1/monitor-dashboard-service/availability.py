@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Availability of the monitored container, from its state transitions.
+
+The collector appends a record to the state log (JSON Lines) only when the
+container's state changes:
+
+  {"epoch": 1710929730.52, "timestamp": "2024-03-20 10:15:30", "state": "down",
+   "source": "docker", "reason": "exited"}
+
+States are `up` (running and its health check passes), `unhealthy`
+(running but failing its health check, or started and not yet healthy),
+`down` (stopped or missing) and `unknown` (the collector wasn't running).
+Timestamps are as exact as their source: Docker's StartedAt/FinishedAt for
+starts and exits, the time of the health check for health changes.
+
+`AvailabilityIndex` follows the log and keeps, for every transition, the
+seconds spent in each state before it. Time in a state between any two
+instants is then two binary searches, so "availability over the last W"
+and "error budget remaining" cost O(log n) whatever the history length:
+
+  availability = up / (up + unhealthy + down)
+  error budget = (1 - SLO_TARGET) * observed time; remaining = budget - (unhealthy + down)
+
+Unknown time counts neither for nor against the SLO.
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import time
+
+from prometheus_client.core import GaugeMetricFamily
+
+STATE_LOG_FILE = os.getenv('STATE_LOG_FILE', '/var/log/container_states.log')
+SLO_TARGET = float(os.getenv('SLO_TARGET', '99.9'))  # percent of observed time up
+UPTIME_WINDOWS = os.getenv('UPTIME_WINDOWS', '1h,24h,7d,30d')
+
+STATES = ('up', 'unhealthy', 'down', 'unknown')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_WINDOW_RE = re.compile(r'^(\d+(?:\.\d+)?)([smhdw]?)$')
+_WINDOW_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_window(text):
+    """Window length in seconds from '90', '15m', '24h', '7d', ...; raises ValueError"""
+    match = _WINDOW_RE.match(text.strip().lower())
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"Invalid window {text!r}")
+    return float(match.group(1)) * _WINDOW_UNITS[match.group(2)]
+
+
+def make_transition(state, epoch, source, reason=''):
+    if state not in STATES:
+        raise ValueError(f"Unknown state {state!r}")
+    return {'epoch': round(epoch, 3), 'timestamp': time.strftime(TIMESTAMP_FORMAT, time.localtime(epoch)),
+            'state': state, 'source': source, 'reason': reason}
+
+
+def parse_transition_line(line):
+    """A state log line as a transition record, None if it isn't one"""
+    try:
+        record = json.loads(line)
+        if record['state'] in STATES:
+            record['epoch'] = float(record['epoch'])
+            return record
+    except (ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def read_last_transition(path):
+    """The last complete record of a state log, None if there is none"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(size - 4096, 0))
+            lines = f.read().split(b'\n')
+    except OSError:
+        return None
+    for line in reversed(lines[:-1]):
+        record = parse_transition_line(line.decode('utf-8', 'replace'))
+        if record:
+            return record
+    return None
+
+
+class StateTracker:
+    """Writes a transition to the state log whenever the observed state changes
+
+    Several threads may observe states; a caller that decides from
+    `state`/`epoch` what to observe holds `lock` (reentrant) meanwhile.
+    """
+
+    def __init__(self, path=STATE_LOG_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        last = read_last_transition(path)
+        self.state = last['state'] if last else None
+        self.epoch = last['epoch'] if last else None
+
+    def observe(self, state, epoch, source, reason=''):
+        """Record `state` as of `epoch`; returns the transition written, None if unchanged
+
+        Transitions are kept in time order: one reported as earlier than the
+        last one (e.g. a health check that started before a Docker event
+        was seen) is recorded at the time of the last one.
+        """
+        with self.lock:
+            if state == self.state:
+                return None
+            if self.epoch is not None:
+                epoch = max(epoch, self.epoch)
+            record = make_transition(state, epoch, source, reason)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+            self.state, self.epoch = state, record['epoch']
+            return record
+
+
+class AvailabilityIndex:
+    """Time spent in each state over any window, from the state log"""
+
+    def __init__(self, path=STATE_LOG_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.inode = None
+        self.offset = 0
+        self.starts = []
+        self.states = []
+        self.reasons = []
+        # Seconds spent in each state before starts[i]
+        self.before = {state: [] for state in STATES}
+
+    def add(self, record):
+        """Append a transition (in time order); repeats of the current state are ignored"""
+        if self.states and record['state'] == self.states[-1]:
+            return
+        epoch = max(record['epoch'], self.starts[-1]) if self.starts else record['epoch']
+        for state in STATES:
+            totals = self.before[state]
+            if not totals:
+                totals.append(0.0)
+            else:
+                totals.append(totals[-1] + (epoch - self.starts[-1] if self.states[-1] == state else 0.0))
+        self.starts.append(epoch)
+        self.states.append(record['state'])
+        self.reasons.append(record.get('reason', ''))
+
+    def sync(self):
+        """Index transitions appended to the log since the last sync (one stat() if none)"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return 0
+        with self.lock:
+            # Start over if the log was rotated or truncated
+            if self.inode != stat.st_ino or stat.st_size < self.offset:
+                self.reset()
+                self.inode = stat.st_ino
+            if stat.st_size == self.offset:
+                return 0
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+            # Leave a partially written last line for the next sync
+            data = data[:data.rfind(b'\n') + 1]
+            added = 0
+            for raw in data.split(b'\n')[:-1]:
+                record = parse_transition_line(raw.decode('utf-8', 'replace'))
+                if record:
+                    self.add(record)
+                    added += 1
+            self.offset += len(data)
+            return added
+
+    def state_at(self, epoch):
+        """(state, since) at `epoch`; ('unknown', None) before the first transition"""
+        i = bisect.bisect_right(self.starts, epoch) - 1
+        return (self.states[i], self.starts[i]) if i >= 0 else ('unknown', None)
+
+    def time_in_states(self, epoch):
+        """Seconds spent in each state from the first transition up to `epoch`"""
+        i = bisect.bisect_right(self.starts, epoch) - 1
+        if i < 0:
+            return {state: 0.0 for state in STATES}
+        totals = {state: self.before[state][i] for state in STATES}
+        totals[self.states[i]] += epoch - self.starts[i]
+        return totals
+
+    def window(self, start, end, known_until=None, target=SLO_TARGET):
+        """Time per state, availability and error budget between `start` and `end`
+
+        Time after `known_until` (the collector's last sample, if given) and
+        before the first transition counts as unknown.
+        """
+        with self.lock:
+            first = self.starts[0] if self.starts else end
+            cutoff = end if known_until is None else max(min(known_until, end), start)
+            at_end = self.time_in_states(cutoff)
+            at_start = self.time_in_states(min(start, cutoff))
+        seconds = {state: at_end[state] - at_start[state] for state in STATES}
+        seconds['unknown'] += (end - cutoff) + max(min(first, cutoff) - start, 0.0)
+        observed = seconds['up'] + seconds['unhealthy'] + seconds['down']
+        bad = seconds['unhealthy'] + seconds['down']
+        budget = (1 - target / 100) * observed
+        return {
+            'start': start,
+            'end': end,
+            'seconds': {state: round(value, 3) for state, value in seconds.items()},
+            'observed_seconds': round(observed, 3),
+            'availability': round(seconds['up'] / observed * 100, 4) if observed else None,
+            'error_budget': {
+                'target': target,
+                'allowed_seconds': round(budget, 3),
+                'spent_seconds': round(bad, 3),
+                'remaining_seconds': round(budget - bad, 3),
+                # 1 = untouched, 0 = used up, negative = SLO missed
+                'remaining_ratio': round((budget - bad) / budget, 4) if budget else None,
+            },
+        }
+
+    def segments(self, start, end, limit=500):
+        """[{start, end, state, reason}] covering `start`..`end`, oldest first, at most `limit`"""
+        with self.lock:
+            first = max(bisect.bisect_right(self.starts, start) - 1, 0)
+            last = bisect.bisect_left(self.starts, end)
+            first = max(first, last - limit)
+            segments = []
+            for i in range(first, last):
+                segment_end = self.starts[i + 1] if i + 1 < len(self.starts) else end
+                segments.append({'start': max(self.starts[i], start), 'end': min(segment_end, end),
+                                 'state': self.states[i], 'reason': self.reasons[i]})
+        return segments
+
+
+class AvailabilityCollector:
+    """Prometheus families for the configured windows, computed at scrape time"""
+
+    def __init__(self, index, windows=UPTIME_WINDOWS, known_until=None, target=SLO_TARGET):
+        self.index = index
+        self.windows = [(name.strip(), parse_window(name)) for name in windows.split(',') if name.strip()]
+        self.known_until = known_until
+        self.target = target
+
+    def collect(self):
+        self.index.sync()
+        now = time.time()
+        known_until = self.known_until() if self.known_until else None
+        availability = GaugeMetricFamily('container_availability_percent',
+                                         'Percent of observed time the container was up', labels=['window'])
+        remaining = GaugeMetricFamily('container_error_budget_remaining_ratio',
+                                      'Share of the error budget left (negative once the SLO is missed)',
+                                      labels=['window'])
+        for name, seconds in self.windows:
+            window = self.index.window(now - seconds, now, known_until, self.target)
+            if window['availability'] is not None:
+                availability.add_metric([name], window['availability'])
+            if window['error_budget']['remaining_ratio'] is not None:
+                remaining.add_metric([name], window['error_budget']['remaining_ratio'])
+        yield availability
+        yield remaining
+        yield GaugeMetricFamily('container_slo_target_percent', 'Availability objective', value=self.target)
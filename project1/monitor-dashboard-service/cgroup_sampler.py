@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Direct cgroup v2 sampling of a container.
+
+`docker stats` (and the stats API without one-shot) waits a second or two
+to compute a CPU delta, which caps the sampling rate. The kernel already
+keeps cumulative counters in the container's cgroup, so this sampler reads
+them straight from cgroupfs: the files are opened once and re-read in
+place, so a sample is a handful of small reads (microseconds) and can be
+taken every 100ms. Rates (CPU %, throttling, IO) come from the deltas
+between consecutive samples.
+
+Files read from the container's cgroup directory:
+
+  cpu.stat        usage_usec, nr_periods, nr_throttled, throttled_usec
+  memory.current  memory in use (bytes); memory.max its limit ("max" = none)
+  memory.stat     inactive_file, subtracted from usage like `docker stats` does
+  memory.events   oom, oom_kill counters
+  io.stat         rbytes/wbytes/rios/wios per device
+  pids.current    number of tasks
+
+Network traffic isn't accounted per cgroup; it is read from the container's
+network namespace via <PROC_ROOT>/<pid>/net/dev when the host's /proc is
+visible (PROC_ROOT), and reported as None otherwise.
+
+The cgroup directory is found by resolving the container through the Docker
+API (its Id, plus its init process's /proc/<pid>/cgroup when visible), under
+CGROUP_ROOT. Pointing CGROUP_ROOT (or --root) at a fixture directory with
+the same layout lets the sampler run without a real container.
+
+  python3 cgroup_sampler.py flask-app --interval 0.1 --count 50
+"""
+import argparse
+import json
+import os
+import time
+
+from docker_api import DockerClient
+
+CGROUP_ROOT = os.getenv('CGROUP_ROOT', '/sys/fs/cgroup')
+PROC_ROOT = os.getenv('PROC_ROOT', '/proc')
+
+CGROUP_FILES = ('cpu.stat', 'memory.current', 'memory.max', 'memory.stat', 'memory.events',
+                'io.stat', 'pids.current')
+
+
+class CgroupNotFound(Exception):
+    """Raised when a container's cgroup directory can't be found"""
+
+
+def candidate_paths(container_id, cgroup_parent=None, proc_cgroup=None):
+    """Relative cgroup paths a container may live at, most specific first"""
+    candidates = []
+    if proc_cgroup:
+        candidates.append(proc_cgroup.lstrip('/'))
+    if cgroup_parent:
+        candidates.append(f"{cgroup_parent.strip('/')}/{container_id}")
+        candidates.append(f"{cgroup_parent.strip('/')}/docker-{container_id}.scope")
+    # systemd cgroup driver, then the cgroupfs driver
+    candidates.append(f"system.slice/docker-{container_id}.scope")
+    candidates.append(f"docker/{container_id}")
+    return candidates
+
+
+def read_proc_cgroup(pid, proc_root=PROC_ROOT):
+    """The unified (v2) cgroup path of a process, None if it isn't visible"""
+    try:
+        with open(os.path.join(proc_root, str(pid), 'cgroup'), 'r') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+
+def resolve_cgroup_dir(container, docker=None, root=CGROUP_ROOT, proc_root=PROC_ROOT):
+    """Find a running container's cgroup v2 directory through the Docker API"""
+    return cgroup_dir_for((docker or DockerClient()).inspect(container), root, proc_root)
+
+
+def cgroup_dir_for(details, root=CGROUP_ROOT, proc_root=PROC_ROOT):
+    """cgroup v2 directory of a container, given its inspect details"""
+    pid = details.get('State', {}).get('Pid')
+    proc_cgroup = read_proc_cgroup(pid, proc_root) if pid else None
+    cgroup_parent = details.get('HostConfig', {}).get('CgroupParent')
+    for relative in candidate_paths(details['Id'], cgroup_parent, proc_cgroup):
+        path = os.path.join(root, relative)
+        if os.path.isfile(os.path.join(path, 'cpu.stat')):
+            return path
+    raise CgroupNotFound(f"No cgroup v2 directory for {details.get('Name', details['Id'])} under {root}")
+
+
+def parse_flat_keyed(text):
+    """'key value' lines (cpu.stat, memory.stat, memory.events) to a dict of ints"""
+    values = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(' ')
+        try:
+            values[key] = int(value)
+        except ValueError:
+            pass
+    return values
+
+
+def parse_io_stat(text):
+    """Sum io.stat's per-device 'major:minor rbytes=.. wbytes=..' counters"""
+    totals = {'rbytes': 0, 'wbytes': 0, 'rios': 0, 'wios': 0}
+    for line in text.splitlines():
+        for field in line.split()[1:]:
+            key, _, value = field.partition('=')
+            if key in totals:
+                totals[key] += int(value)
+    return totals
+
+
+def parse_net_dev(text):
+    """Total (rx_bytes, tx_bytes) of /proc/<pid>/net/dev, excluding loopback"""
+    rx = tx = 0
+    for line in text.splitlines()[2:]:
+        interface, _, counters = line.partition(':')
+        fields = counters.split()
+        if interface.strip() == 'lo' or len(fields) < 9:
+            continue
+        rx += int(fields[0])
+        tx += int(fields[8])
+    return rx, tx
+
+
+def host_memory_bytes(proc_root=PROC_ROOT):
+    """Total host memory, the effective limit of a cgroup with memory.max = max"""
+    try:
+        with open(os.path.join(proc_root, 'meminfo'), 'r') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class CgroupSampler:
+    """Samples one cgroup directory, keeping its files open between samples"""
+
+    def __init__(self, path, proc_root=PROC_ROOT, pid=None):
+        self.path = path
+        self.fds = {}
+        for name in CGROUP_FILES:
+            try:
+                self.fds[name] = os.open(os.path.join(path, name), os.O_RDONLY)
+            except FileNotFoundError:
+                # Controllers that aren't enabled for the cgroup are left out
+                pass
+        if 'cpu.stat' not in self.fds:
+            self.close()
+            raise CgroupNotFound(f"{path} is not a cgroup v2 directory")
+        if pid:
+            try:
+                self.fds['net/dev'] = os.open(os.path.join(proc_root, str(pid), 'net', 'dev'), os.O_RDONLY)
+            except OSError:
+                pass
+        self.host_memory = host_memory_bytes(proc_root)
+        self.previous = None
+
+    def read(self, name):
+        fd = self.fds.get(name)
+        if fd is None:
+            return ''
+        # Re-reading from offset 0 regenerates the file's contents
+        return os.pread(fd, 65536, 0).decode('ascii', 'replace')
+
+    def read_counters(self):
+        """Raw cumulative counters and gauges at this instant"""
+        cpu = parse_flat_keyed(self.read('cpu.stat'))
+        memory_stat = parse_flat_keyed(self.read('memory.stat'))
+        events = parse_flat_keyed(self.read('memory.events'))
+        io = parse_io_stat(self.read('io.stat'))
+        memory_max = self.read('memory.max').strip()
+        pids = self.read('pids.current').strip()
+        net_rx, net_tx = parse_net_dev(self.read('net/dev')) if 'net/dev' in self.fds else (None, None)
+        return {
+            'time': time.monotonic(),
+            'usage_usec': cpu.get('usage_usec', 0),
+            'user_usec': cpu.get('user_usec', 0),
+            'system_usec': cpu.get('system_usec', 0),
+            'nr_periods': cpu.get('nr_periods', 0),
+            'nr_throttled': cpu.get('nr_throttled', 0),
+            'throttled_usec': cpu.get('throttled_usec', 0),
+            'memory_current': int(self.read('memory.current').strip() or 0),
+            'memory_max': int(memory_max) if memory_max.isdigit() else None,
+            'inactive_file': memory_stat.get('inactive_file', 0),
+            'oom': events.get('oom', 0),
+            'oom_kill': events.get('oom_kill', 0),
+            'io_read_bytes': io['rbytes'],
+            'io_write_bytes': io['wbytes'],
+            'io_read_ops': io['rios'],
+            'io_write_ops': io['wios'],
+            'pids': int(pids) if pids.isdigit() else 0,
+            'net_rx_bytes': net_rx,
+            'net_tx_bytes': net_tx,
+        }
+
+    def sample(self):
+        """One sample with rates over the time since the previous one
+
+        CPU % is relative to one core, as `docker stats` reports it. Rates are
+        0 on the first sample; the OOM fields are increments since the
+        previous sample, so a kill is reported exactly once.
+        """
+        current = self.read_counters()
+        previous = self.previous or current
+        self.previous = current
+        elapsed_usec = (current['time'] - previous['time']) * 1000000
+
+        def delta(key):
+            # Counters restart from zero if the container is recreated in place
+            return max(current[key] - previous[key], 0)
+
+        def rate(key):
+            if current[key] is None:
+                return None
+            return delta(key) / elapsed_seconds if elapsed_seconds else 0.0
+
+        used = current['memory_current']
+        if current['inactive_file'] < used:
+            used -= current['inactive_file']
+        limit = current['memory_max'] or self.host_memory
+        periods = delta('nr_periods')
+        elapsed_seconds = elapsed_usec / 1000000
+        return {
+            'cpu_percent': delta('usage_usec') / elapsed_usec * 100 if elapsed_usec else 0.0,
+            'cpu_throttled_percent': delta('nr_throttled') / periods * 100 if periods else 0.0,
+            # Milliseconds throttled per second of wall time
+            'cpu_throttled_ms': rate('throttled_usec') / 1000,
+            'memory_usage_mb': used / 1048576,
+            'memory_limit_mb': limit / 1048576,
+            'memory_percent': used / limit * 100 if limit else 0.0,
+            'net_rx_bps': rate('net_rx_bytes'),
+            'net_tx_bps': rate('net_tx_bytes'),
+            'block_read_bps': rate('io_read_bytes'),
+            'block_write_bps': rate('io_write_bytes'),
+            'pids': current['pids'],
+            'oom_events': delta('oom'),
+            'oom_kills': delta('oom_kill'),
+            'counters': current,
+        }
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample a container's cgroup v2 counters")
+    parser.add_argument('container', nargs='?', default=os.getenv('CONTAINER_NAME', 'flask-app'))
+    parser.add_argument('--root', default=CGROUP_ROOT, help='cgroupfs mount (or fixture directory)')
+    parser.add_argument('--path', help='cgroup directory to sample, skipping the Docker lookup')
+    parser.add_argument('--pid', type=int, help='a process in the container, for network counters')
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between samples')
+    parser.add_argument('--count', type=int, default=10, help='samples to take (0 = forever)')
+    args = parser.parse_args()
+
+    path = args.path or resolve_cgroup_dir(args.container, root=args.root)
+    sampler = CgroupSampler(path, pid=args.pid)
+    sampler.sample()
+    taken = 0
+    cost = 0.0
+    while not args.count or taken < args.count:
+        time.sleep(args.interval)
+        started = time.perf_counter()
+        sample = sampler.sample()
+        cost += time.perf_counter() - started
+        taken += 1
+        sample.pop('counters')
+        print(json.dumps({key: None if value is None else round(value, 2) for key, value in sample.items()}))
+    print(f"{path}: {taken} samples, {cost / max(taken, 1) * 1000000:.0f}us per sample")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Collector daemon: the single sampling path for the monitored container.
+
+Every SAMPLE_INTERVAL seconds it reads the container's state and stats
+from the Docker API socket and times a /health request, all in-process on
+kept-alive connections (no docker/curl/bc/awk forks). With SAMPLER=cgroup,
+CPU and memory (plus throttling, OOM, IO and PID counters) are read from the
+container's cgroup v2 files instead (cgroup_sampler.py), which is cheap
+enough to sample every 100ms; the health check then runs every
+HEALTH_INTERVAL seconds. Each sample is:
+
+  - appended to the metrics CSV (same format as monitor_container.sh wrote),
+  - logged to the monitor log,
+  - fed to the alert rules and the optional anomaly detector, with alerts
+    appended to the alert log (same JSON Lines records),
+  - published, with the rule states, to a small status file the dashboard
+    serves /api/stats and /api/rules from,
+  - written to a shared-memory ring (metrics_ring.py) the dashboard serves
+    /api/history and /api/latency from,
+  - added to the current hour's aggregates (hourly_stats.py),
+  - checked for a change of state (up/unhealthy/down), which is logged to
+    the state log behind the availability figures (availability.py).
+
+With DOCKER_EVENTS on (the default), the container's Docker events are
+watched as well (docker_events.py): a start, exit, OOM kill or health
+status change is logged and alerted on as it happens, with Docker's own
+timestamp, and triggers a sample right away instead of at the next tick.
+
+With SAMPLING=adaptive the interval isn't fixed: it drops to
+SAMPLE_INTERVAL_MIN while metrics are near their thresholds, moving fast or
+the state changes, and backs off to SAMPLE_INTERVAL_MAX when things are
+steady, within a sampling overhead budget (adaptive_sampling.py).
+"""
+import calendar
+import http.client
+import json
+import os
+import re
+import threading
+import time
+
+from adaptive_sampling import scheduler_from_env
+from alert_records import TIMESTAMP_FORMAT, append_alert, make_alert
+from anomaly import AnomalyDetector
+from availability import StateTracker
+from cgroup_sampler import CgroupNotFound, CgroupSampler, cgroup_dir_for
+from docker_api import DockerClient, DockerError
+from docker_events import EventWatcher, event_action, event_epoch
+from hourly_stats import HOURLY_FILE, HOURLY_FLUSH_INTERVAL, HourlyStats
+from metrics_csv import EXTENDED_COLUMNS, METRICS_HEADER, format_value, prepare_metrics_file, read_samples
+from metrics_ring import METRICS_RING_FILE, RingWriter
+from rules import RulesEngine, load_rules
+
+CONTAINER_NAME = os.getenv('CONTAINER_NAME', 'flask-app')
+LOG_FILE = '/var/log/container_monitor.log'
+ALERTS_FILE = '/var/log/container_alerts.log'
+METRICS_FILE = '/var/log/container_metrics.csv'
+STATUS_FILE = os.getenv('COLLECTOR_STATUS_FILE', '/var/log/container_collector.json')
+SAMPLE_INTERVAL = float(os.getenv('SAMPLE_INTERVAL', '2'))
+# "docker" (stats API) or "cgroup" (cgroup v2 files, falls back to the stats API if not found)
+SAMPLER = os.getenv('SAMPLER', 'docker')
+# Seconds between health checks; the latest result is reused for samples in between
+HEALTH_INTERVAL = float(os.getenv('HEALTH_INTERVAL', str(SAMPLE_INTERVAL)))
+HEALTH_TIMEOUT = 5  # seconds
+# While the container stays down its alert is repeated this often (seconds), so the alert
+# service keeps the incident open; well under its resolve time (INCIDENT_RESOLVE_AFTER)
+DOWN_ALERT_REPEAT = 60
+# Follow the container's Docker events besides sampling it
+DOCKER_EVENTS = os.getenv('DOCKER_EVENTS', '1').lower() in ('1', 'true', 'yes')
+
+
+def anomaly_detector_from_env():
+    """AnomalyDetector configured from the environment, None unless ANOMALY_DETECTION is set"""
+    if os.getenv('ANOMALY_DETECTION', '0').lower() not in ('1', 'true', 'yes'):
+        return None
+    return AnomalyDetector(
+        alpha=float(os.getenv('ANOMALY_ALPHA', '0.1')),
+        z_threshold=float(os.getenv('ANOMALY_Z_THRESHOLD', '4')),
+        seasonal=os.getenv('ANOMALY_SEASONAL', '0').lower() in ('1', 'true', 'yes')
+    )
+
+
+def cpu_percent(stats, previous):
+    """CPU % the way `docker stats` computes it, against the previous snapshot"""
+    cpu = stats.get('cpu_stats', {})
+    before = previous.get('cpu_stats', {}) if previous else stats.get('precpu_stats', {})
+    if not before.get('system_cpu_usage'):
+        # First sample of a one-shot stats call: nothing to compare against yet
+        return 0.0
+    cpu_delta = cpu.get('cpu_usage', {}).get('total_usage', 0) - before.get('cpu_usage', {}).get('total_usage', 0)
+    system_delta = cpu.get('system_cpu_usage', 0) - before.get('system_cpu_usage', 0)
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    online = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or []) or 1
+    return cpu_delta / system_delta * online * 100.0
+
+
+def memory_usage(stats):
+    """(used MB, limit MB) excluding reclaimable page cache, as `docker stats` shows it"""
+    memory = stats.get('memory_stats', {})
+    usage = memory.get('usage', 0)
+    details = memory.get('stats', {})
+    # cgroup v2 reports inactive_file, v1 total_inactive_file
+    cache = details.get('inactive_file', details.get('total_inactive_file', 0))
+    if cache < usage:
+        usage -= cache
+    return usage / 1048576, memory.get('limit', 0) / 1048576
+
+
+def docker_resources(stats, previous, elapsed):
+    """Network, block IO, PID and throttling figures from a stats snapshot
+
+    Rates are per second against the previous snapshot, `elapsed` seconds
+    earlier (0 on the first sample).
+    """
+    networks = (stats.get('networks') or {}).values()
+    blkio = stats.get('blkio_stats', {}).get('io_service_bytes_recursive') or []
+    throttling = stats.get('cpu_stats', {}).get('throttling_data', {})
+    counters = {
+        'net_rx_bytes': sum(network.get('rx_bytes', 0) for network in networks),
+        'net_tx_bytes': sum(network.get('tx_bytes', 0) for network in networks),
+        # cgroup v1 reports "Read"/"Write", v2 "read"/"write"
+        'block_read_bytes': sum(entry['value'] for entry in blkio if entry.get('op', '').lower() == 'read'),
+        'block_write_bytes': sum(entry['value'] for entry in blkio if entry.get('op', '').lower() == 'write'),
+        'periods': throttling.get('periods', 0),
+        'throttled_periods': throttling.get('throttled_periods', 0),
+        'throttled_ns': throttling.get('throttled_time', 0),
+    }
+    before = previous[1] if previous else counters
+
+    def delta(key):
+        return max(counters[key] - before[key], 0)
+
+    def rate(key):
+        return delta(key) / elapsed if elapsed else 0.0
+
+    periods = delta('periods')
+    return counters, {
+        'net_rx_bps': rate('net_rx_bytes'),
+        'net_tx_bps': rate('net_tx_bytes'),
+        'block_read_bps': rate('block_read_bytes'),
+        'block_write_bps': rate('block_write_bytes'),
+        'pids': stats.get('pids_stats', {}).get('current', 0),
+        'cpu_throttled_percent': delta('throttled_periods') / periods * 100 if periods else 0.0,
+        'cpu_throttled_ms': rate('throttled_ns') / 1000000,
+    }
+
+
+def parse_docker_time(text):
+    """Docker's StartedAt/FinishedAt ('2024-03-20T10:15:30.123456789Z', UTC) to epoch
+    seconds; None if unset ('0001-01-01T00:00:00Z') or invalid"""
+    try:
+        epoch = calendar.timegm(time.strptime(text[:19], '%Y-%m-%dT%H:%M:%S'))
+    except (TypeError, ValueError):
+        return None
+    if epoch <= 0:
+        return None
+    fraction = re.match(r'\.(\d+)', text[19:])
+    return epoch + float('0.' + fraction.group(1)) if fraction else float(epoch)
+
+
+class Collector:
+    """Samples one container and writes the metrics, alerts and status"""
+
+    def __init__(self, container=CONTAINER_NAME, docker=None, rules_engine=None, anomaly_detector=None,
+                 states=None, events=None, scheduler=None, ring=None):
+        self.container = container
+        self.docker = docker or DockerClient()
+        self.rules_engine = rules_engine or RulesEngine(load_rules())
+        self.anomaly_detector = anomaly_detector
+        self.health = None
+        self.last_health = None
+        self.last_health_check = 0.0
+        self.previous_stats = None
+        self.previous_resources = None
+        self.cgroup = None
+        self.cgroup_key = None
+        self.cgroup_warned = False
+        self.container_down = False
+        self.down_alerted_at = None
+        # Collector timing, published with each status for the dashboard's /metrics
+        self.samples = 0
+        self.sample_errors = 0
+        self.sample_seconds = 0.0
+        self.probe_seconds = 0.0  # of sample_seconds, spent waiting for the health check
+        self.sample_seconds_total = 0.0
+        self.hourly = None
+        self.hourly_saved = 0.0
+        self.states = states or StateTracker()
+        # Source of Docker events (a DockerClient, or a FakeEventSource to replay some); None to only sample
+        self.events = events
+        self.event_watcher = None
+        self.wakeup = threading.Event()
+        # AdaptiveScheduler choosing each next interval; None to sample at a fixed interval
+        self.scheduler = scheduler
+        self.interval = SAMPLE_INTERVAL
+        # RingWriter sharing samples with the dashboard's processes; None for files only
+        self.ring = ring
+
+    def check_health(self):
+        """(response time ms, 'healthy'/'unhealthy', epoch checked) of the app's /health endpoint"""
+        checked_at = time.time()
+        started = time.perf_counter()
+        try:
+            if self.health is None:
+                self.health = http.client.HTTPConnection(self.container, 80, timeout=HEALTH_TIMEOUT)
+            self.health.request('GET', '/health')
+            response = self.health.getresponse()
+            response.read()
+            status = 'healthy' if response.status == 200 else 'unhealthy'
+        except (OSError, http.client.HTTPException):
+            if self.health is not None:
+                self.health.close()
+                self.health = None
+            status = 'unhealthy'
+        elapsed = time.perf_counter() - started
+        self.probe_seconds += elapsed
+        return elapsed * 1000, status, checked_at
+
+    def cached_health(self, since=None):
+        """Latest health check result, refreshed every HEALTH_INTERVAL seconds or
+        if it was taken before `since` (epoch)"""
+        now = time.monotonic()
+        if (self.last_health is None or now - self.last_health_check >= HEALTH_INTERVAL
+                or (since is not None and self.last_health[2] < since)):
+            self.last_health = self.check_health()
+            self.last_health_check = now
+        return self.last_health
+
+    def sample_cgroup(self, details):
+        """Resource sample from the container's cgroup; None to fall back to the stats API"""
+        # A recreated or restarted container gets a fresh cgroup directory
+        key = (details['Id'], details['State'].get('StartedAt'))
+        if self.cgroup is not None and self.cgroup_key != key:
+            self.close_cgroup()
+        try:
+            if self.cgroup is None:
+                self.cgroup = CgroupSampler(cgroup_dir_for(details), pid=details['State'].get('Pid'))
+                self.cgroup_key = key
+                self.log('INFO', f"Sampling cgroup {self.cgroup.path}")
+            return self.cgroup.sample()
+        except CgroupNotFound as e:
+            if not self.cgroup_warned:
+                self.log('WARNING', f"{e}; using the Docker stats API")
+                self.cgroup_warned = True
+        except OSError as e:
+            self.log('WARNING', f"cgroup read failed ({e}), re-resolving")
+            self.close_cgroup()
+        return None
+
+    def close_cgroup(self):
+        if self.cgroup is not None:
+            self.cgroup.close()
+            self.cgroup = None
+
+    def sample(self):
+        """Take one sample; returns the status dict published to the dashboard"""
+        epoch = time.time()
+        status = {'epoch': epoch, 'timestamp': time.strftime(TIMESTAMP_FORMAT, time.localtime(epoch)),
+                  'container': self.container, 'status': 'stopped', 'cpu': 0, 'memory_percent': 0,
+                  'memory_used': 0, 'memory_limit': 0, 'response_time': 0, 'app_status': None}
+        try:
+            details = self.docker.inspect(self.container)
+        except DockerError as e:
+            if e.status != 404:
+                raise
+            status['status'] = 'missing'
+            return status
+        state = details['State']
+        status.update(started_at=parse_docker_time(state.get('StartedAt')),
+                      finished_at=parse_docker_time(state.get('FinishedAt')))
+        if not state.get('Running'):
+            self.previous_stats = None
+            self.previous_resources = None
+            self.close_cgroup()
+            return status
+
+        resources = self.sample_cgroup(details) if SAMPLER == 'cgroup' else None
+        if resources is None:
+            stats = self.docker.stats(self.container)
+            cpu = cpu_percent(stats, self.previous_stats)
+            self.previous_stats = stats
+            used_mb, limit_mb = memory_usage(stats)
+            now = time.monotonic()
+            elapsed = now - self.previous_resources[0] if self.previous_resources else 0
+            counters, resources = docker_resources(stats, self.previous_resources, elapsed)
+            self.previous_resources = (now, counters)
+        else:
+            cpu = resources['cpu_percent']
+            used_mb, limit_mb = resources['memory_usage_mb'], resources['memory_limit_mb']
+        status['resources'] = {key: None if value is None else round(value, 2)
+                               for key, value in resources.items() if key != 'counters'}
+        # A health result from before the last start or state change is stale
+        since = max(filter(None, (status['started_at'], self.states.epoch)), default=None)
+        response_time, app_status, health_checked_at = self.cached_health(since=since)
+        status.update(status='running', cpu=round(cpu, 2),
+                      memory_percent=round(used_mb / limit_mb * 100, 2) if limit_mb else 0,
+                      memory_used=round(used_mb, 2), memory_limit=round(limit_mb, 2),
+                      response_time=round(response_time), app_status=app_status,
+                      health_checked_at=health_checked_at)
+        return status
+
+    def record(self, status):
+        """Write a sample's CSV row, log line and alerts"""
+        epoch = status['epoch']
+        alerts = []
+        if status['status'] != 'running':
+            message = (f"Container {self.container} not found" if status['status'] == 'missing'
+                       else f"Container {self.container} is not running")
+            self.log('ERROR' if status['status'] == 'missing' else 'WARNING', message)
+            # Alert when it goes down, then only every DOWN_ALERT_REPEAT seconds: samples
+            # may be a second or less apart
+            if not self.container_down or epoch - self.down_alerted_at >= DOWN_ALERT_REPEAT:
+                alerts.append(make_alert('Container Down', message, metric='status', epoch=epoch))
+                self.down_alerted_at = epoch
+            self.container_down = True
+        else:
+            if self.container_down:
+                self.container_down = False
+                alerts.append(make_alert('Container Down', f"Container {self.container} is running again",
+                                         metric='status', severity='ok', epoch=epoch))
+            row = [status['timestamp'], f"{status['cpu']:.2f}", f"{status['memory_used']:.2f}",
+                   f"{status['memory_percent']:.2f}", str(status['response_time']), status['app_status']]
+            resources = status['resources']
+            row += [format_value(resources.get(column), 0 if column == 'pids' else 2)
+                    for column in EXTENDED_COLUMNS]
+            self.write_row(row)
+            self.log('INFO', f"CPU: {row[1]}%, Memory: {row[2]}MB ({row[3]}%), "
+                             f"Response Time: {row[4]}ms, Status: {row[5]}")
+            sample = dict(zip(METRICS_HEADER, row))
+            # cgroup counters are available to rules too (e.g. metric "cpu_throttled_percent")
+            sample.update(resources)
+            oom_kills = resources.get('oom_kills')
+            # Docker's oom event already raised the alert if events are followed
+            if oom_kills and self.event_watcher is None:
+                alerts.append(make_alert('OOM Kill', f"{oom_kills:g} process(es) in {self.container} killed "
+                                                     f"for exceeding the memory limit",
+                                         metric='oom_kills', value=oom_kills, severity='critical', epoch=epoch))
+            alerts.extend(self.rules_engine.evaluate(epoch, sample))
+            if self.anomaly_detector:
+                alerts.extend(self.anomaly_detector.evaluate(epoch, sample))
+        for alert in alerts:
+            append_alert(ALERTS_FILE, alert)
+        return alerts
+
+    def track_state(self, status):
+        """Log the sample's state if it changed, at the time Docker or the health check saw it
+
+        A start or exit that happened after the last logged transition is
+        logged at Docker's StartedAt/FinishedAt, so a crash and restart
+        between two samples still shows up as downtime.
+        """
+        with self.states.lock:
+            last = self.states.epoch
+            started_at, finished_at = status.get('started_at'), status.get('finished_at')
+            if status['status'] != 'running':
+                exited = finished_at is not None and last is not None and finished_at > last
+                self.states.observe('down', finished_at if exited else status['epoch'], 'docker',
+                                    'exited' if status['status'] == 'stopped' else status['status'])
+                return
+            if last is not None and started_at is not None and started_at > last:
+                if finished_at is not None and last < finished_at <= started_at:
+                    self.states.observe('down', finished_at, 'docker', 'exited')
+                # Not serving until its first passing health check
+                self.states.observe('unhealthy', started_at, 'docker', 'started')
+            healthy = status['app_status'] == 'healthy'
+            self.states.observe('up' if healthy else 'unhealthy', status['health_checked_at'], 'health',
+                                '' if healthy else 'health check failed')
+
+    def handle_event(self, event):
+        """Log and alert on a Docker event of the container, then sample at once"""
+        action, detail = event_action(event)
+        epoch = event_epoch(event)
+        attributes = event.get('Actor', {}).get('Attributes', {})
+        alerts = []
+        if action == 'start':
+            self.states.observe('unhealthy', epoch, 'docker', 'started')
+        elif action == 'die':
+            exit_code = attributes.get('exitCode', '?')
+            self.states.observe('down', epoch, 'docker', f"exited ({exit_code})")
+            alerts.append(make_alert('Container Down', f"Container {self.container} exited with code {exit_code}",
+                                     metric='status', epoch=epoch))
+            # So the next running sample reports the recovery, even after a quick restart
+            self.container_down = True
+            self.down_alerted_at = epoch
+        elif action == 'oom':
+            alerts.append(make_alert('OOM Kill', f"A process in {self.container} was killed for exceeding "
+                                                 f"the memory limit",
+                                     metric='oom_kills', value=1, severity='critical', epoch=epoch))
+        elif action == 'health_status' and detail in ('healthy', 'unhealthy'):
+            self.states.observe('up' if detail == 'healthy' else 'unhealthy', epoch, 'docker',
+                                f"docker health check {'passed' if detail == 'healthy' else 'failed'}")
+            if detail == 'unhealthy':
+                alerts.append(make_alert('Application Unhealthy',
+                                         f"Docker reports {self.container} as unhealthy", epoch=epoch))
+        self.log('INFO', f"Docker event: {action}{' ' + detail if detail else ''}")
+        for alert in alerts:
+            append_alert(ALERTS_FILE, alert)
+        if self.scheduler:
+            self.scheduler.trigger(time.monotonic(), f"docker {action}")
+        self.wakeup.set()
+
+    def write_row(self, row):
+        new_file = not os.path.exists(METRICS_FILE) or os.path.getsize(METRICS_FILE) == 0
+        with open(METRICS_FILE, 'a') as f:
+            if new_file:
+                f.write(','.join(METRICS_HEADER) + '\n')
+            f.write(','.join(row) + '\n')
+
+    def log(self, level, message):
+        line = f"[{time.strftime(TIMESTAMP_FORMAT)}] [{level}] {message}"
+        print(line, flush=True)
+        with open(LOG_FILE, 'a') as f:
+            f.write(line + '\n')
+
+    def publish(self, status):
+        """Atomically replace the status file the dashboard reads"""
+        status = dict(status, rules=self.rules_engine.state(), sample_interval=self.interval,
+                      sampling=self.scheduler.state() if self.scheduler else {'mode': 'fixed'},
+                      collector={'samples': self.samples, 'errors': self.sample_errors,
+                                 'sample_seconds': self.sample_seconds,
+                                 'sample_seconds_total': self.sample_seconds_total})
+        temp_path = f"{STATUS_FILE}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(status, f)
+        os.replace(temp_path, STATUS_FILE)
+
+    def load_hourly(self):
+        """Saved hourly aggregates, seeded from the metrics CSV the first time"""
+        hourly = HourlyStats.load(HOURLY_FILE)
+        if hourly is None:
+            try:
+                hourly = HourlyStats.from_samples(read_samples(METRICS_FILE))
+                self.log('INFO', f"Hourly statistics seeded from {METRICS_FILE}")
+            except OSError:
+                hourly = HourlyStats()
+        return hourly
+
+    def aggregate(self, status):
+        """Add a sample to the hourly aggregates, saving them periodically"""
+        new_hour = self.hourly.add_status(status)
+        now = time.monotonic()
+        if new_hour or now - self.hourly_saved >= HOURLY_FLUSH_INTERVAL:
+            self.hourly.save(HOURLY_FILE)
+            self.hourly_saved = now
+
+    def resume_states(self):
+        """Mark the time since the previous collector's last sample as unknown"""
+        previous = read_status()
+        if self.states.state not in (None, 'unknown'):
+            last_seen = previous['epoch'] if previous else self.states.epoch
+            self.states.observe('unknown', last_seen, 'collector', 'collector restarted')
+
+    def run(self, interval=SAMPLE_INTERVAL):
+        if self.scheduler:
+            self.interval = self.scheduler.interval
+            self.log('INFO', f"Starting collector for {self.container} (adaptive, every "
+                             f"{self.scheduler.min_interval:g}-{self.scheduler.max_interval:g}s)")
+        else:
+            self.interval = interval
+            self.log('INFO', f"Starting collector for {self.container} (every {interval:g}s)")
+        self.hourly = self.load_hourly()
+        self.resume_states()
+        if self.events is not None:
+            self.event_watcher = EventWatcher([self.container], self.handle_event, self.events, self.log).start()
+        moved = prepare_metrics_file(METRICS_FILE)
+        if moved:
+            self.log('INFO', f"Metrics schema changed, previous metrics moved to {moved}")
+        next_sample = time.monotonic()
+        while True:
+            started = time.perf_counter()
+            self.probe_seconds = 0.0
+            try:
+                status = self.sample()
+                self.record(status)
+                self.sample_seconds = time.perf_counter() - started
+                self.sample_seconds_total += self.sample_seconds
+                self.samples += 1
+                if self.scheduler:
+                    # Waiting on a slow app isn't sampling overhead: it would slow sampling
+                    # down just when the app is in trouble
+                    self.interval = self.scheduler.next_interval(
+                        time.monotonic(), status, self.rules_engine.rules,
+                        max(self.sample_seconds - self.probe_seconds, 0.0))
+                # The time this sample stands for, until the next one
+                status['sample_interval'] = self.interval
+                self.publish(status)
+                if self.ring:
+                    self.ring.append(status)
+                self.aggregate(status)
+                self.track_state(status)
+            except Exception as e:
+                self.sample_errors += 1
+                self.log('ERROR', f"Sampling failed: {e}")
+            # Fixed-rate schedule: sampling time doesn't stretch the interval
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay <= 0:
+                next_sample = time.monotonic()
+            elif self.wakeup.wait(delay):
+                # A Docker event: sample now and keep the cadence from here
+                self.wakeup.clear()
+                next_sample = time.monotonic()
+
+
+def ring_writer_from_env():
+    """RingWriter on METRICS_RING_FILE, None if that is empty or can't be created"""
+    if not METRICS_RING_FILE:
+        return None
+    try:
+        return RingWriter(METRICS_RING_FILE)
+    except OSError as e:
+        print(f"Shared-memory ring unavailable ({e}), samples go to the files only", flush=True)
+        return None
+
+
+def read_status(path=STATUS_FILE):
+    """The collector's latest published status, None if there isn't one yet"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    Collector(anomaly_detector=anomaly_detector_from_env(), events=DockerClient() if DOCKER_EVENTS else None,
+              scheduler=scheduler_from_env(), ring=ring_writer_from_env()).run()
@@ -1,166 +1,95 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, jsonify, request
-import subprocess
-import json
-import csv
+from flask import Flask, Response, render_template, jsonify, request
 import os
 import time
 from datetime import datetime, timedelta
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+
+from alert_store import AlertStore
+from availability import SLO_TARGET, UPTIME_WINDOWS, AvailabilityCollector, AvailabilityIndex, parse_window
+from collector import STATUS_FILE, read_status
+from exporter import StatusCollector
+from hourly_stats import HOURLY_FILE, HourlyStats
+from http_responses import init_app as init_responses, versioned
+from metrics_csv import EXTENDED_COLUMNS, read_samples
+from metrics_ring import RingReader
+from response_cache import SingleFlightCache
 
 app = Flask(__name__)
+# orjson encoding, compression, and ETags on JSON responses
+init_responses(app)
 
 # Configuration
 CONTAINER_NAME = os.getenv('CONTAINER_NAME', 'monitored-app')
 METRICS_FILE = '/var/log/container_metrics.csv'
 ALERTS_FILE = '/var/log/container_alerts.log'
+ALERTS_DB = os.getenv('ALERTS_DB', '/var/log/container_alerts.db')
 # Default collection frequency in seconds
 DEFAULT_COLLECTION_FREQUENCY = int(os.getenv('COLLECTION_FREQUENCY', '30'))
 collection_frequency = DEFAULT_COLLECTION_FREQUENCY
 
-# Store uptime data - initialize with some default values
-uptime_data = []
+# Store latency data - initialize with some default values
 latency_data = []
 
+# Indexed alert history, kept in step with the alert log
+alert_store = AlertStore(ALERTS_DB, ALERTS_FILE)
+
+# /metrics exposes the collector's latest sample, read when scraped
+metrics_registry = CollectorRegistry()
+metrics_registry.register(StatusCollector())
+
+# Container state transitions, indexed for availability queries
+availability_index = AvailabilityIndex()
+
+def collector_last_sample():
+    """Epoch of the collector's latest sample; later time is unknown, not up"""
+    status = read_status()
+    return status['epoch'] + 2 * status.get('sample_interval', 2) if status else None
+
+metrics_registry.register(AvailabilityCollector(availability_index, known_until=collector_last_sample))
+
+# The collector's shared-memory ring of recent samples, opened on first use
+metrics_ring = None
+
+def ring_reader():
+    """The collector's sample ring, reopened if the collector started a new one; None without one"""
+    global metrics_ring
+    if metrics_ring is None or metrics_ring.replaced():
+        metrics_ring = RingReader.open()
+    return metrics_ring
+
+# Shared by concurrent pollers of /api/stats and /api/history
+response_cache = SingleFlightCache()
+metrics_registry.register(response_cache)
+
 def get_container_stats():
-    """Get current container statistics"""
-    try:
-        # Get container stats
-        cmd = f"docker stats --no-stream --format '{{{{json .}}}}' {CONTAINER_NAME}"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        if result.returncode == 0 and result.stdout:
-            stats = json.loads(result.stdout)
-            
-            # Parse CPU percentage
-            cpu = float(stats.get('CPUPerc', '0%').rstrip('%'))
-            
-            # Parse memory
-            mem_usage = stats.get('MemUsage', '0MiB / 0MiB')
-            mem_parts = mem_usage.split(' / ')
-            
-            # Handle different memory units (MiB, GiB)
-            mem_used = mem_parts[0]
-            mem_limit = mem_parts[1]
-            
-            # Convert to MB for consistent units
-            mem_used_mb = convert_to_mb(mem_used)
-            mem_limit_mb = convert_to_mb(mem_limit)
-            
-            # Calculate memory percentage correctly
-            mem_percent = 0
-            if mem_limit_mb > 0:
-                mem_percent = (mem_used_mb / mem_limit_mb) * 100
-            
-            # Check if container is running
-            status_cmd = f"docker inspect --format='{{{{.State.Status}}}}' {CONTAINER_NAME}"
-            status_result = subprocess.run(status_cmd, shell=True, capture_output=True, text=True)
-            
-            if status_result.returncode == 0 and "running" in status_result.stdout:
-                status = "running"
-                # Get container uptime
-                uptime_cmd = f"docker inspect --format='{{{{.State.StartedAt}}}}' {CONTAINER_NAME}"
-                uptime_result = subprocess.run(uptime_cmd, shell=True, capture_output=True, text=True)
-                
-                if uptime_result.returncode == 0 and uptime_result.stdout:
-                    # Parse the start time
-                    start_time_str = uptime_result.stdout.strip()
-                    try:
-                        start_time = datetime.strptime(start_time_str[:19], '%Y-%m-%dT%H:%M:%S')
-                        # Calculate uptime value based on how long the container has been running
-                        now = datetime.now()
-                        uptime_seconds = (now - start_time).total_seconds()
-                        # If recently started (less than 2 minutes), set lower uptime
-                        if uptime_seconds < 120:
-                            uptime_value = 70  # 70% uptime if recently restarted
-                        else:
-                            uptime_value = 100  # 100% uptime if running for a while
-                    except:
-                        uptime_value = 100  # Default to 100% if parsing fails
-                else:
-                    uptime_value = 90  # Default to 90% if we couldn't get start time
-            else:
-                status = "stopped"
-                uptime_value = 0  # 0% uptime if stopped
-            
-            # Calculate response time
-            response_time = check_app_response_time()
-            
-            # Update uptime and latency data
-            update_uptime_data(uptime_value, status)
-            update_latency_data(response_time)
-            
-            return {
-                'cpu': cpu,
-                'memory_percent': mem_percent,
-                'memory_used': f"{mem_used_mb:.2f}",
-                'memory_limit': f"{mem_limit_mb:.2f}",
-                'status': status,
-                'response_time': response_time
-            }
-    except Exception as e:
-        print(f"Error getting stats: {e}")
-        # Update uptime data with downtime
-        update_uptime_data(0, "error")  # 0% uptime if error
+    """Latest container statistics, as published by the collector daemon"""
+    status = read_status()
+    # A status older than a few sampling intervals means the collector isn't running
+    if status is None or time.time() - status['epoch'] > 3 * status.get('sample_interval', 2) + 5:
+        return {
+            'cpu': 0,
+            'memory_percent': 0,
+            'memory_used': 0,
+            'memory_limit': 0,
+            'status': 'error',
+            'response_time': 0,
+            'sample_interval': None,
+            'sampling': None
+        }
     
+    update_latency_data(status['response_time'])
     return {
-        'cpu': 0,
-        'memory_percent': 0,
-        'memory_used': 0,
-        'memory_limit': 0,
-        'status': 'error',
-        'response_time': 0
+        'cpu': status['cpu'],
+        'memory_percent': status['memory_percent'],
+        'memory_used': f"{status['memory_used']:.2f}",
+        'memory_limit': f"{status['memory_limit']:.2f}",
+        'status': 'running' if status['status'] == 'running' else 'stopped',
+        'response_time': status['response_time'],
+        'sample_interval': status.get('sample_interval'),
+        'sampling': status.get('sampling')
     }
 
-def convert_to_mb(mem_str):
-    """Convert memory string to MB regardless of unit (MiB, GiB)"""
-    try:
-        if 'MiB' in mem_str:
-            return float(mem_str.replace('MiB', '').strip())
-        elif 'GiB' in mem_str:
-            return float(mem_str.replace('GiB', '').strip()) * 1024
-        else:
-            # Try to parse as a plain number
-            return float(mem_str.strip())
-    except:
-        return 0
-
-def check_app_response_time():
-    """Check application response time in milliseconds"""
-    try:
-        # Record start time in milliseconds
-        start_time = time.time() * 1000
-        
-        # Make HTTP request to health endpoint
-        url = f"http://{CONTAINER_NAME}/health"
-        cmd = ["curl", "-s", "-o", "/dev/null", "-w", "%{time_total}", "-m", "5", url]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            # Convert to milliseconds
-            response_time = float(result.stdout) * 1000
-            return response_time
-        else:
-            return 0
-    except Exception as e:
-        print(f"Error checking response time: {e}")
-        return 0
-
-def update_uptime_data(uptime_value, status):
-    """Update uptime data array with timestamp and status"""
-    global uptime_data
-    
-    # Add current uptime value with timestamp
-    timestamp = datetime.now()
-    uptime_data.append({
-        'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-        'value': uptime_value,
-        'status': status
-    })
-    
-    # Keep only the last 100 data points
-    if len(uptime_data) > 100:
-        uptime_data = uptime_data[-100:]
-
 def update_latency_data(latency_value):
     """Update latency data array with timestamp"""
     global latency_data
@@ -176,43 +105,118 @@ def update_latency_data(latency_value):
     if len(latency_data) > 100:
         latency_data = latency_data[-100:]
 
+def read_hourly(hours=None):
+    """Rows of the collector's hourly aggregates"""
+    stats = HourlyStats.load(HOURLY_FILE)
+    return stats.rows(hours) if stats else []
+
+def get_uptime(windows, slo_target, timeline_window, since=None):
+    """Availability and error budget per window, plus the state timeline
+
+    With `since` (epoch), the timeline only has the segments that ended
+    after it, for a client to merge into the one it has.
+    """
+    now = time.time()
+    known_until = collector_last_sample()
+    state, state_since = availability_index.state_at(min(now, known_until) if known_until else now)
+    return {
+        'container': CONTAINER_NAME,
+        'state': state,
+        'since': state_since,
+        'slo_target': slo_target,
+        'windows': {name: availability_index.window(now - seconds, now, known_until, slo_target)
+                    for name, seconds in windows},
+        'timeline': availability_index.segments(max(now - timeline_window, since or 0), now)
+    }
+
+def _optional_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def is_running(sample):
+    return sample['status'] == 'running'
+
+def ring_points(limit, since, point):
+    """`point(sample)` for up to `limit` recent running samples of the ring, and whether
+    they replace the client's points rather than follow them
+
+    `since` is the number of the first sample the client doesn't have yet
+    (the last point's seq + 1); None asks for everything.
+    """
+    ring = ring_reader()
+    count = ring.count()
+    reset = since is None or since > count or since < count - ring.capacity
+    samples = ring.latest(limit, since=None if reset else since, where=is_running)
+    return [dict(point(sample), seq=sample['seq']) for sample in samples], reset
+
+def history_point(sample):
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sample['epoch'])),
+        'cpu_percent': sample['cpu'],
+        'memory_used': sample['memory_used'],
+        'memory_percent': sample['memory_percent'],
+        'response_time': sample['response_time'],
+        'status': sample['app_status'],
+        **{column: sample[column] for column in EXTENDED_COLUMNS}
+    }
+
+def latency_point(sample):
+    return {'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sample['epoch'])),
+            'value': sample['response_time']}
+
+def samples_version():
+    """(ETag, Last-Modified) of the collector's samples: the ring's sequence number, or the
+    metrics CSV's size"""
+    ring = ring_reader()
+    if ring is not None:
+        latest = ring.latest(1)
+        return f"ring-{ring.inode}-{ring.count()}", latest[0]['epoch'] if latest else None
+    try:
+        stat = os.stat(METRICS_FILE)
+    except OSError:
+        return 'csv-none', None
+    return f"csv-{stat.st_ino}-{stat.st_size}", stat.st_mtime
+
+def delta(points, reset, since):
+    """Points as a plain list, or as a delta for a ?since= request"""
+    return points if since is None else {'reset': reset, 'points': points}
+
 def get_metrics_history():
-    """Get historical metrics from CSV file"""
+    """Get historical metrics from the CSV file
+
+    Rows written before the extended schema (v2) have None for its fields.
+    """
     metrics = []
     if os.path.exists(METRICS_FILE):
         try:
-            with open(METRICS_FILE, 'r') as f:
-                reader = csv.reader(f)
-                # Skip header
-                next(reader, None)
-                for row in reader:
-                    if len(row) >= 6:
-                        metrics.append({
-                            'timestamp': row[0],
-                            'cpu_percent': row[1],
-                            'memory_used': row[2],
-                            'memory_percent': row[3],
-                            'response_time': row[4],
-                            'status': row[5]
-                        })
+            for epoch, sample in read_samples(METRICS_FILE):
+                entry = {
+                    'timestamp': sample['timestamp'],
+                    'cpu_percent': sample['cpu_percent'],
+                    'memory_used': sample['memory_usage_mb'],
+                    'memory_percent': sample['memory_percent'],
+                    'response_time': sample['response_time_ms'],
+                    'status': sample['status']
+                }
+                for column in EXTENDED_COLUMNS:
+                    entry[column] = _optional_float(sample.get(column))
+                metrics.append(entry)
             # Return last 50 entries
             return metrics[-50:] if len(metrics) > 50 else metrics
         except Exception as e:
             print(f"Error reading metrics file: {e}")
     return []
 
-def get_recent_alerts():
-    """Get recent alerts"""
-    alerts = []
-    if os.path.exists(ALERTS_FILE):
-        try:
-            with open(ALERTS_FILE, 'r') as f:
-                lines = f.readlines()
-            # Return last 10 alerts
-            return [line.strip() for line in lines[-10:]]
-        except:
-            pass
-    return []
+def parse_time_arg(value):
+    """Parse a query-string time as epoch seconds or 'YYYY-MM-DD HH:MM:SS'"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp()
 
 @app.route('/')
 def dashboard():
@@ -294,6 +298,14 @@ def dashboard():
             border-left: 4px solid #e74c3c; 
             background: #fff5f5;
         }
+        .alert-warning {
+            border-left-color: #f39c12;
+            background: #fffaf0;
+        }
+        .alert-ok {
+            border-left-color: #2ecc71;
+            background: #f4fff8;
+        }
         .charts-container {
             display: grid;
             grid-template-columns: repeat(2, 1fr);
@@ -458,7 +470,7 @@ def dashboard():
             </div>
             
             <div class="chart-container">
-                <h3 class="chart-title">Uptime</h3>
+                <h3 class="chart-title">Uptime <span id="uptime-summary"></span></h3>
                 <canvas id="uptime-chart"></canvas>
             </div>
             
@@ -469,9 +481,52 @@ def dashboard():
             
             <div class="alerts-container">
                 <h3 class="chart-title">Recent Alerts</h3>
+                <div id="firing-rules"></div>
                 <div id="alerts-list">No alerts</div>
             </div>
         </div>
+        
+        <!-- Network, block I/O, CPU throttling and PIDs -->
+        <div class="charts-container">
+            <div class="chart-container">
+                <h3 class="chart-title">Network I/O</h3>
+                <canvas id="network-chart"></canvas>
+            </div>
+            
+            <div class="chart-container">
+                <h3 class="chart-title">Block I/O</h3>
+                <canvas id="block-chart"></canvas>
+            </div>
+            
+            <div class="chart-container">
+                <h3 class="chart-title">CPU Throttling</h3>
+                <canvas id="throttling-chart"></canvas>
+            </div>
+            
+            <div class="chart-container">
+                <h3 class="chart-title">Processes</h3>
+                <canvas id="pids-chart"></canvas>
+            </div>
+        </div>
+        
+        <!-- Hourly statistics (from the collector's hourly aggregates) -->
+        <div class="hourly-stats-container">
+            <h3 class="chart-title">Hourly Statistics</h3>
+            <table class="hourly-stats-table">
+                <thead>
+                    <tr>
+                        <th>Hour</th>
+                        <th>Uptime</th>
+                        <th>CPU avg / p95 / max</th>
+                        <th>Memory avg / p95 / max</th>
+                        <th>Latency avg / p95 / max</th>
+                    </tr>
+                </thead>
+                <tbody id="hourly-stats-body">
+                    <tr><td colspan="5">No hourly statistics yet</td></tr>
+                </tbody>
+            </table>
+        </div>
     </div>
     
     <script>
@@ -560,6 +615,78 @@ def dashboard():
             }
         });
         
+        // Line chart for the extended resource series in /api/history
+        function seriesChart(canvasId, datasets, yTitle) {
+            return new Chart(document.getElementById(canvasId).getContext('2d'), {
+                type: 'line',
+                data: {
+                    labels: [],
+                    datasets: datasets.map(dataset => ({
+                        label: dataset.label,
+                        data: [],
+                        borderColor: dataset.color,
+                        tension: 0.1,
+                        spanGaps: true
+                    }))
+                },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    scales: {
+                        y: {
+                            beginAtZero: true,
+                            title: { display: true, text: yTitle }
+                        }
+                    }
+                }
+            });
+        }
+        
+        const networkChart = seriesChart('network-chart', [
+            {label: 'Received', color: '#3498db'},
+            {label: 'Sent', color: '#9b59b6'}
+        ], 'KB/s');
+        const blockChart = seriesChart('block-chart', [
+            {label: 'Read', color: '#16a085'},
+            {label: 'Write', color: '#d35400'}
+        ], 'KB/s');
+        const throttlingChart = seriesChart('throttling-chart', [
+            {label: 'Throttled periods %', color: '#e74c3c'},
+            {label: 'Throttled ms per second', color: '#f39c12'}
+        ], '% / ms');
+        const pidsChart = seriesChart('pids-chart', [
+            {label: 'PIDs', color: '#2c3e50'}
+        ], 'processes');
+        
+        // Values are null for samples collected before the extended schema
+        function kilobytes(value) {
+            return value === null ? null : value / 1024;
+        }
+        
+        // Recent points, fetched as deltas: ?since= asks only for the points after the last one held
+        const pointSeries = {history: [], latency: []};
+        
+        function fetchPoints(name, limit) {
+            const points = pointSeries[name];
+            const since = points.length && points[points.length - 1].seq !== undefined ?
+                `?since=${points[points.length - 1].seq + 1}` : '';
+            return fetch(`/api/${name}${since}`)
+                .then(response => response.json())
+                .then(data => {
+                    // A plain list, or {reset, points} in answer to ?since=
+                    const merged = Array.isArray(data) || data.reset ?
+                        (data.points || data) : points.concat(data.points);
+                    pointSeries[name] = merged.slice(-limit);
+                    return pointSeries[name];
+                });
+        }
+        
+        function updateSeries(chart, labels, series) {
+            chart.data.labels = labels;
+            series.forEach((data, i) => { chart.data.datasets[i].data = data; });
+            chart.update();
+        }
+        
         // Show/hide settings panel
         function toggleSettings() {
             const panel = document.getElementById('settings-panel');
@@ -582,11 +709,36 @@ def dashboard():
             .then(data => {
                 alert('Settings updated successfully!');
                 updateInterval = data.collection_frequency * 1000;
-                clearInterval(dashboardInterval);
-                dashboardInterval = setInterval(updateDashboard, updateInterval);
+                clearTimeout(dashboardTimer);
+                scheduleDashboard();
             });
         }
         
+        function formatTriple(metric, unit, digits) {
+            if (metric.avg === null) return '-';
+            return [metric.avg, metric.p95, metric.max].map(value => value.toFixed(digits)).join(' / ') + unit;
+        }
+        
+        function updateHourlyStats() {
+            fetch('/api/hourly?hours=24')
+                .then(response => response.json())
+                .then(rows => {
+                    if (rows.length === 0) return;
+                    document.getElementById('hourly-stats-body').innerHTML = rows.slice().reverse().map(row => {
+                        const uptime = row.uptime === null ? 0 : row.uptime * 100;
+                        return `<tr>
+                            <td>${row.start}</td>
+                            <td><div class="uptime-indicator" title="${uptime.toFixed(2)}% of ${row.samples} samples">
+                                <div class="uptime-fill" style="width: ${uptime}%"></div></div>
+                                ${uptime.toFixed(2)}%</td>
+                            <td>${formatTriple(row.cpu, '%', 1)}</td>
+                            <td>${formatTriple(row.memory, '%', 1)}</td>
+                            <td>${formatTriple(row.latency, ' ms', 0)}</td>
+                        </tr>`;
+                    }).join('');
+                });
+        }
+        
         // Update dashboard
         function updateDashboard() {
             fetch('/api/stats')
@@ -618,25 +770,39 @@ def dashboard():
                     // Update Response Time
                     document.getElementById('response-time').textContent = 
                         `${Math.round(data.response_time)} ms`;
+                    
+                    // Refresh as fast as an adaptive collector currently samples, if that's faster
+                    collectorInterval = data.sampling && data.sampling.mode === 'adaptive' ?
+                        data.sample_interval * 1000 : null;
                 });
             
             // Update alerts in the 4th quadrant
-            fetch('/api/alerts')
+            fetch('/api/alerts?limit=10')
                 .then(response => response.json())
-                .then(alerts => {
+                .then(data => {
+                    const alerts = data.alerts;
                     const alertsList = document.getElementById('alerts-list');
                     if (alerts.length === 0) {
                         alertsList.innerHTML = 'No recent alerts';
                     } else {
                         alertsList.innerHTML = alerts.map(alert => 
-                            `<div class="alert-item">${alert}</div>`
+                            `<div class="alert-item alert-${alert.severity}">[${alert.timestamp}] ${alert.alert_type} - ${alert.message}</div>`
                         ).join('');
                     }
                 });
             
-            // Update resource metrics chart
-            fetch('/api/history')
+            // Show rules that are currently firing above the alert history
+            fetch('/api/rules')
                 .then(response => response.json())
+                .then(rules => {
+                    const firing = rules.filter(rule => rule.firing);
+                    document.getElementById('firing-rules').innerHTML = firing.map(rule =>
+                        `<div class="alert-item">FIRING: ${rule.alert_type} (${rule.window})</div>`
+                    ).join('');
+                });
+            
+            // Update resource metrics chart
+            fetchPoints('history', 50)
                 .then(history => {
                     const timestamps = history.map(item => 
                         new Date(item.timestamp).toLocaleTimeString());
@@ -647,27 +813,43 @@ def dashboard():
                     metricsChart.data.datasets[0].data = cpuData;
                     metricsChart.data.datasets[1].data = memoryData;
                     metricsChart.update();
+                    
+                    updateSeries(networkChart, timestamps, [
+                        history.map(item => kilobytes(item.net_rx_bps)),
+                        history.map(item => kilobytes(item.net_tx_bps))
+                    ]);
+                    updateSeries(blockChart, timestamps, [
+                        history.map(item => kilobytes(item.block_read_bps)),
+                        history.map(item => kilobytes(item.block_write_bps))
+                    ]);
+                    updateSeries(throttlingChart, timestamps, [
+                        history.map(item => item.cpu_throttled_percent),
+                        history.map(item => item.cpu_throttled_ms)
+                    ]);
+                    updateSeries(pidsChart, timestamps, [history.map(item => item.pids)]);
                 });
                 
-            // Update uptime chart - with binary up/down status
-            fetch('/api/uptime')
+            // Update uptime chart - state timeline as binary up/down, availability in the title
+            fetch('/api/uptime?window=1h&window=24h&window=30d')
                 .then(response => response.json())
-                .then(uptimeData => {
-                    const timestamps = uptimeData.map(item => 
-                        new Date(item.timestamp).toLocaleTimeString());
-                    
-                    // Convert status to binary (1 for running, 0 for any other status)
-                    const statusData = uptimeData.map(item => 
-                        item.status === 'running' ? 1 : 0);
-                    
-                    uptimeChart.data.labels = timestamps;
-                    uptimeChart.data.datasets[0].data = statusData;
+                .then(uptime => {
+                    // One point per state change, plus one for now
+                    const points = uptime.timeline.concat(uptime.timeline.slice(-1).map(segment =>
+                        ({start: segment.end, state: segment.state})));
+                    uptimeChart.data.labels = points.map(segment =>
+                        new Date(segment.start * 1000).toLocaleTimeString());
+                    uptimeChart.data.datasets[0].data = points.map(segment =>
+                        segment.state === 'up' ? 1 : 0);
                     uptimeChart.update();
+                    
+                    document.getElementById('uptime-summary').textContent = Object.entries(uptime.windows)
+                        .filter(([name, window]) => window.availability !== null)
+                        .map(([name, window]) => `${name}: ${window.availability.toFixed(3)}%`)
+                        .join(' | ');
                 });
                 
             // Update latency chart
-            fetch('/api/latency')
-                .then(response => response.json())
+            fetchPoints('latency', 100)
                 .then(latencyData => {
                     const timestamps = latencyData.map(item => 
                         new Date(item.timestamp).toLocaleTimeString());
@@ -677,14 +859,27 @@ def dashboard():
                     latencyChart.data.datasets[0].data = values;
                     latencyChart.update();
                 });
+            
+            updateHourlyStats();
         }
         
         // Initial update interval
         let updateInterval = ''' + str(DEFAULT_COLLECTION_FREQUENCY * 1000) + ''';
+        let collectorInterval = null;
+        let dashboardTimer = null;
         
-        // Update dashboard initially and set interval
+        function scheduleDashboard() {
+            const delay = collectorInterval ?
+                Math.min(updateInterval, Math.max(collectorInterval, 1000)) : updateInterval;
+            dashboardTimer = setTimeout(() => {
+                updateDashboard();
+                scheduleDashboard();
+            }, delay);
+        }
+        
+        // Update dashboard initially and schedule the next updates
         updateDashboard();
-        let dashboardInterval = setInterval(updateDashboard, updateInterval);
+        scheduleDashboard();
     </script>
 </body>
 </html>
@@ -692,23 +887,115 @@ def dashboard():
 
 @app.route('/api/stats')
 def api_stats():
-    return jsonify(get_container_stats())
+    return jsonify(response_cache.get('stats', get_container_stats))
 
 @app.route('/api/alerts')
 def api_alerts():
-    return jsonify(get_recent_alerts())
+    """Query alert history
+
+    Query parameters:
+      start, end - time range (epoch seconds or 'YYYY-MM-DD HH:MM:SS')
+      since      - only alerts after this time (epoch seconds), for polling
+      type       - alert type to include (may be repeated)
+      limit      - page size (default 10, max 500)
+      offset     - number of alerts to skip, for pagination
+    """
+    try:
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'))
+        since = request.args.get('since', type=float)
+        limit = int(request.args.get('limit', 10))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid query parameters'}), 400
+    if since is not None:
+        # Alerts are timestamped to the microsecond; skip the one at `since` itself
+        start = max(start or 0, since + 1e-6)
+    
+    try:
+        alert_store.sync()
+    except Exception as e:
+        print(f"Error syncing alert history: {e}")
+    return versioned(alert_store.version(), lambda: alert_store.query(
+        start=start, end=end, alert_types=request.args.getlist('type'), limit=limit, offset=offset))
+
+@app.route('/api/rules')
+def api_rules():
+    status = read_status()
+    return jsonify(status.get('rules', []) if status else [])
+
+@app.route('/metrics')
+def metrics():
+    return Response(generate_latest(metrics_registry), content_type=CONTENT_TYPE_LATEST)
 
 @app.route('/api/history')
 def api_history():
-    return jsonify(get_metrics_history())
+    """Recent samples, oldest first
+
+    With ?since=<seq> (the last point's seq + 1) only newer points are
+    returned, as {"reset": false, "points": [...]}; "reset": true means the
+    points replace the client's (e.g. the collector restarted).
+    """
+    since = request.args.get('since', type=int)
+    version, last_modified = samples_version()
+
+    def build():
+        if ring_reader() is not None:
+            return delta(*ring_points(50, since, history_point), since)
+        return delta(response_cache.get('history', get_metrics_history), True, since)
+    return versioned(version, build, last_modified)
+
+@app.route('/api/hourly')
+def api_hourly():
+    """Hourly aggregates, oldest first; ?hours=N limits them to the last N hours"""
+    try:
+        hours = int(request.args.get('hours', 0))
+    except ValueError:
+        hours = -1
+    if hours < 0:
+        return jsonify({'status': 'error', 'message': 'hours must be a positive number'}), 400
+    # One cache entry for every ?hours=, cut to size after the lookup
+    rows = response_cache.get('hourly', read_hourly)
+    return jsonify(rows[-hours:] if hours else rows)
 
 @app.route('/api/uptime')
 def api_uptime():
-    return jsonify(uptime_data)
+    """Availability of the container
+
+    Query parameters:
+      window   - window to report, e.g. 15m, 24h, 30d (may be repeated;
+                 default UPTIME_WINDOWS)
+      slo      - availability target in percent (default SLO_TARGET)
+      timeline - how far back the state timeline goes (default: the shortest window)
+    """
+    try:
+        names = request.args.getlist('window') or UPTIME_WINDOWS.split(',')
+        windows = [(name.strip(), parse_window(name)) for name in names if name.strip()]
+        slo_target = float(request.args.get('slo', SLO_TARGET))
+        timeline = request.args.get('timeline')
+        timeline_window = parse_window(timeline) if timeline else min(seconds for _, seconds in windows)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid query parameters'}), 400
+    if not windows or not 0 < slo_target < 100:
+        return jsonify({'status': 'error', 'message': 'Invalid query parameters'}), 400
+    since = request.args.get('since', type=float)
+    # Changes with each transition, and with each sample as the windows move on
+    availability_index.sync()
+    try:
+        status_version = os.stat(STATUS_FILE).st_mtime_ns
+    except OSError:
+        status_version = 0
+    return versioned(f"{availability_index.inode}-{availability_index.offset}-{status_version}",
+                     lambda: get_uptime(windows, slo_target, timeline_window, since))
 
 @app.route('/api/latency')
 def api_latency():
-    return jsonify(latency_data)
+    """Recent response times, oldest first; ?since= works as for /api/history"""
+    since = request.args.get('since', type=int)
+    if ring_reader() is None:
+        return jsonify(delta(latency_data, True, since))
+    version, last_modified = samples_version()
+    return versioned(version, lambda: delta(*ring_points(100, since, latency_point), since), last_modified)
 
 @app.route('/api/settings', methods=['POST'])
 def api_settings():
@@ -729,34 +1016,14 @@ def api_settings():
     return jsonify({'status': 'error', 'message': 'Missing required parameters'}), 400
 
 if __name__ == '__main__':
-    # Initialize with varied uptime data to demonstrate proper tracking
     now = datetime.now()
     
-    # Initialize with some recent uptime and latency data points
+    # Initialize with some recent latency data points
     for i in range(10):
         timestamp = (now - timedelta(minutes=10-i)).strftime('%Y-%m-%d %H:%M:%S')
-        # Create more realistic initial data with variations
-        if i < 3:
-            uptime_data.append({
-                'timestamp': timestamp, 
-                'value': 0, 
-                'status': 'stopped'
-            })  # Show downtime at start
-        elif i < 7:
-            uptime_data.append({
-                'timestamp': timestamp, 
-                'value': 70, 
-                'status': 'running'
-            })  # Show restart/partial uptime
-        else:
-            uptime_data.append({
-                'timestamp': timestamp, 
-                'value': 100, 
-                'status': 'running'
-            })  # Show full uptime
-            
         # Add varied latency data
         latency_value = 20 + (i * 5) % 30  # Vary between 20-50ms
         latency_data.append({'timestamp': timestamp, 'value': latency_value})
     
-    app.run(host='0.0.0.0', port=8001, debug=True)
\ No newline at end of file
+    # The reloader would start a second dashboard process next to the collector
+    app.run(host='0.0.0.0', port=8001, debug=True, use_reloader=False)
\ No newline at end of file
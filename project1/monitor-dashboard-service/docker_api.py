@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Minimal Docker Engine API client over the unix socket.
+
+Talks HTTP to /var/run/docker.sock directly with the standard library, so
+sampling a container costs a request on a kept-alive connection instead of
+forking the docker CLI (which itself makes the same API calls).
+"""
+import http.client
+import json
+import os
+import socket
+from urllib.parse import quote, urlencode
+
+DOCKER_SOCKET = os.getenv('DOCKER_SOCKET', '/var/run/docker.sock')
+
+
+class DockerError(Exception):
+    """Raised for failed Docker API requests"""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a unix socket"""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerClient:
+    """Docker API requests on one kept-alive connection"""
+
+    def __init__(self, socket_path=DOCKER_SOCKET, timeout=10):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connection = None
+
+    def get(self, path):
+        """GET an API path and return the decoded JSON body"""
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = UnixHTTPConnection(self.socket_path, self.timeout)
+            try:
+                self.connection.request('GET', path)
+                response = self.connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                # The daemon may have closed an idle keep-alive connection; retry once
+                self.close()
+                if attempt == 2:
+                    raise
+        if response.status >= 400:
+            try:
+                message = json.loads(body).get('message', '')
+            except ValueError:
+                message = body.decode('utf-8', 'replace')
+            raise DockerError(response.status, message)
+        return json.loads(body)
+
+    def inspect(self, container):
+        """Container details (State, Config, ...); raises DockerError(404) if it doesn't exist"""
+        return self.get(f"/containers/{quote(container)}/json")
+
+    def stats(self, container):
+        """One stats snapshot, without waiting for a second sample to fill in precpu_stats"""
+        return self.get(f"/containers/{quote(container)}/stats?stream=false&one-shot=true")
+
+    def events(self, filters=None, since=None):
+        """Stream of event dicts from /events, until the daemon closes it
+
+        Runs on its own connection without a timeout: the stream is silent
+        while nothing happens. `since` (epoch seconds) replays events from
+        that time on first.
+        """
+        query = {}
+        if filters:
+            query['filters'] = json.dumps(filters)
+        if since is not None:
+            query['since'] = f"{since:.9f}"
+        connection = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            connection.request('GET', '/events' + (f"?{urlencode(query)}" if query else ''))
+            response = connection.getresponse()
+            if response.status >= 400:
+                raise DockerError(response.status, response.read().decode('utf-8', 'replace'))
+            # One JSON object per line
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            connection.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
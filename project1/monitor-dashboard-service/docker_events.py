@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Docker events for the monitored container, as they happen.
+
+Sampling only sees the container's state every SAMPLE_INTERVAL seconds, so
+a crash followed by a quick restart can fall between two samples.
+`EventWatcher` keeps one /events request open on the Docker socket,
+filtered to the container, and hands each lifecycle event to a callback
+as soon as the daemon emits it:
+
+  start, die, oom, health_status: healthy / health_status: unhealthy
+
+(plus kill, stop, restart and destroy, for logging). While nothing happens
+the watcher thread is blocked on a socket read and costs nothing. If the
+stream drops (e.g. the daemon restarts) it reconnects with `since` set to
+the last event it saw, so no event is lost or delivered twice.
+
+`FakeEventSource` replays recorded events through the same interface, for
+tests and demos. Record some with:
+
+  docker events --filter container=flask-app --format '{{json .}}' > events.jsonl
+
+and replay them (optionally at their original pace) with:
+
+  python3 docker_events.py replay events.jsonl [--speed 1]
+"""
+import argparse
+import json
+import threading
+import time
+
+from docker_api import DockerClient
+
+WATCHED_ACTIONS = ('start', 'die', 'oom', 'health_status', 'kill', 'stop', 'restart', 'destroy')
+RECONNECT_DELAY = 1  # seconds, doubled after each failed attempt
+MAX_RECONNECT_DELAY = 30
+
+
+def event_action(event):
+    """('health_status', 'unhealthy') for 'health_status: unhealthy', ('die', '') for 'die'"""
+    action = event.get('Action') or event.get('status', '')
+    name, _, detail = action.partition(':')
+    return name.strip(), detail.strip()
+
+
+def event_epoch(event):
+    """Time of an event in epoch seconds, to the nanosecond when Docker gives it"""
+    if event.get('timeNano'):
+        return event['timeNano'] / 1e9
+    return float(event.get('time', time.time()))
+
+
+def event_matches(event, containers):
+    """Whether an event is a watched action of one of `containers` (names or IDs)"""
+    if event.get('Type', 'container') != 'container' or event_action(event)[0] not in WATCHED_ACTIONS:
+        return False
+    actor = event.get('Actor', {})
+    name = actor.get('Attributes', {}).get('name')
+    container_id = actor.get('ID') or event.get('id', '')
+    return any(container in (name, container_id) or container_id.startswith(container) for container in containers)
+
+
+class FakeEventSource:
+    """Replays recorded events with DockerClient.events()'s interface
+
+    `events` is a list of event dicts or the path of a JSON Lines file.
+    With `speed`, the gaps between events are replayed at that rate (2 is
+    twice as fast); without it they are delivered at once. The stream ends
+    after the last event, like a daemon closing the connection; a watcher
+    then reconnects and, as with a real daemon, gets nothing it has seen.
+    """
+
+    def __init__(self, events, speed=None):
+        if isinstance(events, str):
+            with open(events, 'r') as f:
+                events = [json.loads(line) for line in f if line.strip()]
+        self.events_list = list(events)
+        self.speed = speed
+
+    def events(self, filters=None, since=None):
+        containers = (filters or {}).get('container')
+        previous = None
+        for event in self.events_list:
+            if containers and not event_matches(event, containers):
+                continue
+            if since is not None and event_epoch(event) < since:
+                continue
+            if self.speed and previous is not None:
+                time.sleep(max(event_epoch(event) - previous, 0) / self.speed)
+            previous = event_epoch(event)
+            yield event
+
+
+class EventWatcher:
+    """Calls `handle(event)` for each lifecycle event of `containers`, from a background thread"""
+
+    def __init__(self, containers, handle, source=None, log=print):
+        self.containers = list(containers)
+        self.handle = handle
+        self.source = source or DockerClient()
+        self.log = log
+        self.last_epoch = None
+        self.last_keys = set()  # events at last_epoch already handled
+        self.events_seen = 0
+        self.reconnects = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='docker-events')
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def stream(self):
+        """Handle events until the stream ends"""
+        filters = {'type': ['container'], 'container': self.containers}
+        for event in self.source.events(filters=filters, since=self.last_epoch):
+            if self.stopped.is_set():
+                return
+            if not event_matches(event, self.containers):
+                continue
+            epoch = event_epoch(event)
+            # Events replayed after a reconnect overlap the ones already seen
+            key = (event.get('id'), event.get('Action'), epoch)
+            if self.last_epoch is not None and (epoch < self.last_epoch or key in self.last_keys):
+                continue
+            if epoch != self.last_epoch:
+                self.last_epoch, self.last_keys = epoch, set()
+            self.last_keys.add(key)
+            self.events_seen += 1
+            try:
+                self.handle(event)
+            except Exception as e:
+                self.log('ERROR', f"Handling Docker event {event.get('Action')} failed: {e}")
+
+    def run(self):
+        delay = RECONNECT_DELAY
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            try:
+                self.stream()
+                reason = 'stream ended'
+            except Exception as e:
+                reason = str(e) or type(e).__name__
+            if self.stopped.is_set():
+                return
+            # Back off only while reconnecting keeps failing straight away
+            if time.monotonic() - started > MAX_RECONNECT_DELAY:
+                delay = RECONNECT_DELAY
+            self.reconnects += 1
+            self.log('WARNING', f"Docker events: {reason}; reconnecting in {delay:g}s")
+            self.stopped.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch or replay Docker events of a container')
+    parser.add_argument('command', choices=['watch', 'replay'])
+    parser.add_argument('file', nargs='?', help='recorded events (JSON Lines), for replay')
+    parser.add_argument('--container', action='append', help='container name or ID (repeatable)')
+    parser.add_argument('--speed', type=float, help='replay at this multiple of the recorded pace')
+    args = parser.parse_args()
+
+    source = FakeEventSource(args.file, args.speed) if args.command == 'replay' else DockerClient()
+    containers = args.container or []
+    filters = {'type': ['container'], 'container': containers} if containers else {'type': ['container']}
+    for event in source.events(filters=filters):
+        action, detail = event_action(event)
+        name = event.get('Actor', {}).get('Attributes', {}).get('name', event.get('id', '')[:12])
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event_epoch(event)))
+        print(f"[{stamp}] {name}: {action}{' ' + detail if detail else ''}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Prometheus exposition of the collector's latest sample.
+
+The dashboard serves /metrics from the status file the collector publishes
+after every sample, so a scrape is one small file read: it never waits on
+the collector or touches Docker. Series carry a `container` label.
+
+  container_up, container_cpu_percent, container_memory_percent,
+  container_memory_used_mb, container_memory_limit_mb,
+  container_response_time_ms, container_app_healthy
+  container_<resource> for the extended resources (net_rx_bps, pids, ...)
+  alert_rule_firing{rule}, alert_rule_value{rule}
+  collector_samples_total, collector_sample_errors_total,
+  collector_sample_duration_seconds, collector_sampling_seconds_total,
+  collector_status_age_seconds
+"""
+import time
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from collector import read_status
+from metrics_csv import EXTENDED_COLUMNS
+
+CONTAINER_GAUGES = [
+    ('cpu', 'container_cpu_percent', 'CPU usage, percent of one core'),
+    ('memory_percent', 'container_memory_percent', 'Memory usage, percent of the limit'),
+    ('memory_used', 'container_memory_used_mb', 'Memory in use (MB)'),
+    ('memory_limit', 'container_memory_limit_mb', 'Memory limit (MB)'),
+    ('response_time', 'container_response_time_ms', 'Health check response time (ms)'),
+]
+
+
+def gauge(name, documentation, labels, value, label_names=('container',)):
+    family = GaugeMetricFamily(name, documentation, labels=label_names)
+    family.add_metric(labels, value)
+    return family
+
+
+class StatusCollector:
+    """Turns the collector's published status into metric families at scrape time"""
+
+    def __init__(self, read=read_status):
+        self.read = read
+
+    def collect(self):
+        status = self.read()
+        if status is None:
+            return
+        container = [status['container']]
+        running = status['status'] == 'running'
+        yield gauge('container_up', 'Whether the container is running', container, 1 if running else 0)
+        yield gauge('container_app_healthy', 'Whether the health check passed',
+                    container, 1 if status.get('app_status') == 'healthy' else 0)
+        for key, name, documentation in CONTAINER_GAUGES:
+            yield gauge(name, documentation, container, status.get(key) or 0)
+        resources = status.get('resources') or {}
+        for key in EXTENDED_COLUMNS:
+            if resources.get(key) is not None:
+                yield gauge(f'container_{key}', f'Container {key.replace("_", " ")}', container, resources[key])
+
+        firing = GaugeMetricFamily('alert_rule_firing', 'Whether an alert rule is firing',
+                                   labels=['container', 'rule'])
+        values = GaugeMetricFamily('alert_rule_value', "An alert rule's current window value",
+                                   labels=['container', 'rule'])
+        for rule in status.get('rules', []):
+            firing.add_metric(container + [rule['name']], 1 if rule['firing'] else 0)
+            if rule['value'] is not None:
+                values.add_metric(container + [rule['name']], rule['value'])
+        yield firing
+        yield values
+
+        timing = status.get('collector')
+        if timing:
+            yield CounterMetricFamily('collector_samples', 'Samples taken by the collector',
+                                      value=timing['samples'])
+            yield CounterMetricFamily('collector_sample_errors', 'Samples that failed',
+                                      value=timing['errors'])
+            yield GaugeMetricFamily('collector_sample_duration_seconds', 'Time taken by the last sample',
+                                    value=timing['sample_seconds'])
+            yield CounterMetricFamily('collector_sampling_seconds', 'Time spent sampling',
+                                      value=timing['sample_seconds_total'])
+        yield GaugeMetricFamily('collector_sample_interval_seconds', 'Current sampling interval',
+                                value=status.get('sample_interval', 0))
+        yield GaugeMetricFamily('collector_status_age_seconds', 'Age of the latest published sample',
+                                value=time.time() - status['epoch'])
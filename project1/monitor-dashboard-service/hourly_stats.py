@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Per-hour aggregates of the container's samples.
+
+The collector feeds every sample into the aggregate of the current (local
+time) hour: sample and up counts, and min/avg/max/p95 of CPU %, memory %
+and response time. Nothing is rescanned: a sample updates a count, a sum,
+min/max and one histogram bucket. Each sample is weighted by the seconds
+until the next one (its `sample_interval`), so uptime, averages and p95
+are shares of time rather than of samples: adaptive sampling takes many
+more samples during incidents, which would otherwise outweigh the quiet
+time around them. p95 comes from a sparse log-scale
+histogram whose buckets are 2% wide, so it is within 2% of the exact value.
+When an hour ends its aggregate is reduced to the summary and the
+histograms are dropped.
+
+The aggregates are written to HOURLY_STATS_FILE (JSON, replaced
+atomically) every HOURLY_FLUSH_INTERVAL seconds and at each hour change;
+the dashboard serves them at /api/hourly and the report is built from them:
+
+  python3 hourly_stats.py report [--hours 24]
+
+A sample counts as up when the container is running and its health check
+passed. When there is no aggregate file yet the collector seeds one from
+the metrics CSV, weighting each row by the gap to the next one (at most
+SAMPLE_INTERVAL_MAX); the CSV has no rows for downtime, so uptime for
+those hours only reflects health check failures.
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+from adaptive_sampling import SAMPLE_INTERVAL_MAX
+
+HOURLY_FILE = os.getenv('HOURLY_STATS_FILE', '/var/log/container_hourly.json')
+HOURLY_RETENTION = int(os.getenv('HOURLY_RETENTION', '168'))  # hours kept (7 days)
+HOURLY_FLUSH_INTERVAL = float(os.getenv('HOURLY_FLUSH_INTERVAL', '10'))  # seconds
+
+# Aggregated metric: key in the collector's status dict, column in the metrics CSV
+HOURLY_METRICS = {
+    'cpu': ('cpu', 'cpu_percent'),
+    'memory': ('memory_percent', 'memory_percent'),
+    'latency': ('response_time', 'response_time_ms'),
+}
+HISTOGRAM_STEP = math.log(1.02)
+
+
+def hour_start(epoch):
+    """Epoch of the start of the local-time hour containing `epoch`"""
+    t = time.localtime(epoch)
+    return int(epoch) - t.tm_min * 60 - t.tm_sec
+
+
+class MetricAggregate:
+    """Count, time-weighted sum, min, max and a log-scale histogram of one metric"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}  # bucket -> seconds
+
+    def add(self, value, weight=1.0):
+        self.count += 1
+        self.seconds += weight
+        self.total += value * weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = int(math.log1p(max(value, 0.0)) / HISTOGRAM_STEP)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + weight
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.seconds
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = math.expm1((bucket + 1) * HISTOGRAM_STEP)
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'min': None, 'avg': None, 'max': None, 'p95': None}
+        return {'min': round(self.min, 2), 'avg': round(self.total / self.seconds, 2) if self.seconds else None,
+                'max': round(self.max, 2), 'p95': round(self.percentile(0.95), 2)}
+
+    def to_dict(self):
+        return {'count': self.count, 'seconds': self.seconds, 'total': self.total, 'min': self.min,
+                'max': self.max, 'buckets': self.buckets}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.count, aggregate.total = data['count'], data['total']
+        # Saved before weighting: one unit per sample
+        aggregate.seconds = data.get('seconds', data['count'])
+        aggregate.min, aggregate.max = data['min'], data['max']
+        aggregate.buckets = {int(bucket): count for bucket, count in data['buckets'].items()}
+        return aggregate
+
+
+class HourAggregate:
+    """All samples of one hour"""
+
+    def __init__(self, hour):
+        self.hour = hour
+        self.samples = 0
+        self.up = 0
+        self.seconds = 0.0
+        self.up_seconds = 0.0
+        self.metrics = {name: MetricAggregate() for name in HOURLY_METRICS}
+
+    def add(self, up, values, weight=1.0):
+        self.samples += 1
+        self.seconds += weight
+        if up:
+            self.up += 1
+            self.up_seconds += weight
+        for name, value in values.items():
+            if value is not None:
+                self.metrics[name].add(value, weight)
+
+    def summary(self):
+        row = {'hour': self.hour, 'start': time.strftime('%Y-%m-%d %H:00', time.localtime(self.hour)),
+               'samples': self.samples, 'up': self.up,
+               'seconds': round(self.seconds, 3), 'up_seconds': round(self.up_seconds, 3),
+               'uptime': round(self.up_seconds / self.seconds, 4) if self.seconds else None}
+        for name, aggregate in self.metrics.items():
+            row[name] = aggregate.summary()
+            row[name]['count'] = aggregate.count
+            row[name]['seconds'] = round(aggregate.seconds, 3)
+        return row
+
+    def to_dict(self):
+        return {'hour': self.hour, 'samples': self.samples, 'up': self.up, 'seconds': self.seconds,
+                'up_seconds': self.up_seconds,
+                'metrics': {name: aggregate.to_dict() for name, aggregate in self.metrics.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls(data['hour'])
+        aggregate.samples, aggregate.up = data['samples'], data['up']
+        aggregate.seconds = data.get('seconds', data['samples'])
+        aggregate.up_seconds = data.get('up_seconds', data['up'])
+        for name, metric in data['metrics'].items():
+            if name in aggregate.metrics:
+                aggregate.metrics[name] = MetricAggregate.from_dict(metric)
+        return aggregate
+
+
+class HourlyStats:
+    """Summaries of past hours plus the full aggregate of the current one"""
+
+    def __init__(self, retention=HOURLY_RETENTION):
+        self.retention = retention
+        self.hours = []  # summaries of finished hours, oldest first
+        self.current = None
+
+    def add(self, epoch, up, values, weight=1.0):
+        """Add a sample standing for `weight` seconds; returns True if it started a new hour"""
+        hour = hour_start(epoch)
+        if self.current is not None and hour < self.current.hour:
+            # Samples arrive in time order; a clock step backwards is ignored
+            return False
+        new_hour = self.current is None or hour != self.current.hour
+        if new_hour:
+            if self.current is not None:
+                self.hours.append(self.current.summary())
+                del self.hours[:-self.retention]
+            self.current = HourAggregate(hour)
+        self.current.add(up, values, weight)
+        return new_hour
+
+    def add_status(self, status):
+        """Add one of the collector's status samples"""
+        running = status['status'] == 'running'
+        values = {name: status.get(key) if running else None for name, (key, _) in HOURLY_METRICS.items()}
+        return self.add(status['epoch'], running and status.get('app_status') == 'healthy', values,
+                        status.get('sample_interval') or 1.0)
+
+    def rows(self, hours=None):
+        """Summaries of the last `hours` hours (all kept hours if None), oldest first"""
+        rows = self.hours + ([self.current.summary()] if self.current else [])
+        return rows[-hours:] if hours else rows
+
+    def to_dict(self):
+        return {'hours': self.hours, 'current': self.current.to_dict() if self.current else None}
+
+    def save(self, path=HOURLY_FILE):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=HOURLY_FILE, retention=HOURLY_RETENTION):
+        """Aggregates saved at `path`; None if there aren't any"""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stats = cls(retention)
+        stats.hours = data.get('hours', [])[-retention:]
+        if data.get('current'):
+            stats.current = HourAggregate.from_dict(data['current'])
+        return stats
+
+    @classmethod
+    def from_samples(cls, samples, retention=HOURLY_RETENTION, max_gap=SAMPLE_INTERVAL_MAX):
+        """Aggregates of (epoch, sample) rows from the metrics CSV, each weighted by the
+        gap to the next row (the previous gap for the last one), at most `max_gap`"""
+        stats = cls(retention)
+        previous = None
+        gap = 1.0
+        for row in samples:
+            if previous is not None:
+                gap = min(max(row[0] - previous[0], 0.0), max_gap) or gap
+                stats.add_sample(*previous, gap)
+            previous = row
+        if previous is not None:
+            stats.add_sample(*previous, gap)
+        return stats
+
+    def add_sample(self, epoch, sample, weight):
+        """Add a row of the metrics CSV"""
+        values = {}
+        for name, (_, column) in HOURLY_METRICS.items():
+            try:
+                values[name] = float(sample[column])
+            except (KeyError, TypeError, ValueError):
+                values[name] = None
+        self.add(epoch, sample.get('status') == 'healthy', values, weight)
+
+
+def summarize(rows):
+    """Totals over hourly rows, in one pass: time-weighted averages, overall
+    uptime, extremes, and the highest hourly p95
+
+    Rows saved before samples were weighted count one second per sample.
+    """
+    samples = 0
+    seconds = up_seconds = 0.0
+    totals = {name: {'seconds': 0.0, 'sum': 0.0, 'min': None, 'max': None, 'p95': None} for name in HOURLY_METRICS}
+    for row in rows:
+        samples += row['samples']
+        seconds += row.get('seconds', row['samples'])
+        up_seconds += row.get('up_seconds', row['up'])
+        for name, total in totals.items():
+            metric = row[name]
+            if not metric['count'] or metric['avg'] is None:
+                continue
+            weight = metric.get('seconds', metric['count'])
+            total['seconds'] += weight
+            total['sum'] += metric['avg'] * weight
+            for key, pick in (('min', min), ('max', max), ('p95', max)):
+                total[key] = metric[key] if total[key] is None else pick(total[key], metric[key])
+    summary = {'hours': len(rows), 'samples': samples, 'uptime': up_seconds / seconds if seconds else None}
+    for name, total in totals.items():
+        summary[name] = {'avg': total['sum'] / total['seconds'] if total['seconds'] else None,
+                         'min': total['min'], 'max': total['max'], 'worst_hour_p95': total['p95']}
+    return summary
+
+
+def format_report(summary):
+    def number(value, digits=2):
+        return '0' if value is None else f"{value:.{digits}f}"
+
+    lines = [
+        f"Average CPU Usage: {number(summary['cpu']['avg'])}%",
+        f"Average Memory Usage: {number(summary['memory']['avg'])}%",
+        f"Average Response Time: {number(summary['latency']['avg'], 0)}ms",
+        f"Peak CPU Usage: {number(summary['cpu']['max'])}% (worst hourly p95 {number(summary['cpu']['worst_hour_p95'])}%)",
+        f"Peak Memory Usage: {number(summary['memory']['max'])}% "
+        f"(worst hourly p95 {number(summary['memory']['worst_hour_p95'])}%)",
+        f"Slowest Response: {number(summary['latency']['max'], 0)}ms "
+        f"(worst hourly p95 {number(summary['latency']['worst_hour_p95'], 0)}ms)",
+        f"Uptime: {number(None if summary['uptime'] is None else summary['uptime'] * 100, 3)}% "
+        f"over {summary['hours']} hour(s), {summary['samples']} samples",
+    ]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hourly container statistics')
+    parser.add_argument('command', choices=['report', 'json'])
+    parser.add_argument('--file', default=HOURLY_FILE)
+    parser.add_argument('--hours', type=int, help='only the last N hours')
+    args = parser.parse_args()
+
+    stats = HourlyStats.load(args.file) or HourlyStats()
+    rows = stats.rows(args.hours)
+    if args.command == 'json':
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_report(summarize(rows)))
+
+
+if __name__ == '__main__':
+    main()
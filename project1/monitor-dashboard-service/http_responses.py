@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Conditional, compressed JSON responses.
+
+Pollers refetch the same JSON every few seconds, mostly unchanged. Three
+things make that cheap:
+
+  - Conditional GET. An endpoint whose data has a version (a store's
+    sequence number) calls `versioned(version, build, last_modified)`: when
+    the client's If-None-Match already names that version it gets a 304
+    without `build()` running at all. Any other GET returning JSON gets an
+    ETag hashed from its body after the fact, so an unchanged body is still
+    answered with an empty 304. ETags are weak, so they hold for compressed
+    and uncompressed bodies alike.
+  - Compression. Text bodies of at least COMPRESS_MIN_SIZE bytes are sent
+    brotli (when the Brotli package is installed) or gzip encoded,
+    whichever the client accepts. Compressed bodies of versioned responses
+    are kept for reuse until the version changes.
+  - Serialization. `FastJSONProvider` encodes with orjson when it is
+    installed, and with the json module otherwise.
+
+NOTE: each service is built from its own Docker context, so this module is
+duplicated in app/ and monitor-dashboard-service/. Keep them in sync.
+"""
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # falls back to the json module
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))  # bytes
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '5'))  # gzip 1-9; brotli uses its 0-11 scale at this level
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+COMPRESSED_CACHE_SIZE = 64
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when available
+
+    Values orjson doesn't handle itself (Decimal, dates...) go through
+    Flask's default conversions, so the output matches the json module's
+    (except that non-ASCII characters are written as UTF-8, not escaped).
+    Compact output and indent=2, which is what Flask's responses ask for,
+    are encoded by orjson; other json.dumps arguments fall back to json.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = self.orjson_option(kwargs)
+        if option is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def orjson_option(self, kwargs):
+        """orjson options equivalent to json.dumps `kwargs`, None if there are none"""
+        if orjson is None:
+            return None
+        kwargs = dict(kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        indent = kwargs.pop('indent', None)
+        separators = kwargs.pop('separators', None)
+        if indent == 2 and separators in (None, (',', ': ')):
+            option |= orjson.OPT_INDENT_2
+        elif indent is not None or separators not in (None, (',', ':')):
+            return None
+        if kwargs.pop('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        kwargs.pop('ensure_ascii', None)
+        return None if kwargs else option
+
+
+def versioned(version, build, last_modified=None):
+    """JSON response for data at `version`; 304 if the client already has it
+
+    `build()` returns the payload and only runs when the client's copy is
+    out of date. `last_modified` (epoch seconds) is sent as Last-Modified,
+    and honoured for clients that send If-Modified-Since without an ETag.
+    """
+    etag = str(version)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        # If-Modified-Since has whole-second resolution: only trust it for strictly older data
+        fresh = (last_modified is not None and request.if_modified_since is not None
+                 and last_modified < request.if_modified_since.timestamp())
+    response = Response(status=304) if fresh else current_app.json.response(build())
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Cacheable, but revalidated on every use
+    response.cache_control.no_cache = True
+    return response
+
+
+class ResponseOptimizer:
+    """after_request hook adding content ETags and compression"""
+
+    def __init__(self, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL):
+        self.min_size = min_size
+        self.level = level
+        self.compressed = OrderedDict()  # (path, ETag, encoding) -> body
+        self.lock = threading.Lock()
+
+    def encoding(self):
+        """Best encoding the client accepts, None for identity"""
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.level)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def __call__(self, response):
+        if request.method not in ('GET', 'HEAD') or response.direct_passthrough or response.is_streamed:
+            return response
+        versioned_response = 'ETag' in response.headers
+        if response.status_code == 200 and response.mimetype == 'application/json':
+            if not versioned_response:
+                response.add_etag(weak=True)
+                response.cache_control.no_cache = True
+            response.make_conditional(request)
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.encoding()
+        if encoding is None or (response.content_length or 0) < self.min_size:
+            return response
+        # Only a versioned body is likely to be asked for again
+        key = (request.full_path, response.get_etag()[0], encoding) if versioned_response else None
+        with self.lock:
+            body = self.compressed.get(key) if key else None
+        if body is None:
+            body = self.compress(response.get_data(), encoding)
+            if key:
+                with self.lock:
+                    self.compressed[key] = body
+                    while len(self.compressed) > COMPRESSED_CACHE_SIZE:
+                        self.compressed.popitem(last=False)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_app(app, json_provider=FastJSONProvider):
+    """Optimize every response, encoding JSON with `json_provider` (None to keep the app's own)"""
+    if json_provider is not None:
+        app.json = json_provider(app)
+    app.after_request(ResponseOptimizer())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Reading and writing samples in the metrics CSV.
+
+The header row identifies the schema version. New versions only append
+columns, so a row is read by position against the current header and rows
+of older files simply lack the newer fields.
+
+  v1: timestamp,cpu_percent,memory_usage_mb,memory_percent,response_time_ms,status
+  v2: v1 + net_rx_bps,net_tx_bps,block_read_bps,block_write_bps,pids,
+           cpu_throttled_percent,cpu_throttled_ms
+
+  2025-05-16 14:16:17,0.00,11,100.00,17,healthy,1520.00,880.00,0.00,4096.00,5,12.50,38.00
+
+Rates are per second over the sample interval; cpu_throttled_percent is the
+share of CFS periods in which the container was throttled and
+cpu_throttled_ms the time spent throttled per second. Fields that couldn't
+be collected are left empty.
+"""
+import csv
+import os
+import time
+
+METRICS_SCHEMAS = {
+    1: ['timestamp', 'cpu_percent', 'memory_usage_mb', 'memory_percent', 'response_time_ms', 'status'],
+}
+METRICS_SCHEMAS[2] = METRICS_SCHEMAS[1] + ['net_rx_bps', 'net_tx_bps', 'block_read_bps', 'block_write_bps',
+                                           'pids', 'cpu_throttled_percent', 'cpu_throttled_ms']
+METRICS_SCHEMA_VERSION = 2
+METRICS_HEADER = METRICS_SCHEMAS[METRICS_SCHEMA_VERSION]
+EXTENDED_COLUMNS = METRICS_HEADER[len(METRICS_SCHEMAS[1]):]
+MIN_COLUMNS = len(METRICS_SCHEMAS[1])
+
+
+def schema_version(header):
+    """Schema version of a header row, None if it isn't a known header"""
+    for version, columns in METRICS_SCHEMAS.items():
+        if header == columns:
+            return version
+    return None
+
+
+def parse_timestamp(text):
+    """'YYYY-MM-DD HH:MM:SS' (local time) to epoch seconds, without strptime"""
+    return time.mktime((int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                        int(text[11:13]), int(text[14:16]), int(text[17:19]), 0, 0, -1))
+
+
+def row_to_sample(row):
+    """Convert a CSV row to (epoch, sample dict); None for headers and short rows"""
+    if len(row) < MIN_COLUMNS or row[0] == 'timestamp':
+        return None
+    try:
+        epoch = parse_timestamp(row[0])
+    except ValueError:
+        return None
+    return epoch, dict(zip(METRICS_HEADER, row))
+
+
+def parse_rows(lines):
+    """Yield (epoch, sample) for each valid CSV line"""
+    for row in csv.reader(lines):
+        parsed = row_to_sample(row)
+        if parsed:
+            yield parsed
+
+
+def read_samples(path):
+    """Yield (epoch, sample) for every sample in a metrics CSV file"""
+    with open(path, 'r', newline='') as f:
+        yield from parse_rows(f)
+
+
+def prepare_metrics_file(path):
+    """Make sure `path` starts with the current header
+
+    A file written with an older schema is moved aside as
+    <name>.v<version>.csv, so every file's rows match its header.
+    Returns the path the old file was moved to, if any.
+    """
+    try:
+        with open(path, 'r', newline='') as f:
+            header = next(csv.reader(f), None)
+    except FileNotFoundError:
+        header = None
+    if header == METRICS_HEADER:
+        return None
+
+    moved = None
+    if header is not None:
+        base, extension = os.path.splitext(path)
+        moved = f"{base}.v{schema_version(header) or 'unknown'}{extension}"
+        os.replace(path, moved)
+    with open(path, 'w') as f:
+        f.write(','.join(METRICS_HEADER) + '\n')
+    return moved
+
+
+def format_value(value, digits=2):
+    """CSV field for an optional number: fixed decimals, empty if unknown"""
+    return '' if value is None else f"{value:.{digits}f}"
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Shared-memory ring of the collector's latest samples.
+
+The dashboard used to re-read and parse the metrics CSV for /api/history,
+and every process kept its own copy of recent samples. The collector now
+also writes each sample into a fixed-size ring in a memory-mapped file
+under /dev/shm (METRICS_RING_FILE), which any number of processes map
+read-only: reading the last N samples is N struct unpacks straight out of
+shared memory, with no file reads, locks or text parsing. The CSV stays the
+durable record; the ring only holds the last METRICS_RING_SIZE samples and
+doesn't survive a reboot.
+
+Layout (little-endian):
+
+  header  magic "CMRING01", record size, capacity, count of samples written
+  slot i  sequence (uint64) + RING_FIELDS (float64 each, NaN for None)
+
+There is a single writer and no lock. Each slot is a seqlock: the writer
+sets the slot's sequence to 2*n+1 (odd: being written) before writing
+sample n, 2*n+2 after, and then bumps the count. A reader of sample n
+checks the sequence is 2*n+2 before and after copying the slot, so it
+never returns a torn sample or one overwritten by a later lap of the ring.
+(Both the writer's stores and the reader's loads go through the mmap in
+program order; on weakly ordered CPUs a torn read is still caught, as the
+sequence is re-checked after the copy.)
+
+A plain file is mapped rather than multiprocessing.shared_memory, whose
+resource tracker unlinks the segment when a process that merely attached
+to it exits (before Python 3.13).
+"""
+import math
+import mmap
+import os
+import struct
+
+from metrics_csv import EXTENDED_COLUMNS
+
+METRICS_RING_FILE = os.getenv('METRICS_RING_FILE', '/dev/shm/container_metrics.ring')
+METRICS_RING_SIZE = int(os.getenv('METRICS_RING_SIZE', '4096'))  # samples kept
+
+MAGIC = b'CMRING01'
+HEADER = struct.Struct('<8sIIQ')  # magic, record size, capacity, count
+COUNT_OFFSET = 16
+SEQUENCE = struct.Struct('<Q')
+
+STATUS_CODES = ('missing', 'stopped', 'running')
+APP_STATUS_CODES = (None, 'healthy', 'unhealthy')
+RING_FIELDS = ['epoch', 'sample_interval', 'status', 'app_status', 'cpu', 'memory_used', 'memory_limit',
+               'memory_percent', 'response_time'] + EXTENDED_COLUMNS
+RECORD = struct.Struct(f'<Q{len(RING_FIELDS)}d')
+READ_RETRIES = 3
+
+
+def _encode(value, codes=None):
+    if codes is not None:
+        return float(codes.index(value)) if value in codes else math.nan
+    return math.nan if value is None else float(value)
+
+
+def _decode(values):
+    sample = {}
+    for field, value in zip(RING_FIELDS, values):
+        if field == 'status':
+            sample[field] = STATUS_CODES[int(value)] if value == value else None
+        elif field == 'app_status':
+            sample[field] = APP_STATUS_CODES[int(value)] if value == value else None
+        else:
+            sample[field] = None if value != value else value
+    return sample
+
+
+class RingWriter:
+    """The collector's end: appends samples to the ring"""
+
+    def __init__(self, path=METRICS_RING_FILE, capacity=METRICS_RING_SIZE):
+        size = HEADER.size + capacity * RECORD.size
+        self.map = self.reuse(path, size, capacity)
+        if self.map is None:
+            # A new file rather than resizing the old one: a reader touching a
+            # mapping of a file shrunk under it would get SIGBUS
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.truncate(size)
+            with open(temp_path, 'r+b') as f:
+                self.map = mmap.mmap(f.fileno(), size)
+            HEADER.pack_into(self.map, 0, MAGIC, RECORD.size, capacity, 0)
+            os.replace(temp_path, path)
+        self.count = HEADER.unpack_from(self.map, 0)[3]
+        self.capacity = capacity
+
+    @staticmethod
+    def reuse(path, size, capacity):
+        """Mapping of an existing ring with the same layout, to keep the previous run's samples"""
+        try:
+            with open(path, 'r+b') as f:
+                if os.fstat(f.fileno()).st_size != size:
+                    return None
+                ring_map = mmap.mmap(f.fileno(), size)
+        except (OSError, ValueError):
+            return None
+        if HEADER.unpack_from(ring_map, 0)[:3] != (MAGIC, RECORD.size, capacity):
+            ring_map.close()
+            return None
+        return ring_map
+
+    def append(self, status):
+        """Write one of the collector's status dicts as the next sample"""
+        resources = status.get('resources') or {}
+        values = []
+        for field in RING_FIELDS:
+            if field == 'status':
+                values.append(_encode(status['status'], STATUS_CODES))
+            elif field == 'app_status':
+                values.append(_encode(status.get('app_status'), APP_STATUS_CODES))
+            elif field in EXTENDED_COLUMNS:
+                values.append(_encode(resources.get(field)))
+            else:
+                values.append(_encode(status.get(field)))
+        n = self.count
+        offset = HEADER.size + (n % self.capacity) * RECORD.size
+        SEQUENCE.pack_into(self.map, offset, 2 * n + 1)
+        RECORD.pack_into(self.map, offset, 2 * n + 1, *values)
+        SEQUENCE.pack_into(self.map, offset, 2 * n + 2)
+        self.count = n + 1
+        struct.pack_into('<Q', self.map, COUNT_OFFSET, self.count)
+
+    def close(self):
+        self.map.close()
+
+
+class RingReader:
+    """A reader's end: maps the ring read-only; None from open() while there is no ring"""
+
+    def __init__(self, path, ring_map, inode, capacity):
+        self.path = path
+        self.map = ring_map
+        self.inode = inode
+        self.capacity = capacity
+
+    @classmethod
+    def open(cls, path=METRICS_RING_FILE):
+        try:
+            with open(path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                ring_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        magic, record_size, capacity, _ = HEADER.unpack_from(ring_map, 0)
+        if magic != MAGIC or record_size != RECORD.size or len(ring_map) < HEADER.size + capacity * RECORD.size:
+            ring_map.close()
+            return None
+        return cls(path, ring_map, inode, capacity)
+
+    def replaced(self):
+        """Whether the writer has since started a new ring file (reopen to follow it)"""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except OSError:
+            return True
+
+    def count(self):
+        """Samples written so far (the sequence number of the next one)"""
+        return struct.unpack_from('<Q', self.map, COUNT_OFFSET)[0]
+
+    def read(self, n):
+        """Sample number `n` as a dict, None if it was overwritten or is being written"""
+        offset = HEADER.size + (n % self.capacity) * RECORD.size
+        expected = 2 * n + 2
+        for _ in range(READ_RETRIES):
+            record = RECORD.unpack_from(self.map, offset)
+            if record[0] != expected:
+                if record[0] == expected - 1:
+                    continue  # being written right now
+                return None
+            if SEQUENCE.unpack_from(self.map, offset)[0] == expected:
+                return _decode(record[1:])
+        return None
+
+    def latest(self, limit=1, since=None, where=None):
+        """Up to `limit` most recent samples, oldest first, each with its number as 'seq'
+
+        `since` skips samples numbered below it; `where(sample)` keeps only
+        the samples it is true for (scanning further back for them).
+        """
+        count = self.count()
+        first = max(count - self.capacity, since or 0)
+        samples = []
+        for n in range(count - 1, first - 1, -1):
+            sample = self.read(n)
+            if sample is None:
+                break  # overwritten: everything older is too
+            if where is None or where(sample):
+                sample['seq'] = n
+                samples.append(sample)
+                if len(samples) == limit:
+                    break
+        samples.reverse()
+        return samples
+
+    def close(self):
+        self.map.close()
@@ -25,6 +25,7 @@ CONTAINER_NAME="${CONTAINER_NAME:-flask-app}"
 LOG_FILE="/var/log/container_monitor.log"         # General monitoring logs
 ALERT_LOG="/var/log/container_alerts.log"         # Alert-specific logs
 METRICS_FILE="/var/log/container_metrics.csv"     # CSV file for metrics data
+HOURLY_FILE="${HOURLY_STATS_FILE:-/var/log/container_hourly.json}"  # Collector's hourly aggregates
 
 # Alert thresholds - these values trigger alerts when exceeded
 # Set these via environment variables or modify defaults here
@@ -32,6 +33,15 @@ CPU_THRESHOLD="$CPU_THRESHOLD"                    # CPU usage percentage (e.g.,
 MEMORY_THRESHOLD="$MEMORY_THRESHOLD"              # Memory usage percentage (e.g., 80)
 RESPONSE_TIME_THRESHOLD="$RESPONSE_TIME_THRESHOLD" # Response time in milliseconds (e.g., 1000)
 
+# docker-compose passes list-style values verbatim, so CPU_THRESHOLD="40" arrives
+# with its quotes - strip them so the values are usable in comparisons
+CPU_THRESHOLD="${CPU_THRESHOLD//\"/}"
+MEMORY_THRESHOLD="${MEMORY_THRESHOLD//\"/}"
+RESPONSE_TIME_THRESHOLD="${RESPONSE_TIME_THRESHOLD//\"/}"
+
+# Alert log format: "json" (one JSON record per line, default) or "text" (legacy)
+ALERT_FORMAT="${ALERT_FORMAT:-json}"
+
 # ========================================
 # INITIALIZATION FUNCTIONS
 # ========================================
@@ -65,17 +75,67 @@ log_message() {
     echo "[$timestamp] [$level] $message" | tee -a "$LOG_FILE"
 }
 
+# JSON encoding helpers for send_alert, storing the result in the variable named
+# by $1 (printf -v, so no subshell is spawned)
+# json_string VAR TEXT - TEXT as a quoted JSON string, with \, " and control characters escaped
+json_string() {
+    local _json="$2"
+    _json="${_json//\\/\\\\}"
+    _json="${_json//\"/\\\"}"
+    _json="${_json//$'\n'/\\n}"
+    _json="${_json//$'\r'/\\r}"
+    _json="${_json//$'\t'/\\t}"
+    # Any other control character has no place in a one-line message
+    _json="${_json//[[:cntrl:]]/}"
+    printf -v "$1" '"%s"' "$_json"
+}
+
+# json_number VAR TEXT - TEXT if it is a number, otherwise null
+json_number() {
+    if [[ $2 =~ ^-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?$ ]]; then
+        printf -v "$1" '%s' "$2"
+    else
+        printf -v "$1" 'null'
+    fi
+}
+
 # Alert-specific logging function for threshold violations
+# Writes one structured JSON record per alert (see alert_records.py), or the
+# legacy "[timestamp] ALERT: type - message" line when ALERT_FORMAT=text.
+# Uses bash builtins for the timestamp so no extra processes are spawned.
 # Parameters:
 #   $1 - Alert type (High CPU, Memory, etc.)
 #   $2 - Detailed alert message
+#   $3 - Severity (critical/warning, optional)
+#   $4 - Metric name (optional)
+#   $5 - Observed value (optional)
+#   $6 - Threshold (optional)
 send_alert() {
     local alert_type="$1"
     local message="$2"
-    local timestamp=$(date '+%Y-%m-%d %H:%M:%S')
+    local severity="${3:-warning}"
+    local metric="$4"
+    local value="$5"
+    local threshold="$6"
+    local epoch="$EPOCHSECONDS"
+    local timestamp
+    printf -v timestamp '%(%Y-%m-%d %H:%M:%S)T' "$epoch"
     
     # Log alert to both alert log and console
-    echo "[$timestamp] ALERT: $alert_type - $message" | tee -a "$ALERT_LOG"
+    if [ "$ALERT_FORMAT" = "text" ]; then
+        echo "[$timestamp] ALERT: $alert_type - $message" | tee -a "$ALERT_LOG"
+    else
+        local type_json severity_json metric_json="null" value_json threshold_json message_json
+        json_string type_json "$alert_type"
+        json_string severity_json "$severity"
+        [ -n "$metric" ] && json_string metric_json "$metric"
+        json_number value_json "$value"
+        json_number threshold_json "$threshold"
+        json_string message_json "$message"
+        printf '{"epoch":%s,"timestamp":"%s","alert_type":%s,"severity":%s,"metric":%s,"value":%s,"threshold":%s,"message":%s}\n' \
+            "$epoch" "$timestamp" "$type_json" "$severity_json" "$metric_json" \
+            "$value_json" "$threshold_json" "$message_json" | tee -a "$ALERT_LOG"
+    fi
     
     # Here you could add additional alert mechanisms:
     # - Send email: mail -s "Container Alert: $alert_type" admin@example.com <<< "$message"
@@ -180,7 +240,7 @@ monitor_container() {
     # Check if container is running
     local status=$(check_container_status)
     if [ "$status" != "running" ]; then
-        send_alert "Container Down" "Container $CONTAINER_NAME is not running"
+        send_alert "Container Down" "Container $CONTAINER_NAME is not running" critical status
         return 1
     fi
     
@@ -197,26 +257,9 @@ monitor_container() {
     # Log current status
     log_message "INFO" "CPU: ${cpu}%, Memory: ${mem_usage_mb}MB (${mem_percent}%), Response Time: ${response_time}ms, Status: $app_status"
     
-    # Check thresholds and trigger alerts if needed
-    # CPU threshold check
-    if (( $(echo "$cpu > $CPU_THRESHOLD" | bc -l 2>/dev/null) )); then
-        send_alert "High CPU" "CPU usage is ${cpu}% (threshold: ${CPU_THRESHOLD}%)"
-    fi
-    
-    # Memory threshold check
-    if (( $(echo "$mem_percent > $MEMORY_THRESHOLD" | bc -l 2>/dev/null) )); then
-        send_alert "High Memory" "Memory usage is ${mem_percent}% (threshold: ${MEMORY_THRESHOLD}%)"
-    fi
-    
-    # Response time threshold check
-    if [ "$response_time" -gt "$RESPONSE_TIME_THRESHOLD" ]; then
-        send_alert "Slow Response" "Response time is ${response_time}ms (threshold: ${RESPONSE_TIME_THRESHOLD}ms)"
-    fi
-    
-    # Application health check
-    if [ "$app_status" != "healthy" ]; then
-        send_alert "Application Unhealthy" "Application health check failed"
-    fi
+    # Threshold alerts (CPU, memory, response time, health) are evaluated by the
+    # collector daemon's rules engine (collector.py, rules.py) over rolling windows of the samples
+    # written above, so no per-sample comparison processes are spawned here
 }
 
 # ========================================
@@ -238,21 +281,22 @@ generate_report() {
         echo "Summary Statistics:"
         echo "-------------------"
         
-        # Calculate statistics if metrics file exists
-        if [ -f "$METRICS_FILE" ]; then
-            # Calculate average CPU usage
-            local avg_cpu=$(awk -F',' 'NR>1 {sum+=$2; count++} END {if(count>0) printf "%.2f", sum/count; else print "0"}' "$METRICS_FILE")
-            
-            # Calculate average memory usage percentage
-            local avg_mem=$(awk -F',' 'NR>1 {sum+=$4; count++} END {if(count>0) printf "%.2f", sum/count; else print "0"}' "$METRICS_FILE")
-            
-            # Calculate average response time
-            local avg_response=$(awk -F',' 'NR>1 {sum+=$5; count++} END {if(count>0) printf "%.0f", sum/count; else print "0"}' "$METRICS_FILE")
-            
-            echo "Average CPU Usage: ${avg_cpu}%"
-            echo "Average Memory Usage: ${avg_mem}%"
-            echo "Average Response Time: ${avg_response}ms"
+        # Statistics come from the collector's hourly aggregates (one pass over
+        # the hours, no rescan of the metrics); without them, one awk pass over the CSV
+        if [ -f "$HOURLY_FILE" ] && command -v python3 >/dev/null 2>&1; then
+            python3 "$(dirname "$0")/hourly_stats.py" report --file "$HOURLY_FILE"
             echo ""
+        elif [ -f "$METRICS_FILE" ]; then
+            awk -F',' 'NR>1 && $1 != "timestamp" {cpu+=$2; mem+=$4; response+=$5; count++}
+                END {
+                    if (count == 0) count = 1
+                    printf "Average CPU Usage: %.2f%%\n", cpu/count
+                    printf "Average Memory Usage: %.2f%%\n", mem/count
+                    printf "Average Response Time: %.0fms\n", response/count
+                }' "$METRICS_FILE"
+            echo ""
+        fi
+        if [ -f "$METRICS_FILE" ] || [ -f "$HOURLY_FILE" ]; then
             echo "Recent Alerts:"
             echo "--------------"
             # Show last 10 alerts
@@ -268,6 +312,14 @@ generate_report() {
 # VISUALIZATION FUNCTIONS
 # ========================================
 
+# Truncate a decimal value to an integer for shell arithmetic (no bc needed)
+# Parameters:
+#   $1 - Value (e.g. 42.75)
+to_int() {
+    local value="${1%%.*}"
+    [[ "$value" =~ ^-?[0-9]+$ ]] && echo "$value" || echo 0
+}
+
 # Draw a colored progress bar based on percentage value
 # Parameters:
 #   $1 - Value (0-100)
@@ -276,15 +328,19 @@ draw_bar() {
     local value=$1
     local width=$2
     
+    # Whole-percent precision is enough for drawing, so use shell arithmetic
+    local percent=$(to_int "$value")
+    
     # Calculate filled and empty portions
-    local filled=$(printf "%.0f" $(echo "$value * $width / 100" | bc -l 2>/dev/null || echo "0"))
+    local filled=$((percent * width / 100))
+    (( filled > width )) && filled=$width
     local empty=$((width - filled))
     
     # Select color based on value thresholds
     local color="\e[32m"  # Green (0-60%)
-    if (( $(echo "$value > 80" | bc -l 2>/dev/null || echo "0") )); then
+    if (( percent > 80 )); then
         color="\e[31m"    # Red (>80%)
-    elif (( $(echo "$value > 60" | bc -l 2>/dev/null || echo "0") )); then
+    elif (( percent > 60 )); then
         color="\e[33m"    # Yellow (60-80%)
     fi
     
@@ -368,17 +424,17 @@ live_monitor() {
         local alerts=0
         
         # Check each threshold and display alerts
-        if (( $(echo "$cpu > $CPU_THRESHOLD" | bc -l 2>/dev/null || echo "0") )); then
+        if (( $(to_int "$cpu") > $(to_int "$CPU_THRESHOLD") )); then
             echo "🔴 HIGH CPU: ${cpu}% (threshold: ${CPU_THRESHOLD}%)"
             ((alerts++))
         fi
         
-        if (( $(echo "$mem_percent > $MEMORY_THRESHOLD" | bc -l 2>/dev/null || echo "0") )); then
+        if (( $(to_int "$mem_percent") > $(to_int "$MEMORY_THRESHOLD") )); then
             echo "🔴 HIGH MEMORY: ${mem_percent}% (threshold: ${MEMORY_THRESHOLD}%)"
             ((alerts++))
         fi
         
-        if [ "$response_time" -gt "$RESPONSE_TIME_THRESHOLD" ]; then
+        if (( $(to_int "$response_time") > $(to_int "$RESPONSE_TIME_THRESHOLD") )); then
             echo "🔴 SLOW RESPONSE: ${response_time}ms (threshold: ${RESPONSE_TIME_THRESHOLD}ms)"
             ((alerts++))
         fi
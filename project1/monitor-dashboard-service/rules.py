@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Threshold rules evaluated over rolling windows of samples.
+
+Each rule watches one metric of the collected samples and keeps its own
+state, so a sustained breach raises one alert when it starts and one
+recovery record when it ends, instead of an alert for every sample:
+
+  count mode - fire when `required` of the last `samples` samples breach the
+               threshold, clear when `required` of them are back under the
+               clear threshold
+  avg mode   - fire when the average over the last `duration` seconds is
+               above the threshold, clear when it drops under the clear
+               threshold
+
+The clear threshold sits below the firing threshold (hysteresis), so a value
+hovering around the limit doesn't flap. Every update is O(1).
+"""
+import json
+import os
+from collections import deque
+
+from alert_records import make_alert
+
+
+def _env_float(name, default):
+    """Read a numeric environment variable (compose may leave quotes around it)"""
+    value = os.getenv(name, '').strip().strip('"\'')
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+
+def sample_value(sample, metric):
+    """Numeric value of a metric in a sample, None if missing"""
+    if metric == 'unhealthy':
+        status = sample.get('status')
+        return None if status is None else (0.0 if status == 'healthy' else 1.0)
+    try:
+        return float(sample.get(metric))
+    except (TypeError, ValueError):
+        return None
+
+
+class ThresholdRule:
+    """One metric threshold with windowed evaluation and hysteresis"""
+
+    def __init__(self, name, alert_type, metric, threshold, clear_threshold=None,
+                 mode='count', samples=5, required=3, duration=60,
+                 severity='warning', unit='', label=None):
+        self.name = name
+        self.alert_type = alert_type
+        self.metric = metric
+        self.threshold = threshold
+        self.clear_threshold = threshold if clear_threshold is None else clear_threshold
+        self.mode = mode
+        self.samples = samples
+        self.required = min(required, samples)
+        self.duration = duration
+        self.severity = severity
+        self.unit = unit
+        self.label = label or metric
+
+        self.firing = False
+        self.fired_at = None
+        self.last_value = None
+        # count mode: last N (breach, recovered) flags and their running totals
+        self.window = deque()
+        self.breaches = 0
+        self.recoveries = 0
+        # avg mode: (epoch, value) pairs in the time window and their sum
+        self.total = 0.0
+
+    def _update_count(self, value):
+        breach = value > self.threshold
+        recovered = value <= self.clear_threshold
+        self.window.append((breach, recovered))
+        self.breaches += breach
+        self.recoveries += recovered
+        if len(self.window) > self.samples:
+            old_breach, old_recovered = self.window.popleft()
+            self.breaches -= old_breach
+            self.recoveries -= old_recovered
+        if not self.firing:
+            return self.breaches >= self.required
+        return self.recoveries < self.required
+
+    def _update_avg(self, epoch, value):
+        self.window.append((epoch, value))
+        self.total += value
+        while self.window and self.window[0][0] <= epoch - self.duration:
+            self.total -= self.window.popleft()[1]
+        average = self.total / len(self.window)
+        if not self.firing:
+            return average > self.threshold
+        return average > self.clear_threshold
+
+    def window_value(self):
+        """The value the rule currently compares: last sample or window average"""
+        if self.mode == 'avg' and self.window:
+            return self.total / len(self.window)
+        return self.last_value
+
+    def describe_window(self):
+        if self.mode == 'avg':
+            return f"avg over {self.duration:g}s"
+        return f"{self.required} of last {self.samples} samples"
+
+    def update(self, epoch, value):
+        """Feed one sample; returns 'fire', 'clear' or None"""
+        self.last_value = value
+        if self.mode == 'avg':
+            firing = self._update_avg(epoch, value)
+        else:
+            firing = self._update_count(value)
+
+        if firing and not self.firing:
+            self.firing = True
+            self.fired_at = epoch
+            return 'fire'
+        if not firing and self.firing:
+            self.firing = False
+            self.fired_at = None
+            return 'clear'
+        return None
+
+    def make_alert(self, transition, epoch):
+        value = self.window_value()
+        if self.metric == 'unhealthy':
+            message = ("Application health check failed" if transition == 'fire'
+                       else "Application health check recovered")
+        elif transition == 'fire':
+            message = (f"{self.label} is {value:.2f}{self.unit} "
+                       f"(threshold: {self.threshold:g}{self.unit}, {self.describe_window()})")
+        else:
+            message = (f"{self.label} back to {value:.2f}{self.unit} "
+                       f"(clears at {self.clear_threshold:g}{self.unit})")
+        return make_alert(
+            self.alert_type, message,
+            metric=self.metric, value=value, threshold=self.threshold,
+            severity=self.severity if transition == 'fire' else 'ok',
+            epoch=epoch,
+        )
+
+    def state(self):
+        return {
+            'name': self.name,
+            'alert_type': self.alert_type,
+            'metric': self.metric,
+            'mode': self.mode,
+            'window': self.describe_window(),
+            'threshold': self.threshold,
+            'clear_threshold': self.clear_threshold,
+            'value': self.window_value(),
+            'firing': self.firing,
+            'fired_at': self.fired_at,
+        }
+
+
+class RulesEngine:
+    """Evaluates a set of rules against each incoming sample"""
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def evaluate(self, epoch, sample):
+        """Feed a sample to every rule; returns the alert records to write"""
+        alerts = []
+        for rule in self.rules:
+            value = sample_value(sample, rule.metric)
+            if value is None:
+                continue
+            transition = rule.update(epoch, value)
+            if transition:
+                alerts.append(rule.make_alert(transition, epoch))
+        return alerts
+
+    def state(self):
+        return [rule.state() for rule in self.rules]
+
+
+def default_rules():
+    """Rules built from the monitor's threshold environment variables
+
+    RULE_SAMPLES / RULE_REQUIRED set the count window ("3 of last 5"),
+    RULE_AVG_WINDOW the averaging window in seconds and RULE_HYSTERESIS the
+    fraction below the threshold at which an alert clears.
+    """
+    samples = int(_env_float('RULE_SAMPLES', 5))
+    required = int(_env_float('RULE_REQUIRED', 3))
+    avg_window = _env_float('RULE_AVG_WINDOW', 60)
+    hysteresis = _env_float('RULE_HYSTERESIS', 0.1)
+
+    cpu = _env_float('CPU_THRESHOLD', 80)
+    memory = _env_float('MEMORY_THRESHOLD', 80)
+    response_time = _env_float('RESPONSE_TIME_THRESHOLD', 1000)
+
+    return [
+        ThresholdRule('cpu', 'High CPU', 'cpu_percent', cpu, cpu * (1 - hysteresis),
+                      mode='count', samples=samples, required=required, unit='%', label='CPU usage'),
+        ThresholdRule('memory', 'High Memory', 'memory_percent', memory, memory * (1 - hysteresis),
+                      mode='avg', duration=avg_window, unit='%', label='Memory usage'),
+        ThresholdRule('latency', 'Slow Response', 'response_time_ms', response_time,
+                      response_time * (1 - hysteresis),
+                      mode='count', samples=samples, required=required, unit='ms', label='Response time'),
+        ThresholdRule('health', 'Application Unhealthy', 'unhealthy', 0.5,
+                      mode='count', samples=3, required=2, severity='critical'),
+    ]
+
+
+def load_rules(path=None):
+    """Rules from a JSON file (a list of ThresholdRule keyword arguments), or the defaults"""
+    path = path or os.getenv('RULES_FILE')
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            return [ThresholdRule(**rule) for rule in json.load(f)]
+    return default_rules()
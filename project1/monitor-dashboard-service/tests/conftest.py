@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# The service's modules are imported flat, as they are in its container (/app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Files the modules open at import (the dashboard's stores) go to a scratch directory
+_scratch = tempfile.mkdtemp(prefix='monitor-tests-')
+for name, file_name in (('ALERTS_DB', 'alerts.db'), ('STATE_LOG_FILE', 'states.log'),
+                        ('COLLECTOR_STATUS_FILE', 'collector.json'), ('HOURLY_STATS_FILE', 'hourly.json'),
+                        ('METRICS_RING_FILE', 'metrics.ring')):
+    os.environ.setdefault(name, os.path.join(_scratch, file_name))
@@ -0,0 +1,145 @@
+import os
+import shutil
+
+import pytest
+
+import cgroup_sampler
+from cgroup_sampler import CgroupNotFound, CgroupSampler, cgroup_dir_for
+from conftest import FIXTURES
+
+CONTAINER_ID = '3f2a9c1d7e4b5a6c8d9e0f1a2b3c4d5e6f7a8b9c0d1e2f3a4b5c6d7e8f9a0b1c'
+CGROUP_ROOT = os.path.join(FIXTURES, 'cgroup')
+PROC_ROOT = os.path.join(FIXTURES, 'proc')
+MB = 1048576
+
+
+class Clock:
+    """Stands in for the time module, so rates are over known intervals"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cgroup_sampler, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cgroup(tmp_path):
+    """A writable copy of the fixture cgroup directory"""
+    path = tmp_path / 'cgroup'
+    shutil.copytree(cgroup_dir_for({'Id': CONTAINER_ID}, CGROUP_ROOT, PROC_ROOT), path)
+    return path
+
+
+def update(path, name, text):
+    # Rewritten in place, like the kernel does: the sampler keeps the file open
+    with open(path / name, 'w') as f:
+        f.write(text)
+
+
+def test_cgroup_dir_for_finds_the_systemd_scope():
+    path = cgroup_dir_for({'Id': CONTAINER_ID, 'State': {'Pid': 0}, 'HostConfig': {}}, CGROUP_ROOT, PROC_ROOT)
+    assert path == os.path.join(CGROUP_ROOT, 'system.slice', f"docker-{CONTAINER_ID}.scope")
+    with pytest.raises(CgroupNotFound):
+        cgroup_dir_for({'Id': '0' * 64}, CGROUP_ROOT, PROC_ROOT)
+
+
+def test_first_sample_has_gauges_and_no_rates(cgroup, clock):
+    sample = CgroupSampler(str(cgroup), proc_root=PROC_ROOT).sample()
+
+    assert sample['cpu_percent'] == 0.0
+    assert sample['cpu_throttled_percent'] == 0.0
+    assert sample['block_read_bps'] == 0.0
+    # memory.current less inactive_file, as docker stats reports it
+    assert sample['memory_usage_mb'] == 120
+    assert sample['memory_limit_mb'] == 500
+    assert sample['memory_percent'] == 24
+    assert sample['pids'] == 12
+    assert sample['oom_kills'] == 0
+    # No process given: network traffic isn't known
+    assert sample['net_rx_bps'] is None
+
+
+def test_rates_over_the_sample_interval(cgroup, clock):
+    sampler = CgroupSampler(str(cgroup), proc_root=PROC_ROOT)
+    sampler.sample()
+
+    clock.now += 0.5
+    update(cgroup, 'cpu.stat', 'usage_usec 12250000\nuser_usec 9200000\nsystem_usec 3050000\n'
+                               'nr_periods 1050\nnr_throttled 50\nthrottled_usec 900000\n')
+    update(cgroup, 'io.stat', '8:0 rbytes=2097152 wbytes=2097152 rios=110 wios=200 dbytes=0 dios=0\n'
+                              '253:0 rbytes=524288 wbytes=262144 rios=10 wios=4 dbytes=0 dios=0\n')
+    sample = sampler.sample()
+
+    # 250ms of CPU time in 500ms of wall time: half a core
+    assert sample['cpu_percent'] == pytest.approx(50.0)
+    # 10 of 50 enforcement periods throttled
+    assert sample['cpu_throttled_percent'] == pytest.approx(20.0)
+    # 100ms throttled in 0.5s
+    assert sample['cpu_throttled_ms'] == pytest.approx(200.0)
+    assert sample['block_read_bps'] == pytest.approx(2 * MB)
+    assert sample['block_write_bps'] == pytest.approx(0.5 * MB)
+
+
+def test_oom_kills_are_reported_once(cgroup, clock):
+    sampler = CgroupSampler(str(cgroup), proc_root=PROC_ROOT)
+    sampler.sample()
+
+    clock.now += 0.1
+    update(cgroup, 'memory.events', 'low 0\nhigh 0\nmax 5\noom 2\noom_kill 2\n')
+    assert sampler.sample()['oom_kills'] == 1
+    clock.now += 0.1
+    assert sampler.sample()['oom_kills'] == 0
+
+
+def test_counters_restarting_from_zero_give_no_negative_rates(cgroup, clock):
+    sampler = CgroupSampler(str(cgroup), proc_root=PROC_ROOT)
+    sampler.sample()
+
+    clock.now += 1
+    update(cgroup, 'cpu.stat', 'usage_usec 1000\nnr_periods 1\nnr_throttled 0\nthrottled_usec 0\n')
+    sample = sampler.sample()
+
+    assert sample['cpu_percent'] == 0.0
+    assert sample['cpu_throttled_ms'] == 0.0
+
+
+def test_unlimited_memory_is_relative_to_the_host(cgroup, clock):
+    update(cgroup, 'memory.max', 'max\n')
+    sample = CgroupSampler(str(cgroup), proc_root=PROC_ROOT).sample()
+
+    # MemTotal of the fixture /proc/meminfo: 8GiB
+    assert sample['memory_limit_mb'] == 8192
+    assert sample['memory_percent'] == pytest.approx(120 / 8192 * 100)
+
+
+def test_network_rates_from_the_container_namespace(cgroup, clock, tmp_path):
+    net = tmp_path / 'proc' / '4242' / 'net'
+    net.mkdir(parents=True)
+    shutil.copy(os.path.join(PROC_ROOT, 'meminfo'), tmp_path / 'proc')
+    header = ('Inter-|   Receive                                                |  Transmit\n'
+              ' face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed\n')
+
+    def write_net_dev(rx, tx):
+        with open(net / 'dev', 'w') as f:
+            f.write(header)
+            f.write("    lo: 999999 10 0 0 0 0 0 0 999999 10 0 0 0 0 0 0\n")
+            f.write(f"  eth0: {rx} 100 0 0 0 0 0 0 {tx} 100 0 0 0 0 0 0\n")
+
+    write_net_dev(1000000, 500000)
+    sampler = CgroupSampler(str(cgroup), proc_root=str(tmp_path / 'proc'), pid=4242)
+    sampler.sample()
+    clock.now += 2
+    write_net_dev(1000000 + 4 * MB, 500000 + MB)
+    sample = sampler.sample()
+
+    # Loopback traffic isn't counted
+    assert sample['net_rx_bps'] == pytest.approx(2 * MB)
+    assert sample['net_tx_bps'] == pytest.approx(0.5 * MB)
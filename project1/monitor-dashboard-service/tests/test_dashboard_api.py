@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+import dashboard
+from availability import AvailabilityIndex, StateTracker
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard, 'availability_index', AvailabilityIndex(str(tmp_path / 'states.log')))
+    return dashboard.app.test_client()
+
+
+@pytest.fixture
+def transitions(tmp_path):
+    """Three transitions in the last hour: up, down 30 minutes ago, up again 20 minutes ago"""
+    now = time.time()
+    states = StateTracker(str(tmp_path / 'states.log'))
+    states.observe('up', now - 3000, 'health')
+    states.observe('down', now - 1800, 'docker', 'exited')
+    states.observe('up', now - 1200, 'docker', 'started')
+    return now
+
+
+def test_uptime_timeline_covers_the_whole_window(client, transitions):
+    uptime = client.get('/api/uptime?window=1h&timeline=1h').get_json()
+
+    assert [segment['state'] for segment in uptime['timeline']] == ['up', 'down', 'up']
+    # The current state, and when it started
+    assert uptime['state'] == 'up'
+    assert uptime['since'] == pytest.approx(transitions - 1200, abs=1e-3)
+
+
+def test_uptime_since_returns_only_segments_ending_after_it(client, transitions):
+    uptime = client.get(f"/api/uptime?window=1h&timeline=1h&since={transitions - 1500}").get_json()
+
+    assert [segment['state'] for segment in uptime['timeline']] == ['down', 'up']
+    assert uptime['timeline'][0]['start'] == pytest.approx(transitions - 1500, abs=1e-3)
+
+
+def test_hourly_shares_one_cache_entry_and_rejects_bad_hours(client, monkeypatch):
+    rows = [{'hour': hour} for hour in range(5)]
+    monkeypatch.setattr(dashboard, 'read_hourly', lambda: rows)
+    monkeypatch.setattr(dashboard.response_cache, 'entries', {})
+
+    assert client.get('/api/hourly?hours=2').get_json() == rows[-2:]
+    assert client.get('/api/hourly?hours=3').get_json() == rows[-3:]
+    assert client.get('/api/hourly').get_json() == rows
+    assert list(dashboard.response_cache.entries) == ['hourly']
+    assert client.get('/api/hourly?hours=-1').status_code == 400
+    assert client.get('/api/hourly?hours=abc').status_code == 400
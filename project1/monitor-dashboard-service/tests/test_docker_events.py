@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import pytest
+
+import collector as collector_module
+import docker_events
+from alert_records import parse_alert_line
+from availability import StateTracker
+from collector import Collector
+from conftest import FIXTURES
+from docker_events import EventWatcher, FakeEventSource
+from rules import RulesEngine
+
+EVENTS_FILE = os.path.join(FIXTURES, 'docker_events.jsonl')
+
+# What the recorded events of flask-app should leave behind
+EXPECTED_STATES = [
+    ('up', 'docker health check passed'),
+    ('down', 'exited (137)'),
+    ('unhealthy', 'started'),
+    ('up', 'docker health check passed'),
+    ('down', 'exited (0)'),
+]
+EXPECTED_ALERTS = ['OOM Kill', 'Container Down', 'Application Unhealthy', 'Container Down']
+
+
+@pytest.fixture
+def collector(tmp_path, monkeypatch):
+    monkeypatch.setattr(collector_module, 'ALERTS_FILE', str(tmp_path / 'alerts.log'))
+    monkeypatch.setattr(collector_module, 'LOG_FILE', str(tmp_path / 'monitor.log'))
+    return Collector('flask-app', docker=object(), rules_engine=RulesEngine([]),
+                     states=StateTracker(str(tmp_path / 'states.log')))
+
+
+def read_states(collector):
+    with open(collector.states.path, 'r') as f:
+        return [json.loads(line) for line in f]
+
+
+def read_alerts():
+    try:
+        with open(collector_module.ALERTS_FILE, 'r') as f:
+            return [parse_alert_line(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+
+def watch(collector, source, reconnects):
+    """Run an EventWatcher into the collector until the stream has been reopened `reconnects` times"""
+    watcher = EventWatcher(['flask-app'], collector.handle_event, source, log=lambda *args: None).start()
+    deadline = time.monotonic() + 5
+    while watcher.reconnects < reconnects and time.monotonic() < deadline:
+        time.sleep(0.01)
+    watcher.stop()
+    watcher.thread.join(timeout=5)
+    assert watcher.reconnects >= reconnects
+    return watcher
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(docker_events, 'RECONNECT_DELAY', 0.01)
+
+
+def test_replay_logs_transitions_and_alerts(collector):
+    watcher = watch(collector, FakeEventSource(EVENTS_FILE), reconnects=1)
+
+    # The postgres-db event and the exec_create action are filtered out
+    assert watcher.events_seen == 8
+    states = read_states(collector)
+    assert [(record['state'], record['reason']) for record in states] == EXPECTED_STATES
+    # At the events' own (nanosecond) timestamps
+    assert states[1]['epoch'] == pytest.approx(1710929730.002, abs=1e-3)
+    assert states[2]['epoch'] == pytest.approx(1710929732.5, abs=1e-3)
+    alerts = read_alerts()
+    assert [alert['alert_type'] for alert in alerts] == EXPECTED_ALERTS
+    assert alerts[1]['message'] == 'Container flask-app exited with code 137'
+    assert collector.container_down
+
+
+def test_reconnects_deliver_nothing_twice(collector):
+    # The fake source replays from `since` inclusive on every reconnect, like
+    # the daemon: the events at the last timestamp come back each time
+    watcher = watch(collector, FakeEventSource(EVENTS_FILE), reconnects=3)
+
+    assert watcher.events_seen == 8
+    assert len(read_states(collector)) == len(EXPECTED_STATES)
+    assert len(read_alerts()) == len(EXPECTED_ALERTS)
+
+
+def test_events_after_a_reconnect_are_handled(collector):
+    with open(EVENTS_FILE, 'r') as f:
+        events = [json.loads(line) for line in f]
+    source = FakeEventSource(events[:4])
+    watcher = EventWatcher(['flask-app'], collector.handle_event, source, log=lambda *args: None)
+    watcher.stream()
+    # The daemon comes back with the rest of the history
+    source.events_list = events
+    watcher.stream()
+    watcher.stream()
+
+    assert watcher.events_seen == 8
+    assert [record['state'] for record in read_states(collector)] == [state for state, _ in EXPECTED_STATES]
+    assert [alert['alert_type'] for alert in read_alerts()] == EXPECTED_ALERTS
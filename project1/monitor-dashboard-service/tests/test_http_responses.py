@@ -0,0 +1,83 @@
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+
+import http_responses
+from http_responses import init_app, versioned
+
+orjson = pytest.importorskip('orjson')
+
+
+@pytest.fixture
+def orjson_calls(monkeypatch):
+    """Counts calls to orjson.dumps made by the provider"""
+    calls = []
+
+    class CountingOrjson:
+        def __getattr__(self, name):
+            return getattr(orjson, name)
+
+        def dumps(self, *args, **kwargs):
+            calls.append(args[0])
+            return orjson.dumps(*args, **kwargs)
+
+    monkeypatch.setattr(http_responses, 'orjson', CountingOrjson())
+    return calls
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    init_app(app)
+
+    @app.route('/items')
+    def items():
+        return jsonify([{'id': i, 'name': f"item {i}"} for i in range(100)])
+
+    @app.route('/versioned')
+    def versioned_items():
+        return versioned('v1', lambda: {'items': list(range(500))}, last_modified=1700000000)
+
+    return app
+
+
+def test_jsonify_is_encoded_by_orjson(app, orjson_calls):
+    with app.app_context():
+        assert jsonify({'b': 1, 'a': [1, 2]}).get_data() == b'{"a":[1,2],"b":1}\n'
+    assert len(orjson_calls) == 1
+
+
+def test_debug_indentation_is_encoded_by_orjson(app, orjson_calls):
+    app.debug = True
+    with app.app_context():
+        assert jsonify({'a': 1}).get_data() == b'{\n  "a": 1\n}\n'
+    assert len(orjson_calls) == 1
+
+
+def test_arguments_orjson_cannot_express_fall_back_to_json(app, orjson_calls):
+    with app.app_context():
+        assert app.json.dumps({'a': 1}, separators=(', ', ': ')) == '{"a": 1}'
+    assert orjson_calls == []
+
+
+def test_versioned_response_is_encoded_by_orjson_and_revalidated(app, orjson_calls):
+    client = app.test_client()
+    response = client.get('/versioned')
+    assert response.status_code == 200
+    assert len(orjson_calls) == 1
+
+    response = client.get('/versioned', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    # Not even built
+    assert len(orjson_calls) == 1
+
+
+def test_large_bodies_are_compressed_and_unchanged_ones_answered_with_304(app):
+    client = app.test_client()
+    plain = client.get('/items')
+    response = client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain.data
+
+    assert client.get('/items', headers={'If-None-Match': plain.headers['ETag']}).status_code == 304